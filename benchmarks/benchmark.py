@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+""" Benchmarks for the SuRF reader/writer hot paths.
+
+All benchmarks run against the `rdflib` plugin with an in-memory
+`IOMemory` graph, filled with a generated, reproducible data set of
+`foaf:Person` resources. Each (benchmark, size) pair runs in its own
+process so that peak memory is measured in isolation.
+
+Results are printed as JSON (or written to ``--output``)::
+
+    python benchmarks/benchmark.py --sizes 100,1000 --output results.json
+    python benchmarks/benchmark.py --list
+
+"""
+
+import gc
+import logging
+import os
+import random
+import resource as rusage
+import subprocess
+import sys
+import time
+from optparse import OptionParser
+
+try:
+    from json import dumps, loads
+except ImportError:
+    from simplejson import dumps, loads
+
+import surf
+from surf.plugin.query_reader import query_S
+from surf.query.translator.sparql import SparqlTranslator
+from surf.rdf import Literal, URIRef
+
+DEFAULT_SIZES = [100, 1000]
+DEFAULT_ITERATIONS = 50
+DEFAULT_SEED = 42
+
+PERSON_URI = "http://example.org/person/%d"
+
+#---------------------------------------------------------------------------
+# data set
+#---------------------------------------------------------------------------
+
+def create_session():
+    """ Return a `session` over a fresh in-memory rdflib store. """
+
+    store = surf.Store(reader = "rdflib", writer = "rdflib",
+                       rdflib_store = "IOMemory")
+    return surf.Session(store)
+
+def populate(size, seed = DEFAULT_SEED):
+    """ Return a `session` whose store holds `size` persons.
+
+    Every person has a name, an age and knows up to three other persons,
+    chosen with a fixed random `seed`.
+
+    """
+
+    session = create_session()
+    graph = session.default_store.reader.graph
+    generator = random.Random(seed)
+    FOAF = surf.ns.FOAF
+    for i in range(size):
+        subject = URIRef(PERSON_URI % i)
+        graph.add((subject, surf.ns.RDF.type, FOAF.Person))
+        graph.add((subject, FOAF.name, Literal(u"Person %d" % i)))
+        graph.add((subject, FOAF.age, Literal(generator.randint(18, 99))))
+        for _ in range(generator.randint(0, 3)):
+            other = URIRef(PERSON_URI % generator.randrange(size))
+            graph.add((subject, FOAF.knows, other))
+
+    return session
+
+def sample(size, seed = DEFAULT_SEED):
+    """ Return an endless, reproducible iterator over person subjects. """
+
+    generator = random.Random(seed)
+    while True:
+        yield URIRef(PERSON_URI % generator.randrange(size))
+
+#---------------------------------------------------------------------------
+# benchmarks
+#---------------------------------------------------------------------------
+# Each benchmark is a function taking the data set size and returning the
+# callable that performs one timed operation. Preparation done before
+# returning is not timed. The callable may have a `prepare` attribute, run
+# before each operation, and a `check` attribute, run after it, both untimed.
+
+def bench_resource_load(size):
+    """ `Resource.load` of a random person. """
+
+    session = populate(size)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    subjects = sample(size)
+    return lambda: session.get_resource(subjects.next(), Person).load()
+
+def bench_attribute_access(size):
+    """ Lazy attribute access through `ResourceValue` on a new instance. """
+
+    session = populate(size)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    subjects = sample(size)
+    return lambda: session.get_resource(subjects.next(), Person).foaf_name.first
+
+def bench_result_proxy(size):
+    """ Iterating over `Person.all()`. """
+
+    session = populate(size)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    return lambda: list(Person.all())
+
+def bench_result_proxy_full(size):
+    """ Iterating over `Person.all().full()`. """
+
+    session = populate(size)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    return lambda: list(Person.all().full())
+
+def bench_convert(size):
+    """ `RDFQueryReader.convert` of a pre-executed `load` query result. """
+
+    session = populate(size)
+    reader = session.default_store.reader
+    subject = URIRef(PERSON_URI % 0)
+    result = reader._execute(query_S(subject, True, None))
+    return lambda: reader.convert(result, 'p', 'v', 'g', 'c')
+
+def bench_translate(size):
+    """ `SparqlTranslator.translate` of a `load` query. """
+
+    subjects = sample(size)
+    contexts = [URIRef("http://example.org/context")]
+    return lambda: SparqlTranslator(query_S(subjects.next(), True, contexts)).translate()
+
+def bench_commit(size):
+    """ `Session.commit` of `size` new dirty persons. """
+
+    state = {}
+
+    def prepare():
+        session = create_session()
+        Person = session.get_class(surf.ns.FOAF.Person)
+        persons = []
+        for i in range(size):
+            person = session.get_resource(PERSON_URI % i, Person)
+            person.foaf_name = u"Person %d" % i
+            persons.append(person)
+        state["session"] = session
+        state["persons"] = persons
+
+    def commit():
+        state["session"].commit()
+
+    def check():
+        # A type and a name per person.
+        stored = state["session"].default_store.size()
+        if stored != 2 * size:
+            raise AssertionError("Committed %d triples, expected %d"
+                                 % (stored, 2 * size))
+
+    # Rebuilding the dirty resources is not part of the timed operation,
+    # neither is checking that the commit wrote them.
+    commit.prepare = prepare
+    commit.check = check
+    return commit
+
+BENCHMARKS = [bench_resource_load, bench_attribute_access, bench_result_proxy,
+              bench_result_proxy_full, bench_convert, bench_translate,
+              bench_commit]
+
+def benchmark_name(function):
+    return function.__name__[len("bench_"):]
+
+#---------------------------------------------------------------------------
+# harness
+#---------------------------------------------------------------------------
+
+def percentile(values, fraction):
+    """ Return the `fraction` percentile of the sorted `values`. """
+
+    index = int(round(fraction * (len(values) - 1)))
+    return values[index]
+
+def measure(name, size, iterations, warmup):
+    """ Run benchmark `name` in this process and return its statistics. """
+
+    function = dict([(benchmark_name(f), f) for f in BENCHMARKS])[name]
+    operation = function(size)
+    prepare = getattr(operation, "prepare", None)
+    check = getattr(operation, "check", None)
+
+    for _ in range(warmup):
+        if prepare:
+            prepare()
+        operation()
+        if check:
+            check()
+
+    latencies = []
+    for _ in range(iterations):
+        if prepare:
+            prepare()
+        gc.collect()
+        start = time.time()
+        operation()
+        latencies.append(time.time() - start)
+        if check:
+            check()
+
+    total = sum(latencies)
+    latencies.sort()
+    return {"benchmark" : name,
+            "size" : size,
+            "iterations" : iterations,
+            "total_s" : total,
+            "ops_per_s" : total and iterations / total or None,
+            "latency_ms" : {"min" : latencies[0] * 1000,
+                            "p50" : percentile(latencies, 0.5) * 1000,
+                            "p90" : percentile(latencies, 0.9) * 1000,
+                            "p99" : percentile(latencies, 0.99) * 1000,
+                            "max" : latencies[-1] * 1000},
+            # Kilobytes on Linux, bytes on Mac OS X.
+            "peak_rss" : rusage.getrusage(rusage.RUSAGE_SELF).ru_maxrss}
+
+def run_isolated(name, size, iterations, warmup):
+    """ Run benchmark `name` in a child process and return its statistics. """
+
+    command = [sys.executable, os.path.abspath(__file__), "--child",
+               "--benchmarks", name, "--sizes", str(size),
+               "--iterations", str(iterations), "--warmup", str(warmup)]
+    child = subprocess.Popen(command, stdout = subprocess.PIPE)
+    output, _ = child.communicate()
+    if child.returncode != 0:
+        raise RuntimeError("Benchmark %s failed for size %d" % (name, size))
+    return loads(output)
+
+def main(argv = None):
+    parser = OptionParser(usage = "%prog [options]")
+    parser.add_option("--benchmarks", default = None,
+                      help = "comma separated benchmarks to run (default: all)")
+    parser.add_option("--sizes", default = ",".join(map(str, DEFAULT_SIZES)),
+                      help = "comma separated data set sizes")
+    parser.add_option("--iterations", type = "int", default = DEFAULT_ITERATIONS,
+                      help = "timed operations per benchmark")
+    parser.add_option("--warmup", type = "int", default = 3,
+                      help = "untimed operations before measuring")
+    parser.add_option("--output", default = None,
+                      help = "write the JSON report to this file")
+    parser.add_option("--list", action = "store_true", default = False,
+                      help = "list available benchmarks and exit")
+    parser.add_option("--child", action = "store_true", default = False,
+                      help = "internal, run one benchmark in this process")
+    options, _ = parser.parse_args(argv)
+
+    logging.basicConfig(level = logging.WARNING)
+
+    names = [benchmark_name(function) for function in BENCHMARKS]
+    if options.list:
+        for function in BENCHMARKS:
+            print "%-20s %s" % (benchmark_name(function), function.__doc__.strip())
+        return 0
+
+    if options.benchmarks:
+        selected = options.benchmarks.split(",")
+        unknown = [name for name in selected if name not in names]
+        if unknown:
+            parser.error("unknown benchmarks: %s" % ", ".join(unknown))
+        names = selected
+    sizes = [int(size) for size in options.sizes.split(",")]
+
+    if options.child:
+        print dumps(measure(names[0], sizes[0], options.iterations, options.warmup))
+        return 0
+
+    results = []
+    for name in names:
+        for size in sizes:
+            results.append(run_isolated(name, size, options.iterations,
+                                        options.warmup))
+            sys.stderr.write("%(benchmark)s[%(size)d]: %(ops_per_s).1f ops/s\n"
+                             % results[-1])
+
+    report = dumps({"python" : sys.version.split()[0],
+                    "platform" : sys.platform,
+                    "surf" : surf.str_version,
+                    "results" : results}, indent = 2)
+    if options.output:
+        output = open(options.output, "w")
+        try:
+            output.write(report)
+        finally:
+            output.close()
+    else:
+        print report
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
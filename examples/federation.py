@@ -81,7 +81,7 @@ session.commit()
 
 
 print 'Retrieving from store'
-actors = list(Actor.all())
+actors = list(Actor.all().prefetch("surf_name", "surf_movies__surf_title"))
 movies = list(Movie.all())
 
 print 'Actor 1 cmp: ', a1 == actors[0]
@@ -96,10 +96,13 @@ class WriterPlugin(RDFWriter):
     def _update(self, *resources):
         for resource in resources:
             s = resource.subject
-            for p in resource.rdf_direct:
-                self.__remove(s, p, context=resource.context)
-            for p, objs in resource.rdf_direct.items():
-                for o in objs:
+            for p, (added, removed) in resource.rdf_changes.items():
+                if removed is None:
+                    self.__remove(s, p, context=resource.context)
+                else:
+                    for o in removed:
+                        self.__remove(s, p, o, context=resource.context)
+                for o in added:
                     self.__add(s, p, o, resource.context)
 
     def _remove(self, *resources, **kwargs):
@@ -0,0 +1,769 @@
+# Copyright (c) 2009, Digital Enterprise Research Institute (DERI),
+# NUI Galway
+# All rights reserved.
+
+# author: Cosmin Basca
+# email: cosmin.basca@gmail.com
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer
+#      in the documentation and/or other materials provided with
+#      the distribution.
+#    * Neither the name of DERI nor the
+#      names of its contributors may be used to endorse or promote
+#      products derived from this software without specific prior
+#      written permission.
+
+# THIS SOFTWARE IS PROVIDED BY DERI ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DERI BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# -*- coding: utf-8 -*-
+""" Dictionary-encoded quad index kept in sorted, memory-mapped files.
+
+Terms are mapped to integer ids by a :class:`TermDictionary`. Quads of term
+ids are stored three times, sorted in `spoc`, `posc` and `ospc` order, so
+that any triple pattern is answered by a binary search over one of them.
+The files are memory-mapped read only, the operating system pages in what
+is looked up.
+
+Changes are kept in memory until :meth:`QuadIndex.flush` merges them into
+new files: only the changes are sorted, the stored records between them are
+copied as they are. The index is meant for read-mostly data, flushing
+rewrites the sorted files. Use :meth:`QuadIndex.load` for bulk loads.
+
+"""
+
+from itertools import islice
+import mmap
+import os
+from os.path import exists, getsize, join
+import struct
+from threading import RLock
+
+from surf.cache import LRUCache
+from surf.rdf import BNode, Literal, URIRef
+
+# Term id of the default context, ids of real terms start at 1.
+DEFAULT_CONTEXT = 0
+
+DEFAULT_CACHE_SIZE = 100000
+DEFAULT_FLUSH_THRESHOLD = 100000
+
+OFFSET = struct.Struct("<Q")
+TERM_ID = struct.Struct("<I")
+QUAD = struct.Struct("<4I")
+
+# Positions of s, p, o, c in the records of each permutation.
+PERMUTATIONS = {"spoc" : (0, 1, 2, 3),
+                "posc" : (1, 2, 0, 3),
+                "ospc" : (2, 0, 1, 3)}
+
+# Number of records written with one struct.pack call.
+WRITE_CHUNK = 65536
+
+# Bytes of stored records copied at a time when merging changes.
+COPY_CHUNK = 1 << 20
+
+def encode_term(term):
+    """ Return the utf-8 encoded key of ``term``. """
+
+    if isinstance(term, Literal):
+        key = u"L%s\x01%s\x01%s" % (term.language or u"",
+                                    term.datatype or u"", term)
+    elif isinstance(term, BNode):
+        key = u"B%s" % term
+    else:
+        key = u"U%s" % term
+
+    return key.encode("utf-8")
+
+def decode_term(key):
+    """ Return the term encoded as ``key`` by :func:`encode_term`. """
+
+    key = key.decode("utf-8")
+    kind, value = key[0], key[1:]
+    if kind == u"U":
+        return URIRef(value)
+    elif kind == u"B":
+        return BNode(value)
+
+    language, datatype, value = value.split(u"\x01", 2)
+    return Literal(value, lang = language or None,
+                   datatype = datatype and URIRef(datatype) or None)
+
+class MappedFile(object):
+    """ Read only memory map of the file at ``path``, empty if there is no
+    such file. """
+
+    def __init__(self, path):
+        self.__file = None
+        self.data = ""
+        if path and exists(path) and getsize(path):
+            self.__file = open(path, "rb")
+            self.data = mmap.mmap(self.__file.fileno(), 0,
+                                  access = mmap.ACCESS_READ)
+
+    def close(self):
+        if self.__file is not None:
+            self.data.close()
+            self.__file.close()
+            self.__file = None
+            self.data = ""
+
+class RecordFile(MappedFile):
+    """ Read only memory map of a file of fixed size ``record`` structs. """
+
+    def __init__(self, path, record):
+        MappedFile.__init__(self, path)
+        self.__record = record
+        self.__length = len(self.data) // record.size
+
+    record = property(fget = lambda self: self.__record)
+    """ The `struct.Struct` of the records. """
+
+    def __len__(self):
+        return self.__length
+
+    def __getitem__(self, index):
+        return self.__record.unpack_from(self.data, index * self.__record.size)
+
+    def close(self):
+        MappedFile.close(self)
+        self.__length = 0
+
+def bisect(less, low, high):
+    """ Return the first position in `[low, high)` for which ``less`` is
+    false, ``less`` being true for the positions before it only. """
+
+    while low < high:
+        middle = (low + high) // 2
+        if less(middle):
+            low = middle + 1
+        else:
+            high = middle
+
+    return low
+
+def gallop(less, low, high):
+    """ Like :func:`bisect`, but probe positions exponentially further from
+    ``low`` first. Looking up sorted values this way, each from the
+    position of the previous one, takes fewer probes than a binary search
+    for each. """
+
+    step = 1
+    while low < high:
+        probe = min(low + step, high) - 1
+        if not less(probe):
+            return bisect(less, low, probe)
+        low = probe + 1
+        step *= 2
+
+    return low
+
+def bisect_prefix(records, prefix):
+    """ Return the `(start, stop)` range of the sorted ``records`` that
+    start with ``prefix``. """
+
+    size = len(prefix)
+    low, high = 0, len(records)
+    while low < high:
+        middle = (low + high) // 2
+        if records[middle][:size] < prefix:
+            low = middle + 1
+        else:
+            high = middle
+    start, high = low, len(records)
+    while low < high:
+        middle = (low + high) // 2
+        if records[middle][:size] <= prefix:
+            low = middle + 1
+        else:
+            high = middle
+
+    return start, low
+
+def write_values(output, values, code):
+    """ Write the integer ``values`` to the file ``output``, as little endian
+    `struct` ``code`` values. """
+
+    for start in range(0, len(values), WRITE_CHUNK):
+        chunk = values[start:start + WRITE_CHUNK]
+        output.write(struct.pack("<%d%s" % (len(chunk), code), *chunk))
+
+def copy_records(output, records, start, stop):
+    """ Copy the records ``start`` to ``stop`` of the :class:`RecordFile`
+    ``records`` to the file ``output``, as they are stored. """
+
+    size = records.record.size
+    for offset in xrange(start * size, stop * size, COPY_CHUNK):
+        output.write(records.data[offset:min(offset + COPY_CHUNK,
+                                             stop * size)])
+
+def write_merged(path, records, changes):
+    """ Write the :class:`RecordFile` ``records`` with ``changes`` applied
+    to a temporary file next to ``path``, return the temporary file name.
+
+    ``changes`` are sorted `(position, deleted, record)` tuples. If
+    ``deleted`` is true, the stored record at ``position`` is left out,
+    otherwise ``record`` is inserted before it. Stored records between
+    changes are copied without being decoded, so merging costs memory and
+    Python work for the changes only.
+
+    """
+
+    temporary = path + ".tmp"
+    output = open(temporary, "wb")
+    try:
+        cursor, inserted = 0, []
+        for position, deleted, record in changes:
+            if position > cursor:
+                write_values(output, inserted, "I")
+                inserted = []
+                copy_records(output, records, cursor, position)
+                cursor = position
+            if deleted:
+                cursor = position + 1
+            else:
+                inserted.extend(record)
+        write_values(output, inserted, "I")
+        copy_records(output, records, cursor, len(records))
+    finally:
+        output.close()
+
+    return temporary
+
+def replace_file(temporary, path):
+    """ Atomically replace the file at ``path`` with ``temporary``. """
+
+    if exists(path) and os.name == "nt":
+        os.remove(path)
+    os.rename(temporary, path)
+
+class TermDictionary(object):
+    """ Bidirectional mapping between RDF terms and integer ids.
+
+    The terms are stored in `terms.dat`, the offsets of each term in
+    `terms.off` and the ids sorted by encoded term in `terms.srt`, which is
+    binary searched to find the id of a term. Terms added since the last
+    :meth:`flush` are kept in memory. If ``path`` is `None`, all terms are
+    kept in memory.
+
+    Up to ``cache_size`` looked up terms and ids are cached.
+
+    """
+
+    def __init__(self, path = None, cache_size = DEFAULT_CACHE_SIZE):
+        self.__path = path
+        self.__ids = LRUCache(max_size = cache_size)
+        self.__terms = LRUCache(max_size = cache_size)
+        self.__open()
+
+    def __file(self, name):
+        return self.__path and join(self.__path, name) or None
+
+    def __open(self):
+        self.__data = MappedFile(self.__file("terms.dat"))
+        self.__offsets = RecordFile(self.__file("terms.off"), OFFSET)
+        self.__sorted = RecordFile(self.__file("terms.srt"), TERM_ID)
+        self.__count = max(len(self.__offsets) - 1, 0)
+        # Terms added since the last flush, key -> id and id order.
+        self.__new = {}
+        self.__new_keys = []
+
+    def __close(self):
+        for mapped in [self.__data, self.__offsets, self.__sorted]:
+            mapped.close()
+
+    def __len__(self):
+        return self.__count + len(self.__new_keys)
+
+    def __key(self, term_id):
+        """ Return the encoded term of ``term_id``. """
+
+        if term_id > self.__count:
+            return self.__new_keys[term_id - self.__count - 1]
+
+        start, = self.__offsets[term_id - 1]
+        stop, = self.__offsets[term_id]
+        return self.__data.data[start:stop]
+
+    def __less(self, key):
+        """ Return a function telling if the stored term at a position of
+        the sorted terms is less than ``key``. """
+
+        return lambda position: self.__key(self.__sorted[position][0]) < key
+
+    def __stored(self, key, position):
+        """ Return the id of ``key`` if it is the stored term at
+        ``position`` of the sorted terms, otherwise `None`. """
+
+        if position < len(self.__sorted):
+            term_id, = self.__sorted[position]
+            if self.__key(term_id) == key:
+                return term_id
+
+        return None
+
+    def __find(self, key):
+        """ Binary search the stored terms for ``key``. """
+
+        position = bisect(self.__less(key), 0, len(self.__sorted))
+        return self.__stored(key, position)
+
+    def id(self, term, add = False):
+        """ Return the id of ``term``, `None` if it is unknown and ``add``
+        is `False`. """
+
+        key = encode_term(term)
+        term_id = self.__new.get(key) or self.__ids.get(key)
+        if term_id is None:
+            term_id = self.__find(key)
+            if term_id is not None:
+                self.__ids.set(key, term_id)
+
+        if term_id is None and add:
+            self.__new_keys.append(key)
+            term_id = self.__new[key] = len(self)
+
+        return term_id
+
+    def ids(self, terms, add = False):
+        """ Return the ids of ``terms`` like :meth:`id`.
+
+        The terms that are not cached are sorted and looked up in one pass
+        over the stored terms, which is faster than :meth:`id` for many
+        terms.
+
+        """
+
+        keys = [encode_term(term) for term in terms]
+        found, missing = {}, []
+        for key in set(keys):
+            term_id = self.__new.get(key) or self.__ids.get(key)
+            if term_id is None:
+                missing.append(key)
+            else:
+                found[key] = term_id
+
+        missing.sort()
+        position = 0
+        for key in missing:
+            position = gallop(self.__less(key), position, len(self.__sorted))
+            term_id = self.__stored(key, position)
+            if term_id is not None:
+                found[key] = term_id
+                self.__ids.set(key, term_id)
+
+        ids = []
+        for key in keys:
+            term_id = found.get(key)
+            if term_id is None and add:
+                self.__new_keys.append(key)
+                term_id = found[key] = self.__new[key] = len(self)
+            ids.append(term_id)
+
+        return ids
+
+    def term(self, term_id):
+        """ Return the term with id ``term_id``. """
+
+        term = self.__terms.get(term_id)
+        if term is None:
+            term = decode_term(self.__key(term_id))
+            self.__terms.set(term_id, term)
+
+        return term
+
+    def flush(self):
+        """ Write the terms added since the last flush to disk. """
+
+        if not self.__path or not self.__new_keys:
+            return
+
+        # Merge ids of new terms into the sorted ids, while stored terms
+        # can still be read.
+        new = [(key, self.__new[key]) for key in self.__new_keys]
+        new.sort()
+        changes, position = [], 0
+        for key, term_id in new:
+            position = gallop(self.__less(key), position, len(self.__sorted))
+            changes.append((position, False, (term_id,)))
+        merged = write_merged(self.__file("terms.srt"), self.__sorted, changes)
+
+        offsets = []
+        end = len(self.__data.data)
+        if not self.__count:
+            offsets.append(0)
+        for key in self.__new_keys:
+            end += len(key)
+            offsets.append(end)
+
+        self.__close()
+        data = open(self.__file("terms.dat"), "ab")
+        try:
+            data.write("".join(self.__new_keys))
+        finally:
+            data.close()
+        output = open(self.__file("terms.off"), "ab")
+        try:
+            write_values(output, offsets, "Q")
+        finally:
+            output.close()
+        replace_file(merged, self.__file("terms.srt"))
+        self.__open()
+
+    def close(self):
+        """ Flush and close the files. """
+
+        self.flush()
+        self.__close()
+
+class QuadIndex(object):
+    """ Index of quads of RDF terms, see the module documentation.
+
+    ``path`` is the directory of the index files, it is created if needed.
+    If it is `None`, the index is kept in memory only.
+
+    Once ``flush_threshold`` quads are added or removed, the changes are
+    flushed to disk.
+
+    All operations are thread safe.
+
+    """
+
+    def __init__(self, path = None, flush_threshold = DEFAULT_FLUSH_THRESHOLD,
+                 cache_size = DEFAULT_CACHE_SIZE):
+        if path and not exists(path):
+            os.makedirs(path)
+
+        self.__path = path
+        self.__flush_threshold = flush_threshold
+        self.__lock = RLock()
+        self.__terms = TermDictionary(path, cache_size)
+        self.__permutations = {}
+        self.__open()
+        self.__reset_changes()
+
+    path = property(fget = lambda self: self.__path)
+    """ Directory of the index files, `None` for in memory indexes. """
+
+    terms = property(fget = lambda self: self.__terms)
+    """ The :class:`TermDictionary` of the index. """
+
+    def __file(self, name):
+        return self.__path and join(self.__path, name + ".idx") or None
+
+    def __open(self):
+        for name in PERMUTATIONS:
+            self.__permutations[name] = RecordFile(self.__file(name), QUAD)
+
+    def __close(self):
+        for records in self.__permutations.values():
+            records.close()
+
+    def __reset_changes(self):
+        self.__added = set()
+        # Added quads by position and term id, to look them up.
+        self.__added_by = ({}, {}, {}, {})
+        self.__removed = set()
+
+    def __len__(self):
+        self.__lock.acquire()
+        try:
+            return (len(self.__permutations["spoc"]) - len(self.__removed)
+                    + len(self.__added))
+        finally:
+            self.__lock.release()
+
+    def __id(self, term, add = False):
+        if term is None:
+            return DEFAULT_CONTEXT
+        return self.__terms.id(term, add)
+
+    def __pattern(self, (s, p, o), contexts):
+        """ Return the ids of the pattern terms and of the ``contexts``, or
+        `None` if there can't be a match. """
+
+        pattern = []
+        for term in (s, p, o):
+            if term is None:
+                pattern.append(None)
+            else:
+                term_id = self.__terms.id(term)
+                if term_id is None:
+                    return None
+                pattern.append(term_id)
+
+        context_ids = None
+        if contexts is not None:
+            context_ids = set([self.__id(c) for c in contexts])
+            context_ids.discard(None)
+            if not context_ids:
+                return None
+
+        return tuple(pattern), context_ids
+
+    def __stored(self, quad):
+        start, stop = bisect_prefix(self.__permutations["spoc"], quad)
+        return start < stop
+
+    def __match(self, pattern, contexts):
+        """ Iterate over the quads of ids matching ``pattern`` and
+        ``contexts``. """
+
+        s, p, o = pattern
+        if s is not None and p is not None:
+            name, prefix = "spoc", [s, p] + (o is not None and [o] or [])
+        elif s is not None and o is not None:
+            name, prefix = "ospc", [o, s]
+        elif s is not None:
+            name, prefix = "spoc", [s]
+        elif p is not None:
+            name, prefix = "posc", [p] + (o is not None and [o] or [])
+        elif o is not None:
+            name, prefix = "ospc", [o]
+        else:
+            name, prefix = "spoc", []
+
+        def matches(quad):
+            for position in range(3):
+                if pattern[position] is not None and \
+                        quad[position] != pattern[position]:
+                    return False
+            return contexts is None or quad[3] in contexts
+
+        records = self.__permutations[name]
+        permutation = PERMUTATIONS[name]
+        start, stop = bisect_prefix(records, tuple(prefix))
+        for position in range(start, stop):
+            record = records[position]
+            quad = [None] * 4
+            for index in range(4):
+                quad[permutation[index]] = record[index]
+            quad = tuple(quad)
+            if quad not in self.__removed and matches(quad):
+                yield quad
+
+        candidates = self.__added
+        for position in range(3):
+            if pattern[position] is not None:
+                found = self.__added_by[position].get(pattern[position], ())
+                if len(found) < len(candidates):
+                    candidates = found
+        for quad in list(candidates):
+            if matches(quad):
+                yield quad
+
+    def quads(self, triple, contexts = None):
+        """ Return the `(s, p, o, c)` quads matching ``triple``, `None` being
+        a wildcard. ``c`` is `None` for the default context.
+
+        If ``contexts`` is given, only the quads in these contexts are
+        returned, `None` in ``contexts`` stands for the default context.
+
+        """
+
+        self.__lock.acquire()
+        try:
+            pattern = self.__pattern(triple, contexts)
+            if pattern is None:
+                return []
+
+            term = self.__terms.term
+            return [(term(s), term(p), term(o),
+                     c != DEFAULT_CONTEXT and term(c) or None)
+                    for s, p, o, c in self.__match(*pattern)]
+        finally:
+            self.__lock.release()
+
+    def contains(self, triple, contexts = None):
+        """ Return `True` if there is a quad matching ``triple``, see
+        :meth:`quads`. """
+
+        self.__lock.acquire()
+        try:
+            pattern = self.__pattern(triple, contexts)
+            if pattern is None:
+                return False
+
+            for _ in self.__match(*pattern):
+                return True
+            return False
+        finally:
+            self.__lock.release()
+
+    def add(self, quads):
+        """ Add the `(s, p, o, c)` ``quads``, ``c`` is `None` for the default
+        context. """
+
+        self.__lock.acquire()
+        try:
+            for s, p, o, c in quads:
+                quad = (self.__id(s, True), self.__id(p, True),
+                        self.__id(o, True), self.__id(c, True))
+                if quad in self.__removed:
+                    self.__removed.discard(quad)
+                elif quad not in self.__added and not self.__stored(quad):
+                    self.__added.add(quad)
+                    for position in range(4):
+                        self.__added_by[position].setdefault(quad[position],
+                                                             set()).add(quad)
+            self.__flush_if_needed()
+        finally:
+            self.__lock.release()
+
+    def load(self, quads):
+        """ Add the `(s, p, o, c)` ``quads`` like :meth:`add`, for bulk
+        loads.
+
+        The terms are looked up a chunk of quads at a time and quads are not
+        looked up in the index files, quads that are already stored are
+        dropped when the changes are merged. The changes are flushed before
+        returning.
+
+        """
+
+        if not self.__path:
+            self.add(quads)
+            return
+
+        quads = iter(quads)
+        self.__lock.acquire()
+        try:
+            while True:
+                chunk = list(islice(quads, self.__flush_threshold))
+                if not chunk:
+                    break
+                ids = iter(self.__terms.ids([term for quad in chunk
+                                             for term in quad
+                                             if term is not None], True))
+                for s, p, o, c in chunk:
+                    quad = (ids.next(), ids.next(), ids.next())
+                    if c is None:
+                        quad += (DEFAULT_CONTEXT,)
+                    else:
+                        quad += (ids.next(),)
+                    if quad in self.__removed:
+                        self.__removed.discard(quad)
+                    elif quad not in self.__added:
+                        self.__added.add(quad)
+                        for position in range(4):
+                            self.__added_by[position].setdefault(
+                                quad[position], set()).add(quad)
+                self.__flush_if_needed()
+            self.flush()
+        finally:
+            self.__lock.release()
+
+    def remove(self, triple, contexts = None):
+        """ Remove the quads matching ``triple``, only from ``contexts`` if
+        given, see :meth:`quads`. """
+
+        self.__lock.acquire()
+        try:
+            pattern = self.__pattern(triple, contexts)
+            if pattern is None:
+                return
+
+            for quad in list(self.__match(*pattern)):
+                if quad in self.__added:
+                    self.__added.discard(quad)
+                    for position in range(4):
+                        self.__added_by[position][quad[position]].discard(quad)
+                else:
+                    self.__removed.add(quad)
+            self.__flush_if_needed()
+        finally:
+            self.__lock.release()
+
+    def clear(self, contexts = None):
+        """ Remove all quads, or only those in ``contexts``. """
+
+        self.__lock.acquire()
+        try:
+            if contexts is not None:
+                self.remove((None, None, None), contexts)
+                return
+
+            self.__close()
+            for name in PERMUTATIONS:
+                if self.__path and exists(self.__file(name)):
+                    os.remove(self.__file(name))
+            self.__open()
+            self.__reset_changes()
+        finally:
+            self.__lock.release()
+
+    def __flush_if_needed(self):
+        changes = len(self.__added) + len(self.__removed)
+        if self.__path and changes >= self.__flush_threshold:
+            self.flush()
+
+    def flush(self):
+        """ Merge the changes into the index files. """
+
+        self.__lock.acquire()
+        try:
+            if not self.__path:
+                return
+
+            self.__terms.flush()
+            if not self.__added and not self.__removed:
+                return
+
+            # Only the changes are sorted, each is placed by a binary search
+            # and the stored records around them are copied as they are.
+            merged = {}
+            for name, permutation in PERMUTATIONS.items():
+                records = self.__permutations[name]
+                changes = []
+                for quads, deleted in [(self.__removed, True),
+                                       (self.__added, False)]:
+                    permuted = [tuple([quad[i] for i in permutation])
+                                for quad in quads]
+                    permuted.sort()
+                    low = 0
+                    for record in permuted:
+                        less = lambda position: records[position] < record
+                        low = gallop(less, low, len(records))
+                        # Quads added by load() may be stored already.
+                        stored = low < len(records) and records[low] == record
+                        if deleted == stored:
+                            changes.append((low, deleted, record))
+                changes.sort()
+                merged[name] = write_merged(self.__file(name), records,
+                                            changes)
+
+            self.__close()
+            for name, temporary in merged.items():
+                replace_file(temporary, self.__file(name))
+            self.__open()
+            self.__reset_changes()
+        finally:
+            self.__lock.release()
+
+    def close(self):
+        """ Flush the changes and close the index files. """
+
+        self.__lock.acquire()
+        try:
+            self.flush()
+            self.__close()
+            self.__terms.close()
+        finally:
+            self.__lock.release()
@@ -0,0 +1,317 @@
+# Copyright (c) 2009, Digital Enterprise Research Institute (DERI),
+# NUI Galway
+# All rights reserved.
+
+# author: Cosmin Basca
+# email: cosmin.basca@gmail.com
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer
+#      in the documentation and/or other materials provided with
+#      the distribution.
+#    * Neither the name of DERI nor the
+#      names of its contributors may be used to endorse or promote
+#      products derived from this software without specific prior
+#      written permission.
+
+# THIS SOFTWARE IS PROVIDED BY DERI ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DERI BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# -*- coding: utf-8 -*-
+""" Reader plugin for the memory-mapped quad index. """
+
+from surf.plugin.reader import RDFReader
+from surf.query import a
+from surf.rdf import URIRef
+from surf.resource.util import Q
+
+from surf_mmap.index import QuadIndex
+from surf_mmap.index import DEFAULT_CACHE_SIZE, DEFAULT_FLUSH_THRESHOLD
+
+class MmapReaderException(Exception): pass
+
+class ReaderPlugin(RDFReader):
+    """ Reader plugin answering lookups from a :class:`QuadIndex`.
+
+    There is no SPARQL engine, :meth:`get`, :meth:`load`,
+    :meth:`instances_by_attribute`, :meth:`get_by` and friends are answered
+    from the index directly, with the same results as the queries of
+    :class:`surf.plugin.query_reader.RDFQueryReader`. :meth:`get_by`
+    doesn't support SPARQL `filter` expressions.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        RDFReader.__init__(self, *args, **kwargs)
+
+        self.__path = kwargs.get("path")
+        try:
+            self.__flush_threshold = int(kwargs.get("flush_threshold",
+                                                    DEFAULT_FLUSH_THRESHOLD))
+            self.__cache_size = int(kwargs.get("cache_size", DEFAULT_CACHE_SIZE))
+        except (TypeError, ValueError):
+            raise ValueError("The flush_threshold and cache_size parameters must be integers")
+
+        self.__index = QuadIndex(self.__path, self.__flush_threshold,
+                                 self.__cache_size)
+
+    path = property(lambda self: self.__path)
+    flush_threshold = property(lambda self: self.__flush_threshold)
+    cache_size = property(lambda self: self.__cache_size)
+    index = property(lambda self: self.__index)
+
+    #protected interface
+    def _get(self, subject, attribute, direct, query_contexts):
+        contexts = query_contexts or None
+        values = {}
+        for value in self.__values(subject, attribute, direct, contexts):
+            values[value] = self.__value_types(value, contexts)
+
+        return values
+
+    def _load(self, subject, direct, query_contexts):
+        contexts = query_contexts or None
+        if direct:
+            pattern = (subject, None, None)
+        else:
+            pattern = (None, None, subject)
+
+        results = {}
+        for s, p, o, _ in self.__index.quads(pattern, contexts):
+            value = direct and o or s
+            if value in results.get(p, {}):
+                continue
+
+            # Like query_S, take the context of the rdf:type statement if
+            # value is one of the subject's types.
+            type_contexts = self.__contexts((subject, a, value), contexts)
+            if type_contexts:
+                concepts = self.__values(value, a, True, contexts)
+                types = dict([(c, list(concepts)) for c in type_contexts])
+            else:
+                types = self.__value_types(value, contexts)
+            results.setdefault(p, {})[value] = types
+
+        return results
+
+    def _is_present(self, subject, query_contexts):
+        return self.__index.contains((subject, None, None), query_contexts or None)
+
+    def _has_value(self, subject, attribute, value, direct, query_contexts):
+        s, v = direct and (subject, value) or (value, subject)
+        return self.__index.contains((s, attribute, v), query_contexts or None)
+
+    def _count_values(self, subject, attribute, direct, query_contexts):
+        return len(self.__values(subject, attribute, direct,
+                                query_contexts or None))
+
+    def _concept(self, subject):
+        return self.__values(subject, a, True, None)
+
+    def _instances_by_attribute(self, concept, attributes, direct, context):
+        contexts = context and [context] or None
+        subjects = None
+        for attribute in attributes:
+            if type(attribute) is not URIRef:
+                continue
+
+            if direct:
+                position = 0
+            else:
+                position = 2
+            found = set([quad[position] for quad
+                         in self.__index.quads((None, attribute, None), contexts)])
+            if subjects is None:
+                subjects = found
+            else:
+                subjects &= found
+
+        return dict([(subject, self.__value_types(subject, contexts))
+                     for subject in subjects or []])
+
+    def _get_by(self, params):
+        contexts = params.get("contexts") or None
+        subjects = self.__get_by_subjects(params, contexts)
+
+        results = []
+        for subject in subjects:
+            if "full" not in params:
+                types = {}
+                for context, concepts in self.__value_types(subject, contexts).items():
+                    for concept in concepts:
+                        types.setdefault(concept, {context : []})
+                results.append((subject, {"direct" : {a : types}}))
+                continue
+
+            instance_data = {}
+            instance_data["direct"] = self.__restrict(
+                self._load(subject, True, contexts), True, params)
+            if not params.get("only_direct"):
+                instance_data["inverse"] = self.__restrict(
+                    self._load(subject, False, contexts), False, params)
+            results.append((subject, instance_data))
+
+        return results
+
+    def _count_by(self, params):
+        return len(self.__get_by_subjects(params, params.get("contexts") or None,
+                                          ordered = False))
+
+    def __values(self, subject, attribute, direct, contexts):
+        """ Return the distinct values of ``attribute``. """
+
+        if direct:
+            pattern, position = (subject, attribute, None), 2
+        else:
+            pattern, position = (None, attribute, subject), 0
+
+        seen = set()
+        values = []
+        for quad in self.__index.quads(pattern, contexts):
+            if quad[position] not in seen:
+                seen.add(quad[position])
+                values.append(quad[position])
+
+        return values
+
+    def __contexts(self, triple, contexts):
+        """ Return the distinct contexts ``triple`` is in. """
+
+        found = []
+        for quad in self.__index.quads(triple, contexts):
+            if quad[3] not in found:
+                found.append(quad[3])
+
+        return found
+
+    def __value_types(self, value, contexts):
+        """ Return the rdf:types of ``value`` as a dictionary
+        `{context : [concept, ...]}`, the shape `convert` gives them. """
+
+        types = {}
+        for _, _, concept, context in self.__index.quads((value, a, None),
+                                                         contexts):
+            concepts = types.setdefault(context, [])
+            if concept not in concepts:
+                concepts.append(concept)
+
+        return types or {None : []}
+
+    def __restrict(self, data, direct, params):
+        """ Leave out the predicates excluded by `only` and `defer`. """
+
+        only, defer = params.get("only"), params.get("defer") or []
+        for predicate in data.keys():
+            if direct and predicate == a:
+                continue
+            if (only is not None and (predicate, direct) not in only) \
+                    or (predicate, direct) in defer:
+                del data[predicate]
+
+        return data
+
+    def __get_by_subjects(self, params, contexts, ordered = True):
+        """ Return the subjects matching `get_by` parameters, ordered and
+        limited as requested. """
+
+        if params.get("filter"):
+            raise MmapReaderException("SPARQL filters are not supported")
+
+        if params.get("get_by"):
+            subjects = self.__evaluate(params["get_by"], contexts)
+        else:
+            subjects = set([quad[0] for quad
+                            in self.__index.quads((None, None, None), contexts)])
+
+        order = params.get("order")
+        if ordered and order and order is not True:
+            keys = dict([(subject, self.__order_key(subject, order, contexts))
+                         for subject in subjects])
+            subjects = sorted(subjects, key = keys.get)
+        else:
+            subjects = sorted(subjects)
+        if ordered and order and params.get("desc"):
+            subjects.reverse()
+
+        offset = params.get("offset") or 0
+        limit = params.get("limit")
+        if limit is not None:
+            return subjects[offset:offset + limit]
+        return subjects[offset:]
+
+    def __evaluate(self, q_obj, contexts):
+        """ Return the subjects matching the `get_by` :class:`Q` tree. """
+
+        subjects = None
+        for child in q_obj.children:
+            if isinstance(child, Q):
+                found = self.__evaluate(child, contexts)
+            else:
+                found = self.__attribute_subjects(child, contexts)
+
+            if subjects is None:
+                subjects = found
+            elif q_obj.connection == Q.OR:
+                subjects |= found
+            else:
+                subjects &= found
+
+        return subjects or set()
+
+    def __attribute_subjects(self, (edges, values), contexts):
+        """ Return the subjects reaching one of ``values`` through the path
+        of ``edges``. """
+
+        if not hasattr(values, "__iter__"):
+            values = [values]
+
+        current = set(values)
+        for attribute, direct in reversed(edges):
+            found = set()
+            for value in current:
+                found.update(self.__values(value, attribute, not direct,
+                                           contexts))
+            current = found
+
+        return current
+
+    def __order_key(self, subject, edges, contexts):
+        """ Return the sort key of ``subject`` when ordering by the value at
+        the end of the path of ``edges``, the smallest one if there are
+        several. Subjects without value come first, like in SPARQL. """
+
+        current = [subject]
+        for attribute, direct in edges:
+            found = []
+            for value in current:
+                found.extend(self.__values(value, attribute, direct, contexts))
+            current = found
+
+        keys = []
+        for value in current:
+            if hasattr(value, "toPython"):
+                keys.append((3, value.toPython()))
+            elif isinstance(value, URIRef):
+                keys.append((2, unicode(value)))
+            else:
+                keys.append((1, unicode(value)))
+
+        return keys and min(keys) or (0,)
+
+    def close(self):
+        self.__index.close()
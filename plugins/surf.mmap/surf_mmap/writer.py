@@ -0,0 +1,162 @@
+# Copyright (c) 2009, Digital Enterprise Research Institute (DERI),
+# NUI Galway
+# All rights reserved.
+
+# author: Cosmin Basca
+# email: cosmin.basca@gmail.com
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer
+#      in the documentation and/or other materials provided with
+#      the distribution.
+#    * Neither the name of DERI nor the
+#      names of its contributors may be used to endorse or promote
+#      products derived from this software without specific prior
+#      written permission.
+
+# THIS SOFTWARE IS PROVIDED BY DERI ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DERI BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# -*- coding: utf-8 -*-
+""" Writer plugin for the memory-mapped quad index. """
+
+import logging
+import warnings
+
+from surf.plugin.writer import RDFWriter
+from surf.rdf import ConjunctiveGraph
+
+from surf_mmap.index import QuadIndex
+from surf_mmap.index import DEFAULT_CACHE_SIZE, DEFAULT_FLUSH_THRESHOLD
+from surf_mmap.reader import ReaderPlugin
+
+class WriterPlugin(RDFWriter):
+    """ Writer plugin storing statements in a :class:`QuadIndex`, shared
+    with the reader if it is a :class:`surf_mmap.reader.ReaderPlugin`. """
+
+    def __init__(self, reader, *args, **kwargs):
+        RDFWriter.__init__(self, reader, *args, **kwargs)
+        if isinstance(self.reader, ReaderPlugin):
+            self.__index = self.reader.index
+        else:
+            try:
+                flush_threshold = int(kwargs.get("flush_threshold",
+                                                 DEFAULT_FLUSH_THRESHOLD))
+                cache_size = int(kwargs.get("cache_size", DEFAULT_CACHE_SIZE))
+            except (TypeError, ValueError):
+                raise ValueError("The flush_threshold and cache_size parameters must be integers")
+
+            self.__index = QuadIndex(kwargs.get("path"), flush_threshold,
+                                     cache_size)
+
+            warnings.warn("Index is not readable through the reader plugin",
+                          UserWarning)
+
+    index = property(lambda self: self.__index)
+
+    def _save(self, *resources):
+        quads = []
+        for resource in resources:
+            s = resource.subject
+            self.__remove(s, context = resource.context)
+            for p, objs in resource.rdf_direct.items():
+                for o in objs:
+                    quads.append((s, p, o, resource.context))
+
+        self.__add_many(quads)
+
+    def _update(self, *resources):
+        quads = []
+        for resource in resources:
+            s = resource.subject
+            context = resource.context
+            for p, (added, removed) in resource.rdf_changes.items():
+                if removed is None:
+                    self.__remove(s, p, context = context)
+                else:
+                    for o in removed:
+                        self.__remove(s, p, o, context)
+                for o in added:
+                    quads.append((s, p, o, context))
+
+        self.__add_many(quads)
+
+    def _remove(self, *resources, **kwargs):
+        inverse = kwargs.get("inverse")
+        for resource in resources:
+            self.__remove(s = resource.subject, context = resource.context)
+            if inverse:
+                self.__remove(o = resource.subject, context = resource.context)
+
+    def _size(self):
+        return len(self.__index)
+
+    def _add_triple(self, s = None, p = None, o = None, context = None):
+        self.__add_many([(s, p, o, context)])
+
+    def _set_triple(self, s = None, p = None, o = None, context = None):
+        self.__remove(s, p, context = context)
+        self.__add_many([(s, p, o, context)])
+
+    def _remove_triple(self, s = None, p = None, o = None, context = None):
+        self.__remove(s, p, o, context)
+
+    def __add_many(self, quads):
+        if self.log.isEnabledFor(logging.INFO):
+            for s, p, o, context in quads:
+                self.log.info('ADD: %s, %s, %s, %s', s, p, o, context)
+
+        self.__index.add(quads)
+
+    def __remove(self, s = None, p = None, o = None, context = None):
+        """ Remove matching statements from ``context``, from all contexts
+        if it is `None`. """
+
+        self.log.info('REM: %s, %s, %s, %s', s, p, o, context)
+        self.__index.remove((s, p, o), context and [context] or None)
+
+    def index_triples(self, **kwargs):
+        """ Merge pending changes into the index files.
+
+        Return `True` if successful.
+
+        """
+
+        self.__index.flush()
+        return True
+
+    def load_triples(self, source = None, publicID = None, format = "xml",
+                     context = None, **args):
+        """ Load files (or resources on the web) into the index, into
+        ``context`` if given. """
+
+        if source:
+            graph = ConjunctiveGraph()
+            graph.parse(source, publicID = publicID, format = format, **args)
+            self.__index.load([(s, p, o, context) for s, p, o in graph])
+            return True
+
+        return False
+
+    def _clear(self, context = None):
+        """ Clear ``context``, all contexts if it is `None`. """
+
+        self.__index.clear(context and [context] or None)
+
+    def close(self):
+        self.__index.close()
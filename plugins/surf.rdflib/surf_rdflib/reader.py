@@ -41,9 +41,20 @@ except Exception, e:
     from simplejson import loads
 
 from surf.plugin.query_reader import RDFQueryReader
+from surf.plugin.reader import RDFReader
+from surf.query import a
 from surf.rdf import ConjunctiveGraph
 
 class ReaderPlugin(RDFQueryReader):
+    """ Reader plugin for rdflib graphs.
+
+    Lookups of single triple patterns (:meth:`get`, :meth:`load`,
+    :meth:`is_present`, :meth:`concept` and friends) are answered from the
+    graph indexes, without going through the SPARQL engine. The results
+    are the same as those of the queries :class:`RDFQueryReader` would run.
+
+    """
+
     def __init__(self, *args, **kwargs):
         RDFQueryReader.__init__(self, *args, **kwargs)
 
@@ -61,6 +72,150 @@ class ReaderPlugin(RDFQueryReader):
     commit_pending_transaction_on_close = \
         property(lambda self: self.__commit_pending_transaction_on_close)
 
+    #protected interface
+    def _get(self, subject, attribute, direct, query_contexts):
+        graphs = self.__graphs(query_contexts)
+        values = {}
+        for value in self.__values(subject, attribute, direct, graphs):
+            values[value] = self.__value_types(value, graphs, query_contexts)
+
+        return values
+
+    def _get_many(self, subjects, attribute, direct, query_contexts):
+        # Index lookups are cheap, no need for batch queries.
+        return RDFReader._get_many(self, subjects, attribute, direct,
+                                   query_contexts)
+
+    def _load(self, subject, direct, query_contexts):
+        graphs = self.__graphs(query_contexts)
+        if direct:
+            pattern = (subject, None, None)
+        else:
+            pattern = (None, None, subject)
+
+        seen = set()
+        results = {}
+        for graph in graphs:
+            for s, p, o in self.__graph.triples(pattern, context = graph):
+                value = direct and o or s
+                if (p, value) in seen:
+                    continue
+                seen.add((p, value))
+
+                # query_S takes the context of the rdf:type statement,
+                # if value is one of the subject's types.
+                type_contexts = self.__contexts((subject, a, value),
+                                                query_contexts)
+                if type_contexts:
+                    concepts = self.__values(value, a, True, graphs)
+                    results.setdefault(p, {})[value] = \
+                        dict([(context, list(concepts))
+                              for context in type_contexts])
+                else:
+                    results.setdefault(p, {})[value] = \
+                        self.__value_types(value, graphs, query_contexts)
+
+        return results
+
+    def _is_present(self, subject, query_contexts):
+        for graph in self.__graphs(query_contexts):
+            for _ in self.__graph.triples((subject, None, None), context = graph):
+                return True
+
+        return False
+
+    def _has_value(self, subject, attribute, value, direct, query_contexts):
+        s, v = direct and (subject, value) or (value, subject)
+        for graph in self.__graphs(query_contexts):
+            for _ in self.__graph.triples((s, attribute, v), context = graph):
+                return True
+
+        return False
+
+    def _count_values(self, subject, attribute, direct, query_contexts):
+        graphs = self.__graphs(query_contexts)
+        return len(self.__values(subject, attribute, direct, graphs))
+
+    def _concept(self, subject):
+        return self.__values(subject, a, True, [None])
+
+    def _instances_by_values(self, concept, attribute, values, direct, context):
+        # One _get per value is cheaper than a batch query.
+        return RDFReader._instances_by_values(self, concept, attribute, values,
+                                              direct, context)
+
+    def __graphs(self, query_contexts):
+        """ Return the graphs to look into for ``query_contexts``, `None`
+        stands for the whole conjunctive graph. """
+
+        if not query_contexts:
+            return [None]
+
+        return [self.__graph.get_context(context) for context in query_contexts]
+
+    def __values(self, subject, attribute, direct, graphs):
+        """ Return the distinct values of ``attribute``, in the same order
+        as they are found in ``graphs``. """
+
+        if direct:
+            pattern, position = (subject, attribute, None), 2
+        else:
+            pattern, position = (None, attribute, subject), 0
+
+        seen = set()
+        values = []
+        for graph in graphs:
+            for triple in self.__graph.triples(pattern, context = graph):
+                value = triple[position]
+                if value not in seen:
+                    seen.add(value)
+                    values.append(value)
+
+        return values
+
+    def __contexts(self, triple, query_contexts):
+        """ Return the identifiers of the contexts ``triple`` is in,
+        limited to ``query_contexts`` if given, `None` for the default
+        context. """
+
+        if not self.__has_triple(triple):
+            return []
+
+        default = self.__graph.default_context.identifier
+        contexts = []
+        for graph in self.__graph.contexts(triple):
+            identifier = graph.identifier
+            # Statements added without a context are reported as such.
+            if identifier == default:
+                identifier = None
+            if query_contexts and identifier not in query_contexts:
+                continue
+            if identifier not in contexts:
+                contexts.append(identifier)
+
+        return contexts
+
+    def __has_triple(self, triple):
+        for _ in self.__graph.triples(triple):
+            return True
+
+        return False
+
+    def __value_types(self, value, graphs, query_contexts):
+        """ Return the rdf:types of ``value`` as a dictionary
+        `{context : [concept, ...]}`, like `convert(result, 'g', 'c')` does
+        for the optional type patterns of :func:`query_SP`. """
+
+        types = {}
+        for concept in self.__values(value, a, True, graphs):
+            contexts = self.__contexts((value, a, concept), query_contexts)
+            for context in contexts or [None]:
+                concepts = types.setdefault(context, [])
+                if concept not in concepts:
+                    concepts.append(concept)
+
+        return types or {None : []}
+
     def _to_table(self, result):
         # Elements in result.selectionF are instances of rdflib.Variable,
         # rdflib.Variable is subclass of unicode. We convert them to 
@@ -70,6 +225,11 @@ class ReaderPlugin(RDFQueryReader):
         # Convert each row to dict: { var->value, ... }
         return [dict(zip(vars, row)) for row in result]
 
+    def _count_by(self, params):
+        # rdflib's SPARQL engine doesn't support aggregates, let
+        # ResultProxy count loaded results instead.
+        return None
+
     def _ask(self, result):
         # askAnswer is list with boolean values, we want first value. 
         return result.askAnswer[0]
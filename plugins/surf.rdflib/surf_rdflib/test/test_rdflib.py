@@ -3,6 +3,7 @@
 from unittest import TestCase
 
 import surf
+from surf.rdf import Literal, URIRef
 from surf.test.plugin import PluginTestMixin
 
 class RdflibTestMixin(object):
@@ -31,3 +32,91 @@ class RdflibTestMixin(object):
 
 class StandardPluginTest(TestCase, RdflibTestMixin, PluginTestMixin):
     pass
+
+class TestReaderIndexLookups(TestCase):
+    """ Tests for the lookups answered from rdflib graph indexes. """
+
+    def test_lookups(self):
+        """ Test get, load, is_present and concept without SPARQL. """
+
+        store = surf.Store(reader = "rdflib", writer = "rdflib")
+        reader = store.reader
+        def no_sparql(query):
+            raise AssertionError("Unexpected query: %s" % query)
+        reader._execute = no_sparql
+
+        a, Person = surf.ns.RDF.type, surf.ns.FOAF.Person
+        name, knows = surf.ns.FOAF.name, surf.ns.FOAF.knows
+        john, jane = URIRef("http://John"), URIRef("http://Jane")
+        context = URIRef("http://context")
+        graph = reader.graph.get_context(context)
+        graph.add((john, a, Person))
+        graph.add((john, knows, jane))
+        reader.graph.add((john, name, Literal("John")))
+        reader.graph.add((jane, a, Person))
+
+        self.assertEquals(reader._get(john, knows, True, None),
+                          {jane : {None : [Person]}})
+        self.assertEquals(reader._get(jane, knows, False, None),
+                          {john : {context : [Person]}})
+        self.assertEquals(reader._load(john, True, None),
+                          {a : {Person : {context : []}},
+                           knows : {jane : {None : [Person]}},
+                           name : {Literal("John") : {None : []}}})
+        # Only statements in the query contexts.
+        self.assertEquals(reader._load(john, True, [context]),
+                          {a : {Person : {context : []}},
+                           knows : {jane : {None : []}}})
+        self.assertEquals(reader._count_values(john, knows, True, None), 1)
+        self.assertTrue(reader._has_value(john, knows, jane, True, [context]))
+        self.assertTrue(reader._is_present(jane, None))
+        self.assertFalse(reader._is_present(jane, [context]))
+        self.assertEquals(reader._concept(john), [Person])
+
+class TestWriterContexts(TestCase):
+    """ Tests for the context-aware writes of the rdflib writer. """
+
+    def test_save_update_in_context(self):
+        """ Test that resources are written in bulk, in their context. """
+
+        store = surf.Store(reader = "rdflib", writer = "rdflib")
+        session = surf.Session(store, mapping = {})
+        graph = store.writer.graph
+        batches = []
+        addN = graph.addN
+        def counting_addN(quads):
+            batches.append(quads)
+            return addN(quads)
+        graph.addN = counting_addN
+
+        john_uri = URIRef("http://John")
+        context, other = URIRef("http://context"), URIRef("http://other")
+        graph.get_context(other).add((john_uri, surf.ns.FOAF.nick, Literal("J")))
+
+        Person = session.get_class(surf.ns.FOAF.Person)
+        john = session.get_resource(john_uri, Person, context = context)
+        jane = session.get_resource("http://Jane", Person)
+        john.foaf_name = "John"
+        jane.foaf_name = "Jane"
+        store.save(john, jane)
+        self.assertEquals(len(batches), 1)
+
+        named = graph.get_context(context)
+        self.assertEquals(set(named.predicate_objects(john_uri)),
+                          set([(surf.ns.RDF.type, Person.uri),
+                               (surf.ns.FOAF.name, Literal("John"))]))
+        # Statements in other contexts are left alone.
+        self.assertEquals(list(graph.get_context(other).objects(john_uri)),
+                          [Literal("J")])
+        self.assertEquals(list(graph.default_context.objects(jane.subject,
+                                                             surf.ns.FOAF.name)),
+                          [Literal("Jane")])
+
+        john.foaf_name = "Johnny"
+        john.update()
+        self.assertEquals(list(named.objects(john_uri, surf.ns.FOAF.name)),
+                          [Literal("Johnny")])
+
+        store.clear(context)
+        self.assertEquals(len(named), 0)
+        self.assertEquals(len(graph), 3)
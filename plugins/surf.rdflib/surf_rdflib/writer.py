@@ -35,6 +35,7 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Cosmin Basca'
 
+import logging
 import warnings
 
 from surf.plugin.writer import RDFWriter
@@ -70,32 +71,42 @@ class WriterPlugin(RDFWriter):
 
 
     def _save(self, *resources):
+        quads = []
         for resource in resources:
             s = resource.subject
-            self.__remove(s)
+            self.__remove(s, context = resource.context)
+            graph = self.__context(resource.context)
             for p, objs in resource.rdf_direct.items():
                 for o in objs:
-                    self.__add(s, p, o)
+                    quads.append((s, p, o, graph))
 
+        self.__add_many(quads)
         self.__graph.commit()
 
     def _update(self, *resources):
+        quads = []
         for resource in resources:
             s = resource.subject
-            for p in resource.rdf_direct:
-                self.__remove(s, p)
-            for p, objs in resource.rdf_direct.items():
-                for o in objs:
-                    self.__add(s, p, o)
-
+            context = resource.context
+            graph = self.__context(context)
+            for p, (added, removed) in resource.rdf_changes.items():
+                if removed is None:
+                    self.__remove(s, p, context = context)
+                else:
+                    for o in removed:
+                        self.__remove(s, p, o, context)
+                for o in added:
+                    quads.append((s, p, o, graph))
+
+        self.__add_many(quads)
         self.__graph.commit()
 
     def _remove(self, *resources, **kwargs):
         inverse = kwargs.get("inverse")
         for resource in resources:
-            self.__remove(s = resource.subject)
+            self.__remove(s = resource.subject, context = resource.context)
             if inverse:
-                self.__remove(o = resource.subject)
+                self.__remove(o = resource.subject, context = resource.context)
 
         self.__graph.commit()
 
@@ -112,13 +123,34 @@ class WriterPlugin(RDFWriter):
     def _remove_triple(self, s = None, p = None, o = None, context = None):
         self.__remove(s, p, o, context)
 
+    def __context(self, context):
+        """ Return the graph statements in ``context`` are added to, the
+        default context of the graph if ``context`` is `None`. """
+
+        if context:
+            return self.__graph.get_context(context)
+
+        return self.__graph.default_context
+
     def __add(self, s = None, p = None, o = None, context = None):
-        self.log.info('ADD: %s, %s, %s, %s' % (s, p, o, context))
-        self.__graph.add((s, p, o))
+        self.__add_many([(s, p, o, self.__context(context))])
+
+    def __add_many(self, quads):
+        if self.log.isEnabledFor(logging.INFO):
+            for s, p, o, graph in quads:
+                self.log.info('ADD: %s, %s, %s, %s', s, p, o, graph.identifier)
+
+        self.__graph.addN(quads)
 
     def __remove(self, s = None, p = None, o = None, context = None):
-        self.log.info('REM: %s, %s, %s, %s' % (s, p, o, context))
-        self.__graph.remove((s, p, o))
+        """ Remove matching statements from ``context``, from all contexts
+        if it is `None`. """
+
+        self.log.info('REM: %s, %s, %s, %s', s, p, o, context)
+        if context:
+            self.__graph.get_context(context).remove((s, p, o))
+        else:
+            self.__graph.remove((s, p, o))
 
     def index_triples(self, **kwargs):
         """ Index triples if this functionality is present.  
@@ -140,9 +172,10 @@ class WriterPlugin(RDFWriter):
         return False
 
     def _clear(self, context = None):
-        """ Clear the triple-store. """
+        """ Clear the triple-store, or only ``context`` if given. """
 
-        self.__graph.remove((None, None, None))
+        self.__remove(context = context)
+        self.__graph.commit()
 
     def close(self):
         self.__graph.close(commit_pending_transaction = self.__commit_pending_transaction_on_close)
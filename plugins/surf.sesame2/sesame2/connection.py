@@ -0,0 +1,191 @@
+# Copyright (c) 2009, Digital Enterprise Research Institute (DERI),
+# NUI Galway
+# All rights reserved.
+
+# author: Cosmin Basca
+# email: cosmin.basca@gmail.com
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer
+#      in the documentation and/or other materials provided with
+#      the distribution.
+#    * Neither the name of DERI nor the
+#      names of its contributors may be used to endorse or promote
+#      products derived from this software without specific prior
+#      written permission.
+
+# THIS SOFTWARE IS PROVIDED BY DERI ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DERI BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# -*- coding: utf-8 -*-
+""" Pool of persistent connections to a Sesame2 HTTP server. """
+
+from threading import BoundedSemaphore, Lock
+
+DEFAULT_POOL_SIZE = 4
+
+class ConnectionPool(object):
+    """ A thread-safe pool of persistent :class:`sesame2.Sesame2`
+    connections, created by calling ``factory``.
+
+    The pool stands in for a single connection: calling one of its
+    methods, e.g. ``pool.sparql_query(...)``, borrows an idle connection
+    for the duration of the call. At most ``pool_size`` calls are in
+    flight at any time, callers beyond that block until a connection is
+    checked back in. Idle connections keep their socket open, so
+    consecutive requests do not pay for a new TCP handshake.
+
+    """
+
+    def __init__(self, factory, pool_size = DEFAULT_POOL_SIZE):
+        pool_size = int(pool_size)
+        if pool_size < 1:
+            raise ValueError("pool_size must be a positive integer")
+
+        self.__factory = factory
+        self.__pool_size = pool_size
+        self.__idle = []
+        self.__lock = Lock()
+        self.__slots = BoundedSemaphore(pool_size)
+
+    pool_size = property(lambda self: self.__pool_size)
+
+    def __checkout(self):
+        self.__slots.acquire()
+        self.__lock.acquire()
+        try:
+            if self.__idle:
+                return self.__idle.pop()
+        finally:
+            self.__lock.release()
+
+        try:
+            return self.__factory()
+        except:
+            self.__slots.release()
+            raise
+
+    def __checkin(self, connection):
+        self.__lock.acquire()
+        try:
+            self.__idle.append(connection)
+        finally:
+            self.__lock.release()
+        self.__slots.release()
+
+    def call(self, method, *args, **kwargs):
+        """ Call ``method`` of a pooled connection and return its result. """
+
+        connection = self.__checkout()
+        try:
+            return getattr(connection, method)(*args, **kwargs)
+        finally:
+            self.__checkin(connection)
+
+    def stream(self, method, *args, **kwargs):
+        """ Call ``method`` of a pooled connection, like :meth:`call`, for
+        methods returning an iterator that reads from the connection.
+
+        The iterator is returned as a :class:`PooledIterator`, which checks
+        the connection back in once it is exhausted, closed or garbage
+        collected. Other results are returned as they are.
+
+        """
+
+        connection = self.__checkout()
+        try:
+            result = getattr(connection, method)(*args, **kwargs)
+        except:
+            self.__checkin(connection)
+            raise
+
+        if not hasattr(result, "next"):
+            self.__checkin(connection)
+            return result
+
+        return PooledIterator(result, connection, self.__checkin)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def close(self):
+        """ Close all idle connections. """
+
+        self.__lock.acquire()
+        try:
+            idle, self.__idle = self.__idle, []
+        finally:
+            self.__lock.release()
+
+        for connection in idle:
+            connection.close()
+
+class PooledIterator(object):
+    """ Iterator over ``rows`` read from a pooled ``connection``.
+
+    The connection is handed to ``checkin`` when the rows are exhausted,
+    or when the iterator is closed or garbage collected before that. An
+    unfinished response can't be read by the next request, so the
+    connection is closed first in that case.
+
+    """
+
+    def __init__(self, rows, connection, checkin):
+        self.__rows = rows
+        self.__connection = connection
+        self.__checkin = checkin
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self.__rows is None:
+            raise StopIteration
+
+        try:
+            return self.__rows.next()
+        except StopIteration:
+            self.__release(True)
+            raise
+        except:
+            self.__release(False)
+            raise
+
+    def __release(self, complete):
+        if self.__rows is None:
+            return
+
+        rows, self.__rows = self.__rows, None
+        try:
+            if not complete:
+                if hasattr(rows, "close"):
+                    rows.close()
+                self.__connection.close()
+        finally:
+            self.__checkin(self.__connection)
+
+    def close(self):
+        """ Stop reading rows and check the connection back in. """
+
+        self.__release(False)
+
+    def __del__(self):
+        self.close()
@@ -36,9 +36,9 @@
 __author__ = 'Cosmin Basca'
 
 
-from surf.util import json_to_rdflib
 from surf.plugin.query_reader import RDFQueryReader
 from allegro import Allegro
+from connection import ConnectionPool, DEFAULT_POOL_SIZE
 
 class ReaderPlugin(RDFQueryReader):
     def __init__(self, *args, **kwargs):
@@ -58,6 +58,9 @@ class ReaderPlugin(RDFQueryReader):
         if not self.repository:
             raise Exception('No <repository> argument supplied.')
 
+        self.__connection_pool = ConnectionPool(self.__connect,
+                                                kwargs.get("pool_size", DEFAULT_POOL_SIZE))
+
         if self.__use_allegro_extensions:
             opened = self.get_allegro().open_repository(self.repository)
             self.log.info('ALLEGRO repository opened: %s' % opened)
@@ -68,6 +71,7 @@ class ReaderPlugin(RDFQueryReader):
     repository_path = property(lambda self: self.__repository_path)
     repository = property(lambda self: self.__repository)
     use_allegro_extensions = property(lambda self: self.__use_allegro_extensions)
+    connection_pool = property(lambda self: self.__connection_pool)
 
     def _to_table(self, result):
         return result
@@ -79,29 +83,38 @@ class ReaderPlugin(RDFQueryReader):
         return result
 
     def get_allegro(self):
-        return Allegro(self.server, self.port, self.root_path, 
+        ''' Return the pooled connection to the server, each call borrows
+        an open :class:`Allegro` connection. '''
+
+        return self.__connection_pool
+
+    def __connect(self):
+        return Allegro(self.server, self.port, self.root_path,
                        self.repository_path)
 
     # execute
     def _execute(self, query):
         q_string = unicode(query)
-        result = self.execute_sparql(q_string)
+        self.log.debug(q_string)
+        # Rows are converted while they are read from the server.
+        return self.get_allegro().stream('sparql_query', self.repository,
+                                         q_string,
+                                         infer = self.inference,
+                                         format = 'sparql+json',
+                                         stream = True)
 
-        if type(result) == bool:
-            return result
+    def execute(self, query):
+        """ Execute a `query` of type :class:`surf.query.Query`.
 
-        converted = []
-        for binding in result["results"]["bindings"]:
-            rdf_item = {}
-            for key, obj in binding.items():
-                try:
-                    rdf_item[key] = json_to_rdflib(obj)
-                except ValueError:
-                    continue
+        Rows are streamed only to the internal conversions, the public
+        result is a list, so it doesn't hold a pooled connection.
 
-            converted.append(rdf_item)
+        """
 
-        return converted
+        result = RDFQueryReader.execute(self, query)
+        if hasattr(result, "next"):
+            return list(result)
+        return result
 
     def execute_sparql(self, query, format='JSON'):
         try:
@@ -114,5 +127,5 @@ class ReaderPlugin(RDFQueryReader):
             self.log.exception("Exception on query")
 
     def close(self):
-        pass
+        self.__connection_pool.close()
 
@@ -37,73 +37,143 @@ __author__ = 'Cosmin Basca'
 
 import httplib
 import logging
+import re
+import socket
+from StringIO import StringIO
 from urllib import urlencode
-from xml.dom.minidom import parseString, getDOMImplementation
+from xml.dom.minidom import getDOMImplementation
 try:
-    from json import loads
+    from xml.etree.cElementTree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+try:
+    from json import JSONDecoder, loads
 except Exception, e:
-    from simplejson import loads
+    from simplejson import JSONDecoder, loads
 
 from surf.rdf import BNode, ConjunctiveGraph, Graph, Literal, Namespace, URIRef
+from surf.util import json_to_rdflib
+
+SPARQL_NS = '{http://www.w3.org/2005/sparql-results#}'
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+# Bytes read from the response at a time by the streaming parsers.
+CHUNK_SIZE = 65536
+
+BINDINGS = re.compile(r'"bindings"\s*:\s*\[')
+SEPARATORS = re.compile(r'[\s,]*')
+
+log = logging.getLogger(__name__)
+
+def _xml_term(node):
+    text = node.text or ''
+    tag = node.tag[len(SPARQL_NS):]
+    if tag == 'uri':
+        return URIRef(text)
+    elif tag == 'literal':
+        datatype = node.get('datatype')
+        return Literal(text, lang = node.get(XML_LANG),
+                       datatype = datatype and URIRef(datatype) or None)
+    elif tag == 'bnode':
+        return BNode(text)
+    return None
+
+def _iter_sparql_xml(events, results):
+    for event, node in events:
+        if event == 'end' and node.tag == SPARQL_NS + 'result':
+            row = {}
+            for binding in node:
+                for value in binding:
+                    row[binding.get('name')] = _xml_term(value)
+                    break
+            # Drop parsed results, only the current one is kept in memory.
+            results.clear()
+            yield row
 
 def parse_sparql_xml(response):
-        def get_text(node):
-            t = ""
-            for n in node.childNodes:
-                if n.nodeType == n.TEXT_NODE:
-                    t += n.nodeValue
-            return t
-
-        def get_binding(node):
-            cnt = None
-            for cn in node.childNodes:
-                if cn.nodeType == cn.ELEMENT_NODE:
-                    cnt = cn
-                    break
-            if cnt:
-                txt = get_text(cnt)
-                if cnt.nodeName == 'uri':
-                    return URIRef(txt)
-                elif cnt.nodeName == 'literal':
-                    return Literal(txt)
-                elif cnt.nodeName == 'bnode':
-                    return BNode(txt)
-            else:
-                return None
+    ''' Parse a SPARQL XML result document, ``response`` is a string or a
+    file-like object.
 
-        #print 'response ,',response
+    Return the boolean of an ASK result, or an iterator over the rows of a
+    SELECT result, as dictionaries of rdflib terms. Rows are parsed as they
+    are read from ``response``, literals keep their language and datatype.
+
+    '''
+
+    if isinstance(response, basestring):
+        response = StringIO(response)
+
+    try:
+        events = iterparse(response, ('start', 'end'))
+        for event, node in events:
+            if event == 'start' and node.tag == SPARQL_NS + 'results':
+                return _iter_sparql_xml(events, node)
+            elif event == 'end' and node.tag == SPARQL_NS + 'boolean':
+                return {'false': False, 'true': True}[node.text.strip()]
+    except (SyntaxError, KeyError), e:
+        log.error('NOT XML Response: %s' % e)
+    return []
+
+def _iter_sparql_json(response, data, position):
+    decoder = JSONDecoder()
+    while True:
+        position = SEPARATORS.match(data, position).end()
+        if data.startswith(']', position):
+            return
 
         try:
-            doc = parseString(response)
-            #head = doc.getElementsByTagName('head')[0]
-            #headers = []
-            #for h in head.childNodes:
-            #    if h.nodeType == h.ELEMENT_NODE:
-            #        headers.append(h.getAttribute('name'))
-            results_nodes = doc.getElementsByTagName('results')
-            if results_nodes:
-                results = results_nodes[0]
-                res_list = []
-                for result in results.childNodes:
-                    if result.nodeType == result.ELEMENT_NODE:
-                        res = {}
-                        for binding in result.childNodes:
-                            if binding.nodeType == binding.ELEMENT_NODE:
-                                res[binding.getAttribute('name')] = get_binding(binding)
-                        res_list.append(res)
-                return res_list
-            else:
-                boolean = doc.getElementsByTagName('boolean')[0]
-                value = boolean.childNodes[0].nodeValue
-                return {'false': False, 'true': True}[value]
-        except:
-            print 'NOT XML Response: %s' % response
-            return []
+            # Bindings are objects, they can't be decoded until complete.
+            binding, end = decoder.raw_decode(data, position)
+        except ValueError:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                raise ValueError('Truncated SPARQL JSON result')
+            data = data[position:] + chunk
+            position = 0
+            continue
+
+        row = {}
+        for key, value in binding.items():
+            try:
+                row[key] = json_to_rdflib(value)
+            except ValueError:
+                continue
+        position = end
+        yield row
+
+def parse_sparql_json(response):
+    ''' Parse a SPARQL JSON result document, ``response`` is a string or a
+    file-like object.
+
+    Return the boolean of an ASK result, or an iterator over the rows of a
+    SELECT result, like :func:`parse_sparql_xml`. Each binding is decoded
+    as soon as it has been read, the whole document is never in memory.
+
+    '''
+
+    if isinstance(response, basestring):
+        response = StringIO(response)
+
+    data = ''
+    while True:
+        chunk = response.read(CHUNK_SIZE)
+        data += chunk
+        match = BINDINGS.search(data)
+        if match:
+            return _iter_sparql_json(response, data, match.end())
+        elif not chunk:
+            # No bindings, the document is an ASK result.
+            return loads(data)['boolean']
 
-'''
-represents an RDF Transaction object
-'''
 class RDFTransaction(object):
+    """ Builder of `application/x-rdftransaction` documents, sent to the
+    server with :meth:`Sesame2.transaction`.
+
+    Operations are applied by the server in the order they are added, in
+    one request and one transaction.
+
+    """
+
     mime = 'application/x-rdftransaction'
 
     def __init__(self):
@@ -111,66 +181,62 @@ class RDFTransaction(object):
         self.transaction = impl.createDocument(None, 'transaction', None)
         self.root = self.transaction.documentElement
 
+    def __len__(self):
+        return len(self.root.childNodes)
+
     def _rdf_node(self, entity):
         node = None
-        if type(entity) is URIRef:
-            node = self.transaction.createElement('uri')
-            node.appendChild(self.transaction.createTextNode(unicode(entity)))
-        elif type(entity) is BNode:
-            node = self.transaction.createElement('bnode')
-            node.appendChild(self.transaction.createTextNode(unicode(entity)))
-        elif type(entity) is Literal:
+        if entity is None:
+            # Wildcard in remove operations.
+            node = self.transaction.createElement('null')
+        elif isinstance(entity, Literal):
             node = self.transaction.createElement('literal')
             node.appendChild(self.transaction.createTextNode(unicode(entity)))
-            if entity.lang:
-                node.setAttribute('xml:lang', entity.lang)
+            if entity.language:
+                node.setAttribute('xml:lang', entity.language)
             if entity.datatype:
                 node.setAttribute('datatype', entity.datatype)
+        elif isinstance(entity, BNode):
+            node = self.transaction.createElement('bnode')
+            node.appendChild(self.transaction.createTextNode(unicode(entity)))
+        else:
+            node = self.transaction.createElement('uri')
+            node.appendChild(self.transaction.createTextNode(unicode(entity)))
         return node
 
+    def _statement(self, name, s, p, o, contexts):
+        node = self.transaction.createElement(name)
+        for entity in (s, p, o):
+            node.appendChild(self._rdf_node(entity))
+        for context in contexts:
+            node.appendChild(self._rdf_node(context))
+        self.root.appendChild(node)
+
     def add_triple(self, s, p, o, context = None):
-        try:
-            node = self.transaction.createElement('add')
-            node.appendChild(self._rdf_node(s))
-            node.appendChild(self._rdf_node(p))
-            node.appendChild(self._rdf_node(o))
-            if context:
-                node.appendChild(self.transaction.createTextNode(unicode(context)))
-            self.root.appendChild(node)
-        except:
-            pass
+        """ Add the statement to ``context``, to the default context if it
+        is `None`. """
+
+        self._statement('add', s, p, o, context and [context] or [])
 
     def add(self, graph, context = None):
-        try:
-            node = self.transaction.createElement('add')
-            for s, p, o in graph:
-                node.appendChild(self._rdf_node(s))
-                node.appendChild(self._rdf_node(p))
-                node.appendChild(self._rdf_node(o))
-                if context:
-                    node.appendChild(self.transaction.createTextNode(unicode(context)))
-            self.root.appendChild(node)
-        except:
-            pass
+        for s, p, o in graph:
+            self.add_triple(s, p, o, context)
+
+    def remove_triple(self, s = None, p = None, o = None, context = None):
+        """ Remove the matching statements from ``context``, from all
+        contexts if it is `None`. `None` in ``s``, ``p``, ``o`` is a
+        wildcard. """
+
+        self._statement('remove', s, p, o, context and [context] or [])
 
     def remove(self, graph, context = None):
-        try:
-            node_name = 'removeFromNamedContext' if context else 'remove'
-            node = self.transaction.createElement(node_name)
-            for s, p, o in graph:
-                node.appendChild(self._rdf_node(s))
-                node.appendChild(self._rdf_node(p))
-                node.appendChild(self._rdf_node(o))
-                if context:
-                    node.appendChild(self.transaction.createTextNode(unicode(context)))
-            self.root.appendChild(node)
-        except:
-            pass
+        for s, p, o in graph:
+            self.remove_triple(s, p, o, context)
 
     def clear(self, context = None):
         node = self.transaction.createElement('clear')
         if context:
-            node.appendChild(self.transaction.createTextNode(unicode(context)))
+            node.appendChild(self._rdf_node(context))
         self.root.appendChild(node)
 
 
@@ -188,10 +254,10 @@ class RDFTransaction(object):
             self.root.appendChild(node)
 
     def __str__(self):
-        self.xml()
+        return self.xml()
 
     def xml(self):
-        return self.transaction.toxml()
+        return self.transaction.toxml('utf-8')
 
 
 class Sesame2Exception(Exception):
@@ -249,43 +315,93 @@ class Sesame2(httplib.HTTPConnection):
     def __del__(self):
         self.close()
 
-    def __deserialize(self, response):
+    def __deserialize(self, response, stream = False):
         '''
         serializes the response based on the Content-Type or Accept header
+
+        SPARQL results are returned as an iterator over rows parsed while
+        they are read from ``response`` if ``stream`` is `True`.
         '''
         content_type = response.getheader('Content-type')
-        content = response.read()
 
         format = 'text'
         if isinstance(content_type, str):
             for type, mimetype in Sesame2.response_format.items():
                 if content_type.startswith(mimetype):
                     format = type
-        
+
+        if stream and format == 'sparql':
+            return parse_sparql_xml(response)
+        elif stream and format == 'sparql+json':
+            return parse_sparql_json(response)
+
+        content = response.read()
         ser_content = content
         if format in ['nt', 'xml', 'n3', 'turtle']:
             graph = ConjunctiveGraph()
             ser_content = graph.parse(data = content, format = format)
         elif format in ['sparql']:
             ser_content = parse_sparql_xml(content)
+            if not isinstance(ser_content, bool):
+                ser_content = list(ser_content)
         elif format in ['sparql+json']:
             ser_content = loads(content)
         return ser_content
 
-    def sesame2_request(self, method, sesame2_method, sesame2_params = {}, body = '', params = {}, headers = {}):
+    def __stream(self, response, rows):
+        '''
+        yields ``rows`` while they are parsed from ``response``, the
+        connection can be reused once all of them are read
+        '''
+        complete = False
+        try:
+            for row in rows:
+                yield row
+            response.read()
+            complete = True
+        finally:
+            if not complete or response.will_close:
+                self.close()
+
+    def sesame2_request(self, method, sesame2_method, sesame2_params = {}, body = '', params = {}, headers = {}, stream = False):
 
         url = '%s%s' % (self.root_path, Sesame2.url[sesame2_method] % (sesame2_params))
         params = urlencode(params)
         url = '%s?%s' % (url, params) if len(params) > 0 else url
 
-        self.connect() # Re-open connection if it was closed.
-        self.request(method, url, body, headers)
-        response = self.getresponse()
-        if response.status in [200, 204]:
-            return self.__deserialize(response)
-        else:
-            print response.read()
-            raise Sesame2Exception(response)
+        # The connection is kept open between requests, httplib opens it
+        # again if it was closed.
+        reused = self.sock is not None
+        try:
+            try:
+                self.request(method, url, body, headers)
+                response = self.getresponse()
+            except (httplib.HTTPException, socket.error):
+                # The server may have dropped an idle keep-alive
+                # connection, retry once on a fresh one.
+                self.close()
+                if not reused:
+                    raise
+                self.request(method, url, body, headers)
+                response = self.getresponse()
+
+            if response.status in [200, 204]:
+                result = self.__deserialize(response, stream)
+            else:
+                print response.read()
+                raise Sesame2Exception(response)
+
+            if hasattr(result, 'next'):
+                return self.__stream(response, result)
+            # Read what a streaming parser left, e.g. after an ASK result.
+            response.read()
+        except:
+            self.close()
+            raise
+
+        if response.will_close:
+            self.close()
+        return result
 
     def protocol(self):
         protocol = self.sesame2_request('GET', 'protocol')
@@ -295,19 +411,24 @@ class Sesame2(httplib.HTTPConnection):
         repos = self.sesame2_request('GET', 'repositories')
         return repos
 
-    def __query(self, id, query, infer = False, queryLn = 'SPARQL', limit = None, headers = {}):
+    def __query(self, id, query, infer = False, queryLn = 'SPARQL', limit = None, headers = {}, stream = False):
         params = {'queryLn':queryLn,
                   'infer':'true' if infer else 'false',
                   'query': query}
         if queryLn == 'Prolog' and limit and limit.isdigit():
             params['limit'] = limit
-        results = self.sesame2_request('GET', 'query', {'id':str(id)}, params = params, headers = headers)
+        results = self.sesame2_request('GET', 'query', {'id':str(id)}, params = params, headers = headers, stream = stream)
         return results
 
     def prolog_query(self, id, query, infer = False, limit = None):
         return self.__query(id, query, infer = infer, queryLn = 'Prolog', limit = limit)
 
-    def sparql_query(self, id, query, infer = False, format = 'sparql+json'):
+    def sparql_query(self, id, query, infer = False, format = 'sparql+json', stream = False):
+        '''
+        executes a SPARQL query, SELECT results are returned as an iterator
+        over rows parsed while they are read from the server if ``stream``
+        is `True`, see :func:`parse_sparql_json`
+        '''
         type = None
         if query.upper().find('SELECT ') != -1:
             type = 'SELECT'
@@ -320,7 +441,8 @@ class Sesame2(httplib.HTTPConnection):
         if type:
             format = format if format in Sesame2.__sparql__[type] else Sesame2.__sparql__[type][0]
             return self.__query(id, query, infer = infer, queryLn = 'SPARQL',
-                                limit = None, headers = {'Accept':Sesame2.request_format[format]})
+                                limit = None, headers = {'Accept':Sesame2.request_format[format]},
+                                stream = stream)
         return None
 
     def contexts(self, id):
@@ -0,0 +1,307 @@
+# -*- coding: UTF-8 -*-
+""" Tests for the pooled connections and transactions of the sesame2 plugin. """
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from threading import Lock, Thread
+from StringIO import StringIO
+from unittest import TestCase
+from xml.dom.minidom import parseString
+
+import surf
+from surf.rdf import BNode, Literal, URIRef
+from sesame2 import sesame2
+from sesame2.connection import ConnectionPool
+from sesame2.sesame2 import RDFTransaction, parse_sparql_json, parse_sparql_xml
+
+RESULTS = """{"head" : {"vars" : ["s"]},
+ "results" : {"bindings" : [{"s" : {"type" : "uri", "value" : "http://a"}}]}}"""
+
+class StubSesameHandler(BaseHTTPRequestHandler):
+    """ Answers queries with one binding and accepts transactions, keeping
+    connections open. """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.record(self)
+        self.__respond(200, "application/sparql-results+json", RESULTS)
+
+    def do_POST(self):
+        length = int(self.headers.getheader("Content-Length") or 0)
+        self.server.record(self, self.rfile.read(length))
+        self.__respond(204, "text/plain", "")
+
+    def __respond(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class StubSesameServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), StubSesameHandler)
+        self.requests = []
+        self.bodies = []
+        self.__lock = Lock()
+
+    def record(self, handler, body = None):
+        self.__lock.acquire()
+        try:
+            self.requests.append((handler.command, handler.client_address,
+                                  handler.headers.getheader("Content-Type")))
+            if body is not None:
+                self.bodies.append(body)
+        finally:
+            self.__lock.release()
+
+    def connections(self):
+        return set([address for _, address, _ in self.requests])
+
+def operations(body):
+    """ Return the `(operation, [(element, text), ...])` of a transaction. """
+
+    document = parseString(body)
+    result = []
+    for node in document.documentElement.childNodes:
+        values = [(child.nodeName,
+                   "".join([text.data for text in child.childNodes]))
+                  for child in node.childNodes]
+        result.append((node.nodeName, values))
+    return result
+
+class TestSesame2Connections(TestCase):
+    """ Tests for the sesame2 reader and writer over a stub server. """
+
+    def setUp(self):
+        self.server = StubSesameServer()
+        self.thread = Thread(target = self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        self.store = surf.Store(reader = "sesame2", writer = "sesame2",
+                                server = "127.0.0.1",
+                                port = self.server.server_port,
+                                root_path = "/openrdf-sesame",
+                                repository = "test")
+
+    def tearDown(self):
+        self.store.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keepalive(self):
+        """ Test that queries and writes reuse one connection. """
+
+        self.assertTrue(self.store.writer.connection_pool
+                        is self.store.reader.connection_pool)
+        for _ in range(5):
+            result = self.store.reader._execute("SELECT ?s WHERE { ?s ?p ?o }")
+            self.assertEquals(list(result), [{"s" : URIRef("http://a")}])
+        self.store.add_triple(URIRef("http://a"), URIRef("http://b"),
+                              URIRef("http://c"))
+
+        self.assertEquals(len(self.server.requests), 6)
+        self.assertEquals(len(self.server.connections()), 1)
+
+    def test_unfinished_stream(self):
+        """ Test that a stream closed early doesn't block the connection. """
+
+        rows = self.store.reader._execute("SELECT ?s WHERE { ?s ?p ?o }")
+        rows.next()
+        rows.close()
+
+        rows = self.store.reader._execute("SELECT ?s WHERE { ?s ?p ?o }")
+        self.assertEquals(list(rows), [{"s" : URIRef("http://a")}])
+        self.assertEquals(len(self.server.connections()), 2)
+
+    def test_execute(self):
+        """ Test that execute() returns a list and frees its connection. """
+
+        store = surf.Store(reader = "sesame2", server = "127.0.0.1",
+                           port = self.server.server_port,
+                           root_path = "/openrdf-sesame",
+                           repository = "test", pool_size = 1)
+        query = surf.query.select("?s").where(("?s", "?p", "?o"))
+        for _ in range(2):
+            self.assertEquals(store.execute(query),
+                              [{"s" : URIRef("http://a")}])
+        store.close()
+
+    def test_unread_results(self):
+        """ Test that results dropped unread give their connection back. """
+
+        store = surf.Store(reader = "sesame2", server = "127.0.0.1",
+                           port = self.server.server_port,
+                           root_path = "/openrdf-sesame",
+                           repository = "test", pool_size = 2)
+        for _ in range(2):
+            store.reader._execute("SELECT ?s WHERE { ?s ?p ?o }")
+
+        results = []
+        def query():
+            rows = store.reader._execute("SELECT ?s WHERE { ?s ?p ?o }")
+            results.extend(rows)
+        thread = Thread(target = query)
+        thread.setDaemon(True)
+        thread.start()
+        thread.join(5)
+
+        self.assertEquals(results, [{"s" : URIRef("http://a")}])
+        store.close()
+
+    def test_batched_update(self):
+        """ Test that save, update and remove send one transaction each. """
+
+        session = surf.Session(self.store, mapping = {})
+        Person = session.get_class(surf.ns.FOAF.Person)
+        context = URIRef("http://context")
+        john = session.get_resource("http://John", Person, context = context)
+        john.foaf_name = [Literal(u"John", lang = "en"), Literal(u"Jöhn")]
+        john.save()
+
+        john.foaf_name = Literal(u"Johnny")
+        john.foaf_age = Literal(42)
+        john.update()
+        john.remove()
+
+        self.assertEquals([content_type for _, _, content_type
+                           in self.server.requests],
+                          [RDFTransaction.mime] * 3)
+
+        saved, updated, removed = [operations(body)
+                                   for body in self.server.bodies]
+        self.assertEquals(saved[0], ("remove", [("uri", "http://John"),
+                                                ("null", ""), ("null", ""),
+                                                ("uri", "http://context")]))
+        self.assertEquals(len(saved), 4)
+        self.assertTrue(("add", [("uri", "http://John"),
+                                 ("uri", unicode(surf.ns.FOAF.name)),
+                                 ("literal", u"Jöhn"),
+                                 ("uri", "http://context")]) in saved)
+
+        # Both names are removed, age had no values loaded.
+        self.assertEquals(sorted([name for name, _ in updated]),
+                          ["add", "add", "remove", "remove", "remove"])
+        self.assertTrue(("remove", [("uri", "http://John"),
+                                    ("uri", unicode(surf.ns.FOAF.age)),
+                                    ("null", ""),
+                                    ("uri", "http://context")]) in updated)
+        self.assertTrue(("add", [("uri", "http://John"),
+                                 ("uri", unicode(surf.ns.FOAF.age)),
+                                 ("literal", "42"),
+                                 ("uri", "http://context")]) in updated)
+
+        self.assertEquals(removed, [saved[0]])
+
+    def test_batched_update_without_context(self):
+        """ Test that resources without context are removed from all
+        contexts. """
+
+        session = surf.Session(self.store, mapping = {})
+        Person = session.get_class(surf.ns.FOAF.Person)
+        john = session.get_resource("http://John", Person)
+        john.foaf_name = "John"
+        john.save()
+        john.remove()
+
+        saved, removed = [operations(body) for body in self.server.bodies]
+        remove_all = ("remove", [("uri", "http://John"),
+                                 ("null", ""), ("null", "")])
+        self.assertEquals(saved[0], remove_all)
+        # Added to the default context, no context values.
+        self.assertEquals([len(values) for _, values in saved[1:]], [3, 3])
+        self.assertEquals(removed, [remove_all])
+
+    def test_literal_attributes(self):
+        """ Test that literals keep their language and datatype. """
+
+        transaction = RDFTransaction()
+        transaction.add_triple(URIRef("http://a"), URIRef("http://b"),
+                               Literal(u"a", lang = "en"))
+        transaction.add_triple(URIRef("http://a"), URIRef("http://b"),
+                               Literal(1))
+        literals = parseString(transaction.xml()).getElementsByTagName("literal")
+
+        self.assertEquals(literals[0].getAttribute("xml:lang"), "en")
+        self.assertEquals(literals[1].getAttribute("datatype"),
+                          unicode(Literal(1).datatype))
+
+    def test_invalid_pool_size(self):
+        """ Test that pool_size must be a positive integer. """
+
+        self.assertRaises(ValueError, ConnectionPool, lambda: None, 0)
+
+XML_RESULTS = """<?xml version="1.0"?>
+<sparql xmlns="http://www.w3.org/2005/sparql-results#">
+  <head><variable name="s"/><variable name="o"/></head>
+  <results>
+    <result>
+      <binding name="s"><uri>http://a</uri></binding>
+      <binding name="o"><literal xml:lang="en">a</literal></binding>
+    </result>
+    <result>
+      <binding name="s"><bnode>b1</bnode></binding>
+      <binding name="o"><literal datatype="http://www.w3.org/2001/XMLSchema#integer">1</literal></binding>
+    </result>
+    <result>
+      <binding name="s"><uri>http://b</uri></binding>
+    </result>
+  </results>
+</sparql>"""
+
+JSON_RESULTS = """{"head" : {"vars" : ["s", "o"]},
+ "results" : {"bindings" : [
+  {"s" : {"type" : "uri", "value" : "http://a"},
+   "o" : {"type" : "literal", "xml:lang" : "en", "value" : "a"}},
+  {"s" : {"type" : "bnode", "value" : "b1"},
+   "o" : {"type" : "typed-literal", "value" : "1",
+          "datatype" : "http://www.w3.org/2001/XMLSchema#integer"}},
+  {"s" : {"type" : "uri", "value" : "http://b"}}
+ ]}}"""
+
+class TestResultParsers(TestCase):
+    """ Tests for the streaming SPARQL result parsers. """
+
+    def setUp(self):
+        self.chunk_size = sesame2.CHUNK_SIZE
+        # Make bindings span several reads.
+        sesame2.CHUNK_SIZE = 7
+
+    def tearDown(self):
+        sesame2.CHUNK_SIZE = self.chunk_size
+
+    def expected_rows(self):
+        return [{"s" : URIRef("http://a"), "o" : Literal("a", lang = "en")},
+                {"s" : BNode("b1"), "o" : Literal(1)},
+                {"s" : URIRef("http://b")}]
+
+    def test_xml(self):
+        """ Test that XML results keep literal language and datatype. """
+
+        rows = list(parse_sparql_xml(StringIO(XML_RESULTS)))
+        self.assertEquals(rows, self.expected_rows())
+        self.assertEquals(rows[0]["o"].language, "en")
+
+    def test_json(self):
+        """ Test that JSON results are parsed binding by binding. """
+
+        source = StringIO(JSON_RESULTS)
+        rows = parse_sparql_json(source)
+        self.assertEquals(rows.next(), self.expected_rows()[0])
+        self.assertTrue(source.tell() < len(JSON_RESULTS))
+        self.assertEquals(list(rows), self.expected_rows()[1:])
+
+    def test_boolean(self):
+        """ Test ASK results. """
+
+        self.assertEquals(parse_sparql_json('{"head" : {}, "boolean" : true}'),
+                          True)
+        xml = """<sparql xmlns="http://www.w3.org/2005/sparql-results#">
+                   <head/><boolean>false</boolean></sparql>"""
+        self.assertEquals(parse_sparql_xml(xml), False)
@@ -38,8 +38,10 @@ __author__ = 'Cosmin Basca'
 
 from surf.plugin.writer import RDFWriter
 from allegro import Allegro
+from connection import ConnectionPool, DEFAULT_POOL_SIZE
+from sesame2 import RDFTransaction
 
-from surf.rdf import BNode, Literal, URIRef
+from surf.rdf import BNode, Graph, Literal, URIRef
 from reader import ReaderPlugin
 
 class WriterPlugin(RDFWriter):
@@ -52,6 +54,7 @@ class WriterPlugin(RDFWriter):
             self.__repository_path = self.reader.repository_path
             self.__repository = self.reader.repository
             self.__use_allegro_extensions = self.reader.use_allegro_extensions
+            self.__connection_pool = self.reader.connection_pool
 
         else:
             self.__server = kwargs['server'] if 'server' in kwargs else 'localhost'
@@ -69,6 +72,9 @@ class WriterPlugin(RDFWriter):
             if not self.repository:
                 raise Exception('No <repository> argument supplied.')
 
+            self.__connection_pool = ConnectionPool(self.__connect,
+                                                    kwargs.get("pool_size", DEFAULT_POOL_SIZE))
+
             if self.__use_allegro_extensions:
                 opened = self.get_allegro().open_repository(self.repository)
                 self.log.info('ALLEGRO repository opened: ' + unicode(opened))
@@ -78,44 +84,61 @@ class WriterPlugin(RDFWriter):
     root_path = property(lambda self: self.__root_path)
     repository_path = property(lambda self: self.__repository_path)
     repository = property(lambda self: self.__repository)
+    connection_pool = property(lambda self: self.__connection_pool)
 
     def get_allegro(self):
+        ''' Return the pooled connection to the server, each call borrows
+        an open :class:`Allegro` connection. '''
+
+        return self.__connection_pool
+
+    def __connect(self):
         return Allegro(self.server, self.port, self.root_path,
                        self.repository_path)
 
+    def __commit(self, transaction):
+        ''' Send all operations of ``transaction`` in one request. '''
+
+        if len(transaction):
+            self.get_allegro().transaction(self.__repository, transaction)
 
     def _save(self, *resources):
+        transaction = RDFTransaction()
         for resource in resources:
-            allegro = self.get_allegro()
             s = resource.subject
-            context = resource.context and resource.context.n3() or None
-            allegro.remove_statements(self.__repository, s = s.n3(), context = context)
-            graph = resource.graph()
-            allegro.add_statements(self.__repository,
-                                   graph.serialize(format = 'nt'), update = True, content_type = 'nt', context = context)
+            transaction.remove_triple(s, context = resource.context)
+            transaction.add(resource.graph(), context = resource.context)
+
+        self.__commit(transaction)
 
     def _update(self, *resources):
+        transaction = RDFTransaction()
         for resource in resources:
-            allegro = self.get_allegro()
-            graph = resource.graph()
-            context = resource.context and resource.context.n3() or None
-            for s, p, o in graph:
-                allegro.remove_statements(self.__repository, s = s.n3(), p = p.n3(), context = context)
-            allegro.add_statements(self.__repository,
-                                   graph.serialize(format = 'nt'), update = True, content_type = 'nt', context = context)
+            s = resource.subject
+            context = resource.context
+            for p, (added, removed) in resource.rdf_changes.items():
+                if removed is None:
+                    transaction.remove_triple(s, p, context = context)
+                else:
+                    for o in removed:
+                        transaction.remove_triple(s, p, o, context)
+                for o in added:
+                    transaction.add_triple(s, p, o, context)
+
+        self.__commit(transaction)
 
     def _remove(self, *resources, **kwargs):
         inverse = kwargs.get("inverse")
-        
-        allegro = self.get_allegro()
+
+        transaction = RDFTransaction()
         for resource in resources:
-            context = resource.context and resource.context.n3() or None
-            allegro.remove_statements(self.__repository, 
-                                      s = resource.subject.n3(), context = context)
-            
+            transaction.remove_triple(s = resource.subject,
+                                      context = resource.context)
             if inverse:
-                allegro.remove_statements(self.__repository, 
-                                          o = resource.subject.n3(), context = context)
+                transaction.remove_triple(o = resource.subject,
+                                          context = resource.context)
+
+        self.__commit(transaction)
 
     def _size(self):
         return self.get_allegro().size(self.__repository)
@@ -171,3 +194,6 @@ class WriterPlugin(RDFWriter):
                                            externalFormat = externalFormat,
                                            saveStrings = saveStrings)
         return True
+
+    def close(self):
+        self.__connection_pool.close()
@@ -0,0 +1,281 @@
+# Copyright (c) 2009, Digital Enterprise Research Institute (DERI),
+# NUI Galway
+# All rights reserved.
+
+# author: Cosmin Basca
+# email: cosmin.basca@gmail.com
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer
+#      in the documentation and/or other materials provided with
+#      the distribution.
+#    * Neither the name of DERI nor the
+#      names of its contributors may be used to endorse or promote
+#      products derived from this software without specific prior
+#      written permission.
+
+# THIS SOFTWARE IS PROVIDED BY DERI ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DERI BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# -*- coding: utf-8 -*-
+""" Pooled, persistent HTTP transport for SPARQL endpoints. """
+
+import httplib
+import re
+import socket
+from threading import BoundedSemaphore, Lock
+from urllib import urlencode
+from urlparse import urlsplit
+
+from xml.dom.minidom import parseString
+
+from SPARQLWrapper import jsonlayer
+from SPARQLWrapper.SPARQLExceptions import EndPointNotFound, QueryBadFormed
+
+from surf.rdf import ConjunctiveGraph
+
+DEFAULT_POOL_SIZE = 4
+
+JSON_MIMETYPES = ["application/sparql-results+json", "application/json",
+                  "text/javascript", "application/javascript"]
+XML_MIMETYPES = ["application/sparql-results+xml"]
+RDF_XML_MIMETYPES = ["application/rdf+xml"]
+RDF_N3_MIMETYPES = ["text/rdf+n3", "application/n-triples", "application/turtle",
+                    "application/n3", "text/n3", "text/turtle"]
+
+# Same detection as SPARQLWrapper: the first keyword after BASE and PREFIX.
+QUERY_TYPE_PATTERN = re.compile(r"""
+    (?P<base>(\s*BASE\s*<.*?>)\s*)*
+    (?P<prefixes>(\s*PREFIX\s+.+:\s*<.*?>)\s*)*
+    (?P<queryType>(CONSTRUCT|SELECT|ASK|DESCRIBE|INSERT|DELETE|MODIFY))
+""", re.VERBOSE | re.IGNORECASE)
+
+def query_type(query):
+    """ Return the type of `query` (`SELECT`, `CONSTRUCT`, ...), queries
+    of unknown type are treated as `SELECT`. """
+
+    match = QUERY_TYPE_PATTERN.search(query)
+    if match is None:
+        return "SELECT"
+    return match.group("queryType").upper()
+
+class SparqlHTTPException(Exception):
+    """ Raised when the endpoint answers with an unexpected HTTP status. """
+
+    def __init__(self, status, reason):
+        Exception.__init__(self, "HTTP %d: %s" % (status, reason))
+        self.status = status
+        self.reason = reason
+
+class SparqlContentTypeException(Exception):
+    """ Raised when the endpoint answers a query with a content type that
+    can not be decoded. """
+
+    def __init__(self, content_type):
+        Exception.__init__(self, "Unexpected content type: %s" % content_type)
+        self.content_type = content_type
+
+class ConnectionPool(object):
+    """ A thread-safe pool of persistent HTTP/1.1 connections to one
+    SPARQL endpoint.
+
+    At most `pool_size` requests are in flight at any time, callers
+    beyond that block until a connection is checked back in. Idle
+    connections are kept open and reused by the next request, so
+    consecutive queries do not pay for a new TCP handshake.
+
+    """
+
+    def __init__(self, endpoint, pool_size = DEFAULT_POOL_SIZE, timeout = None):
+        pool_size = int(pool_size)
+        if pool_size < 1:
+            raise ValueError("pool_size must be a positive integer")
+
+        self.__endpoint = endpoint
+        self.__pool_size = pool_size
+        self.__timeout = timeout
+        self.__idle = []
+        self.__lock = Lock()
+        self.__slots = BoundedSemaphore(pool_size)
+
+    endpoint = property(lambda self: self.__endpoint)
+    pool_size = property(lambda self: self.__pool_size)
+
+    def __split_endpoint(self):
+        if not self.__endpoint:
+            raise ValueError("No SPARQL endpoint specified")
+
+        parts = urlsplit(self.__endpoint)
+        if parts[0] not in ("http", "https") or not parts[1]:
+            raise ValueError("Invalid SPARQL endpoint: %s" % self.__endpoint)
+
+        return parts
+
+    def __connect(self):
+        scheme, netloc = self.__split_endpoint()[:2]
+        if scheme == "https":
+            connection_class = httplib.HTTPSConnection
+        else:
+            connection_class = httplib.HTTPConnection
+
+        if self.__timeout is None:
+            return connection_class(netloc)
+        return connection_class(netloc, timeout = self.__timeout)
+
+    def __checkout(self):
+        self.__slots.acquire()
+        self.__lock.acquire()
+        try:
+            if self.__idle:
+                return self.__idle.pop(), True
+        finally:
+            self.__lock.release()
+
+        try:
+            return self.__connect(), False
+        except:
+            self.__slots.release()
+            raise
+
+    def __checkin(self, connection):
+        self.__lock.acquire()
+        try:
+            if connection is not None:
+                self.__idle.append(connection)
+        finally:
+            self.__lock.release()
+        self.__slots.release()
+
+    def __path(self, params = None):
+        path, query = self.__split_endpoint()[2:4]
+        path = path or "/"
+        if params:
+            query = "&".join([part for part in (query, params) if part])
+        if query:
+            path = "%s?%s" % (path, query)
+        return path
+
+    def request(self, query, method = "GET", format = "json"):
+        """ Send `query` to the endpoint and return the decoded response.
+
+        `format` is the preferred result format, one of `json`, `xml`,
+        `rdf`, `n3` or `turtle` (the `SPARQLWrapper` format constants).
+        SELECT and ASK results are returned as dictionaries (JSON) or as
+        DOM documents (XML), CONSTRUCT and DESCRIBE results as
+        :class:`ConjunctiveGraph` instances. Responses to update queries
+        are returned as strings. A query response with any other content
+        type raises :class:`SparqlContentTypeException`. HTTP 400 and 404
+        raise :class:`QueryBadFormed` and :class:`EndPointNotFound`,
+        same as `SPARQLWrapper`.
+
+        """
+
+        query = unicode(query)
+        format = (format or "json").lower()
+        kind = query_type(query)
+        if kind in ("SELECT", "ASK"):
+            if format == "xml":
+                mimetypes = XML_MIMETYPES
+            else:
+                mimetypes = JSON_MIMETYPES
+        elif kind in ("CONSTRUCT", "DESCRIBE"):
+            if format in ("n3", "turtle"):
+                mimetypes = RDF_N3_MIMETYPES
+            else:
+                mimetypes = RDF_XML_MIMETYPES
+        else:
+            mimetypes = JSON_MIMETYPES
+
+        params = [("query", query.encode("utf-8"))]
+        headers = {"Accept" : ",".join(mimetypes)}
+        if method == "POST":
+            path, body = self.__path(), urlencode(params)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        else:
+            if format != "xml":
+                # Endpoints differ in the parameter name they read the
+                # result format from, send both like SPARQLWrapper does.
+                params.extend([("output", format), ("results", format)])
+            path, body = self.__path(urlencode(params)), None
+
+        connection, reused = self.__checkout()
+        try:
+            try:
+                response = self.__send(connection, method, path, body, headers)
+            except (httplib.HTTPException, socket.error):
+                # The endpoint may have dropped an idle keep-alive
+                # connection, retry once on a fresh one.
+                connection.close()
+                if not reused:
+                    raise
+                response = self.__send(connection, method, path, body, headers)
+
+            content = response.read()
+            if response.will_close:
+                connection.close()
+        except:
+            connection.close()
+            self.__checkin(None)
+            raise
+
+        self.__checkin(connection)
+        return self.__decode(response, content, kind)
+
+    def __send(self, connection, method, path, body, headers):
+        connection.request(method, path, body, headers)
+        return connection.getresponse()
+
+    def __decode(self, response, content, kind):
+        if response.status == 400:
+            raise QueryBadFormed()
+        elif response.status == 404:
+            raise EndPointNotFound()
+        elif response.status >= 300:
+            raise SparqlHTTPException(response.status, response.reason)
+
+        content_type = response.getheader("Content-Type") or ""
+        mimetype = content_type.split(";")[0].strip().lower()
+        if mimetype in JSON_MIMETYPES:
+            return jsonlayer.decode(content)
+        elif mimetype in XML_MIMETYPES:
+            return parseString(content)
+        elif mimetype in RDF_XML_MIMETYPES:
+            graph = ConjunctiveGraph()
+            graph.parse(data = content, format = "xml", publicID = " ")
+            return graph
+        elif mimetype in RDF_N3_MIMETYPES:
+            graph = ConjunctiveGraph()
+            graph.parse(data = content, format = "n3", publicID = " ")
+            return graph
+        elif kind not in ("SELECT", "ASK", "CONSTRUCT", "DESCRIBE"):
+            # Update responses carry no results.
+            return content
+
+        raise SparqlContentTypeException(content_type)
+
+    def close(self):
+        """ Close all idle connections. """
+
+        self.__lock.acquire()
+        try:
+            idle, self.__idle = self.__idle, []
+        finally:
+            self.__lock.release()
+
+        for connection in idle:
+            connection.close()
@@ -36,16 +36,48 @@
 __author__ = 'Cosmin Basca'
 
 import sys
+from xml.dom.minidom import Document
 
-from SPARQLWrapper import SPARQLWrapper, jsonlayer, JSON
+from SPARQLWrapper import JSON
 from SPARQLWrapper.SPARQLExceptions import EndPointNotFound, QueryBadFormed
 
+from connection import ConnectionPool, DEFAULT_POOL_SIZE
 from surf.util import json_to_rdflib
 from surf.plugin.query_reader import RDFQueryReader
 from surf.rdf import BNode, ConjunctiveGraph, Literal, URIRef
 
 class SparqlReaderException(Exception): pass
 
+def _xml_text(node):
+    return u"".join([child.data for child in node.childNodes
+                     if child.nodeType == child.TEXT_NODE])
+
+def _xml_to_json(document):
+    """ Convert a SPARQL XML result document to the JSON result layout. """
+
+    result = {}
+    for node in document.getElementsByTagName("boolean"):
+        result["boolean"] = _xml_text(node).strip() == "true"
+
+    bindings = []
+    for node in document.getElementsByTagName("result"):
+        binding = {}
+        for element in node.getElementsByTagName("binding"):
+            for value in element.childNodes:
+                if value.nodeType != value.ELEMENT_NODE:
+                    continue
+                obj = {"type" : value.tagName, "value" : _xml_text(value)}
+                if value.hasAttribute("xml:lang"):
+                    obj["xml:lang"] = value.getAttribute("xml:lang")
+                if value.hasAttribute("datatype"):
+                    obj["datatype"] = value.getAttribute("datatype")
+                binding[element.getAttribute("name")] = obj
+        bindings.append(binding)
+
+    if "boolean" not in result:
+        result["results"] = {"bindings" : bindings}
+    return result
+
 class ReaderPlugin(RDFQueryReader):
     def __init__(self, *args, **kwargs):
         RDFQueryReader.__init__(self, *args, **kwargs)
@@ -53,15 +85,18 @@ class ReaderPlugin(RDFQueryReader):
         self.__endpoint = kwargs['endpoint'] if 'endpoint' in kwargs else None
         self.__results_format = JSON
 
-        self.__sparql_wrapper = SPARQLWrapper(self.__endpoint, self.__results_format)
-        if kwargs.get("use_keepalive", "").lower().strip() == "true":
-            if hasattr(SPARQLWrapper, "setUseKeepAlive"):
-                self.__sparql_wrapper.setUseKeepAlive()
+        self.__connection_pool = ConnectionPool(self.__endpoint,
+                                                kwargs.get("pool_size", DEFAULT_POOL_SIZE),
+                                                kwargs.get("timeout"))
 
     endpoint = property(lambda self: self.__endpoint)
     results_format = property(lambda self: self.__results_format)
+    connection_pool = property(lambda self: self.__connection_pool)
 
     def _to_table(self, result):
+        if isinstance(result, Document):
+            result = _xml_to_json(result)
+
         if not isinstance(result, dict):
             return result
 
@@ -86,13 +121,15 @@ class ReaderPlugin(RDFQueryReader):
         returns the boolean value of a ASK query
         '''
 
+        if isinstance(result, Document):
+            result = _xml_to_json(result)
+
         return result.get("boolean")
 
     def execute_sparql(self, q_string, format = 'JSON'):
         try:
             self.log.debug(q_string)
-            self.__sparql_wrapper.setQuery(q_string)
-            return self.__sparql_wrapper.query().convert()
+            return self.__connection_pool.request(q_string, format = format)
         except EndPointNotFound, _:
             raise SparqlReaderException("Endpoint not found"), None, sys.exc_info()[2]
         except QueryBadFormed, _:
@@ -105,5 +142,5 @@ class ReaderPlugin(RDFQueryReader):
         return self.execute_sparql(unicode(query))
 
     def close(self):
-        pass
+        self.__connection_pool.close()
 
@@ -0,0 +1,235 @@
+# -*- coding: UTF-8 -*-
+""" Tests for the pooled HTTP transport of the sparql_protocol plugin. """
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from threading import Lock, Thread
+from unittest import TestCase
+from urlparse import parse_qs, urlsplit
+import time
+
+import surf
+from surf.rdf import ConjunctiveGraph, Literal, URIRef
+from sparql_protocol.connection import ConnectionPool, SparqlContentTypeException
+from sparql_protocol.reader import SparqlReaderException
+
+RESULTS = """{"head" : {"vars" : ["s"]},
+ "results" : {"bindings" : [{"s" : {"type" : "uri", "value" : "http://a"}}]}}"""
+
+XML_RESULTS = """<?xml version="1.0"?>
+<sparql xmlns="http://www.w3.org/2005/sparql-results#">
+ <head><variable name="s"/><variable name="o"/></head>
+ <results>
+  <result>
+   <binding name="s"><uri>http://a</uri></binding>
+   <binding name="o"><literal xml:lang="en">a</literal></binding>
+  </result>
+ </results>
+</sparql>"""
+
+RDF_XML = """<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:foaf="http://xmlns.com/foaf/0.1/">
+ <rdf:Description rdf:about="http://a"><foaf:name>A</foaf:name></rdf:Description>
+</rdf:RDF>"""
+
+class StubSparqlHandler(BaseHTTPRequestHandler):
+    """ Answers every request with one binding, keeping connections open. """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.record(self)
+        if not self.path.startswith("/sparql"):
+            self.__respond(404, "text/plain", "not found")
+        else:
+            time.sleep(self.server.delay)
+            self.__respond(200, *self.server.response)
+
+    def do_POST(self):
+        length = int(self.headers.getheader("Content-Length") or 0)
+        self.server.record(self, self.rfile.read(length))
+        self.__respond(200, "text/plain", "ok")
+
+    def __respond(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class StubSparqlServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), StubSparqlHandler)
+        self.delay = 0
+        self.response = ("application/sparql-results+json", RESULTS)
+        self.requests = []
+        self.queries = []
+        self.bodies = []
+        self.__lock = Lock()
+
+    def record(self, handler, body = None):
+        self.__lock.acquire()
+        try:
+            self.requests.append((handler.command, handler.client_address))
+            self.queries.append((parse_qs(urlsplit(handler.path)[3]),
+                                 handler.headers.getheader("Accept")))
+            if body is not None:
+                self.bodies.append(body)
+        finally:
+            self.__lock.release()
+
+    def connections(self):
+        return set([address for _, address in self.requests])
+
+class TestConnectionPool(TestCase):
+    """ Tests for :class:`sparql_protocol.connection.ConnectionPool`. """
+
+    def setUp(self):
+        self.server = StubSparqlServer()
+        self.thread = Thread(target = self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        self.endpoint = "http://127.0.0.1:%d/sparql" % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keepalive(self):
+        """ Test that consecutive queries reuse one connection. """
+
+        store = surf.Store(reader = "sparql_protocol",
+                           endpoint = self.endpoint)
+        for _ in range(5):
+            result = store.execute_sparql("SELECT ?s WHERE { ?s ?p ?o }")
+            self.assertEquals(store.reader._to_table(result),
+                              [{"s" : URIRef("http://a")}])
+
+        self.assertEquals(len(self.server.requests), 5)
+        self.assertEquals(len(self.server.connections()), 1)
+        store.close()
+
+    def test_shared_with_writer(self):
+        """ Test that the writer uses the reader's connections. """
+
+        store = surf.Store(reader = "sparql_protocol",
+                           writer = "sparql_protocol",
+                           endpoint = self.endpoint)
+        self.assertTrue(store.writer.connection_pool is store.reader.connection_pool)
+
+        store.execute_sparql("SELECT ?s WHERE { ?s ?p ?o }")
+        store.add_triple(URIRef("http://a"), URIRef("http://b"), URIRef("http://c"))
+
+        self.assertEquals([method for method, _ in self.server.requests],
+                          ["GET", "POST"])
+        self.assertEquals(len(self.server.connections()), 1)
+        store.close()
+
+    def test_pool_size(self):
+        """ Test that concurrent queries open at most pool_size connections. """
+
+        self.server.delay = 0.05
+        pool = ConnectionPool(self.endpoint, pool_size = 2)
+        results = []
+
+        def worker():
+            for _ in range(3):
+                results.append(pool.request("SELECT ?s WHERE { ?s ?p ?o }"))
+
+        workers = [Thread(target = worker) for _ in range(4)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEquals(len(results), 12)
+        self.assertEquals(len(self.server.connections()), 2)
+        pool.close()
+
+    def test_not_found(self):
+        """ Test that HTTP errors are mapped to reader exceptions. """
+
+        store = surf.Store(reader = "sparql_protocol",
+                           endpoint = self.endpoint.replace("sparql", "missing"))
+        self.assertRaises(SparqlReaderException, store.execute_sparql,
+                          "SELECT ?s WHERE { ?s ?p ?o }")
+
+    def test_invalid_pool_size(self):
+        """ Test that pool_size must be a positive integer. """
+
+        self.assertRaises(ValueError, ConnectionPool, self.endpoint, 0)
+
+    def test_result_format(self):
+        """ Test that the Accept header and format parameters follow the
+        requested format and the query type. """
+
+        pool = ConnectionPool(self.endpoint)
+        pool.request("SELECT ?s WHERE { ?s ?p ?o }")
+        params, accept = self.server.queries[-1]
+        self.assertEquals(params["output"], ["json"])
+        self.assertEquals(params["results"], ["json"])
+        self.assertTrue(accept.startswith("application/sparql-results+json"))
+
+        self.server.response = ("application/sparql-results+xml", XML_RESULTS)
+        pool.request("PREFIX a: <http://a#> SELECT ?s WHERE { ?s ?p ?o }",
+                     format = "xml")
+        params, accept = self.server.queries[-1]
+        self.assertFalse("output" in params)
+        self.assertEquals(accept, "application/sparql-results+xml")
+
+        self.server.response = ("application/rdf+xml", RDF_XML)
+        pool.request("CONSTRUCT { ?s ?p ?o } WHERE { ?s ?p ?o }")
+        self.assertEquals(self.server.queries[-1][1], "application/rdf+xml")
+        pool.request("DESCRIBE <http://a>", format = "n3")
+        self.assertTrue("text/turtle" in self.server.queries[-1][1])
+        pool.close()
+
+    def test_decode_graph(self):
+        """ Test that CONSTRUCT results are parsed into a graph. """
+
+        self.server.response = ("application/rdf+xml; charset=utf-8", RDF_XML)
+        store = surf.Store(reader = "sparql_protocol",
+                           endpoint = self.endpoint)
+        graph = store.execute_sparql("CONSTRUCT { ?s ?p ?o } WHERE { ?s ?p ?o }")
+        self.assertTrue(isinstance(graph, ConjunctiveGraph))
+        self.assertEquals(list(graph),
+                          [(URIRef("http://a"), surf.ns.FOAF.name, Literal("A"))])
+
+        self.server.response = ("text/turtle",
+                                "<http://a> <http://b> <http://c> .")
+        graph = store.execute_sparql("DESCRIBE <http://a>", format = "n3")
+        self.assertEquals(len(graph), 1)
+        store.close()
+
+    def test_decode_xml_results(self):
+        """ Test that XML SELECT results are converted to a table. """
+
+        self.server.response = ("application/sparql-results+xml", XML_RESULTS)
+        store = surf.Store(reader = "sparql_protocol",
+                           endpoint = self.endpoint)
+        result = store.execute_sparql("SELECT ?s ?o WHERE { ?s ?p ?o }")
+        self.assertEquals(store.reader._to_table(result),
+                          [{"s" : URIRef("http://a"),
+                            "o" : Literal("a", lang = "en")}])
+        store.close()
+
+    def test_unexpected_content_type(self):
+        """ Test that undecodable query responses raise. """
+
+        self.server.response = ("text/html", "<html></html>")
+        pool = ConnectionPool(self.endpoint)
+        self.assertRaises(SparqlContentTypeException, pool.request,
+                          "SELECT ?s WHERE { ?s ?p ?o }")
+        pool.close()
+
+        store = surf.Store(reader = "sparql_protocol",
+                           endpoint = self.endpoint)
+        self.assertRaises(SparqlReaderException, store.execute_sparql,
+                          "ASK { ?s ?p ?o }")
+        store.close()
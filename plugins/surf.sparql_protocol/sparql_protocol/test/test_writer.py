@@ -0,0 +1,121 @@
+# -*- coding: UTF-8 -*-
+""" Tests for batched writes of the sparql_protocol plugin. """
+
+from threading import Thread
+from unittest import TestCase
+from urlparse import parse_qs
+
+import surf
+from surf.rdf import URIRef
+from sparql_protocol.test.test_connection import StubSparqlServer
+
+class TestBatchedWrites(TestCase):
+    """ Tests for request batching in sparql_protocol.WriterPlugin. """
+
+    def setUp(self):
+        self.server = StubSparqlServer()
+        self.thread = Thread(target = self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        self.endpoint = "http://127.0.0.1:%d/sparql" % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _commit(self, count, **kwargs):
+        """ Commit `count` dirty resources and return the sent queries. """
+
+        store = surf.Store(reader = "sparql_protocol",
+                           writer = "sparql_protocol",
+                           endpoint = self.endpoint,
+                           combine_queries = True,
+                           **kwargs)
+        session = surf.Session(store)
+        Person = session.get_class(surf.ns.FOAF.Person)
+        for i in range(count):
+            person = session.get_resource("http://p%d" % i, Person)
+            person.foaf_name = "Person %d" % i
+        self.assertEquals(len(session.dirty_resources), count)
+        session.commit()
+        store.close()
+
+        self.assertEquals(len(session.dirty_resources), 0)
+        return [parse_qs(body)["query"][0] for body in self.server.bodies]
+
+    def test_single_request(self):
+        """ Test that commit sends all resources in one request. """
+
+        queries = self._commit(20)
+        self.assertEquals(len(queries), 1)
+        for i in range(20):
+            self.assertTrue("<http://p%d>" % i in queries[0])
+
+    def test_max_request_size(self):
+        """ Test that requests are split to fit max_request_size. """
+
+        queries = self._commit(20, max_request_size = 2000)
+        self.assertTrue(len(queries) > 1)
+        for query in queries:
+            self.assertTrue(len(query.decode("utf-8")) <= 2000)
+
+        for i in range(20):
+            found = [query for query in queries if "<http://p%d>" % i in query]
+            self.assertEquals(len(found), 1)
+
+    def test_update_changes(self):
+        """ Test that updates only write the values that changed. """
+
+        store = surf.Store(reader = "sparql_protocol",
+                           writer = "sparql_protocol",
+                           endpoint = self.endpoint,
+                           combine_queries = True)
+        session = surf.Session(store)
+        Person = session.get_class(surf.ns.FOAF.Person)
+        person = session.get_resource("http://p", Person)
+        person.foaf_name = "Old"
+        person.foaf_nick = "Nick"
+        person.update()
+
+        person.foaf_name = "New"
+        person.update()
+        store.close()
+
+        self.assertEquals(len(self.server.bodies), 2)
+        query = parse_qs(self.server.bodies[1])["query"][0]
+        self.assertTrue("DELETE DATA" in query and '"Old"' in query)
+        self.assertTrue("INSERT DATA" in query and '"New"' in query)
+        self.assertFalse("Nick" in query)
+        self.assertFalse("?s" in query)
+
+    def test_update_batches_changes_once(self):
+        """ Test that split updates collect each resource's changes once. """
+
+        calls = []
+        rdf_changes = surf.Resource.rdf_changes
+        def get_rdf_changes(resource):
+            calls.append(resource.subject)
+            return rdf_changes.fget(resource)
+
+        surf.Resource.rdf_changes = property(get_rdf_changes)
+        try:
+            store = surf.Store(reader = "sparql_protocol",
+                               writer = "sparql_protocol",
+                               endpoint = self.endpoint,
+                               combine_queries = True,
+                               max_request_size = 500)
+            session = surf.Session(store)
+            Person = session.get_class(surf.ns.FOAF.Person)
+            persons = []
+            for i in range(10):
+                person = session.get_resource("http://p%d" % i, Person)
+                person.foaf_name = "Person %d" % i
+                persons.append(person)
+            store.update(*persons)
+            store.close()
+        finally:
+            surf.Resource.rdf_changes = rdf_changes
+
+        self.assertEquals(sorted(calls),
+                          sorted([person.subject for person in persons]))
+        self.assertTrue(len(self.server.bodies) > 1)
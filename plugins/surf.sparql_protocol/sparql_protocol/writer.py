@@ -35,9 +35,10 @@ __author__ = 'Cosmin Basca, Adam Gzella'
 
 import sys
 
-from SPARQLWrapper import SPARQLWrapper, JSON
+from SPARQLWrapper import JSON
 from SPARQLWrapper.SPARQLExceptions import EndPointNotFound, QueryBadFormed, SPARQLWrapperException
 
+from connection import ConnectionPool, DEFAULT_POOL_SIZE
 from reader import ReaderPlugin
 from surf.plugin.writer import RDFWriter
 from surf.query import Filter, Group, NamedGroup, Union
@@ -52,16 +53,27 @@ class WriterPlugin(RDFWriter):
         
         if isinstance(self.reader, ReaderPlugin):
             self.__endpoint = self.reader.endpoint
+            # Reads and writes go through the same set of connections.
+            self.__connection_pool = self.reader.connection_pool
         else:
             self.__endpoint = kwargs.get("endpoint")
+            self.__connection_pool = ConnectionPool(self.__endpoint,
+                                                    kwargs.get("pool_size", DEFAULT_POOL_SIZE),
+                                                    kwargs.get("timeout"))
 
         self.__combine_queries = kwargs.get("combine_queries")
         self.__results_format = JSON
 
-        self.__sparql_wrapper = SPARQLWrapper(self.__endpoint, self.__results_format)
-        self.__sparql_wrapper.setMethod("POST")
+        # Maximum length of one SPARQL Update request, None means no limit.
+        self.__max_request_size = kwargs.get("max_request_size")
+        if self.__max_request_size is not None:
+            try:
+                self.__max_request_size = int(self.__max_request_size)
+            except (TypeError, ValueError):
+                raise ValueError('The max_request_size parameter must be an integer')
 
     endpoint = property(lambda self: self.__endpoint)
+    connection_pool = property(lambda self: self.__connection_pool)
 
     def __group_by_context(self, resources):
         contexts = {}
@@ -71,26 +83,75 @@ class WriterPlugin(RDFWriter):
         
         return contexts
     
+    def __batches(self, parts, prepare_queries):
+        """ Split `parts` into batches whose queries, as returned by
+        `prepare_queries(batch)`, stay within `max_request_size`, and
+        return the queries of each batch.
+
+        The parts of each resource are collected once by the caller. The
+        queries of a part measured on its own are reused if it makes up a
+        batch alone.
+
+        """
+
+        if not self.__max_request_size:
+            return [prepare_queries(parts)]
+
+        batches, batch, batch_size = [], [], 0
+        for part in parts:
+            queries = prepare_queries([part])
+            size = sum([len(unicode(query)) for query in queries])
+            if batch and batch_size + size > self.__max_request_size:
+                batches.append(batch)
+                batch, batch_size = [], 0
+            batch.append((part, queries))
+            batch_size += size
+
+        if batch:
+            batches.append(batch)
+
+        result = []
+        for batch in batches:
+            if len(batch) == 1:
+                result.append(batch[0][1])
+            else:
+                result.append(prepare_queries([part for part, _ in batch]))
+        return result
+
     def _save(self, *resources):
         for context, items in self.__group_by_context(resources).items():
             # Deletes all triples with matching subjects.
-            remove_query = self.__prepare_delete_many_query(items, context)
-            insert_query = self.__prepare_add_many_query(items, context)
-            self.__execute(remove_query, insert_query)
+            def prepare_queries(batch):
+                return (self.__prepare_delete_many_query(
+                            [subject for subject, _ in batch], context),
+                        self.__prepare_add_many_query(batch, context))
+
+            parts = [(resource.subject, self.__triples(resource))
+                     for resource in items]
+            for queries in self.__batches(parts, prepare_queries):
+                self.__execute(*queries)
 
     def _update(self, *resources):
         for context, items in self.__group_by_context(resources).items():
-            # Explicitly enumerates triples for deletion.
-            remove_query = self.__prepare_selective_delete_query(items, context)
-            insert_query = self.__prepare_add_many_query(items, context)
-            self.__execute(remove_query, insert_query)
+            # Only writes the changes since the resources were loaded.
+            def prepare_queries(batch):
+                return self.__prepare_changes_queries(batch, context)
+
+            parts = [self.__changes(resource) for resource in items]
+            for queries in self.__batches(parts, prepare_queries):
+                if queries:
+                    self.__execute(*queries)
 
     def _remove(self, *resources, **kwargs):
+        inverse = kwargs.get("inverse")
         for context, items in self.__group_by_context(resources).items():
             # Deletes all triples with matching subjects.
-            inverse = kwargs.get("inverse")
-            query = self.__prepare_delete_many_query(items, context, inverse)
-            self.__execute(query)
+            def prepare_queries(batch):
+                return (self.__prepare_delete_many_query(batch, context, inverse),)
+
+            subjects = [resource.subject for resource in items]
+            for queries in self.__batches(subjects, prepare_queries):
+                self.__execute(*queries)
 
     def _size(self):
         """ Return total count of triples, not implemented. """
@@ -107,21 +168,28 @@ class WriterPlugin(RDFWriter):
     def _remove_triple(self, s = None, p = None, o = None, context = None):
         self.__remove(s, p, o, context)
 
-    def __prepare_add_many_query(self, resources, context = None):
+    def __triples(self, resource):
+        """ Return the direct triples of `resource`. """
+
+        s = resource.subject
+        return [(s, p, o) for p, objs in resource.rdf_direct.items()
+                for o in objs]
+
+    def __prepare_add_many_query(self, parts, context = None):
+        """ Insert the triples of the `(subject, triples)` `parts`. """
+
         query = insert()
 
         if context:
             query.into(context)
 
-        for resource in resources:
-            s = resource.subject
-            for p, objs in resource.rdf_direct.items():
-                for o in objs:
-                    query.template((s, p, o))    
+        for _, triples in parts:
+            for triple in triples:
+                query.template(triple)
 
         return query
     
-    def __prepare_delete_many_query(self, resources, context, inverse = False):
+    def __prepare_delete_many_query(self, subjects, context, inverse = False):
         query = delete()
         if context:
             query.from_(context)
@@ -133,7 +201,6 @@ class WriterPlugin(RDFWriter):
         else:
             where_clause = Group()
 
-        subjects = [resource.subject for resource in resources]
         filter = " OR ".join(["?s = <%s>" % subject for subject in subjects])
         filter = Filter("(%s)" % filter)
 
@@ -152,7 +219,57 @@ class WriterPlugin(RDFWriter):
         
         return query        
     
-    def __prepare_selective_delete_query(self, resources, context = None):
+    def __changes(self, resource):
+        """ Return the `(replaced, removed, added)` lists for the
+        `rdf_changes` of `resource`.
+
+        Values that were added or removed go into ``INSERT DATA`` and
+        ``DELETE DATA``, predicates whose stored values are not known are
+        cleared first, they are returned as `(subject, predicate)` pairs
+        in `replaced`.
+
+        """
+
+        replaced, removed, added = [], [], []
+        s = resource.subject
+        for p, (added_values, removed_values) in resource.rdf_changes.items():
+            if removed_values is None:
+                replaced.append((s, p))
+            else:
+                removed.extend([(s, p, o) for o in removed_values])
+            added.extend([(s, p, o) for o in added_values])
+
+        return replaced, removed, added
+
+    def __prepare_changes_queries(self, parts, context = None):
+        """ Return the queries that write the changes `parts`, as returned
+        by :meth:`__changes`. """
+
+        replaced, removed, added = [], [], []
+        for part_replaced, part_removed, part_added in parts:
+            replaced.extend(part_replaced)
+            removed.extend(part_removed)
+            added.extend(part_added)
+
+        queries = []
+        if replaced:
+            queries.append(self.__prepare_selective_delete_query(replaced, context))
+        if removed:
+            query = delete(data = True)
+            if context:
+                query.from_(context)
+            queries.append(query.template(*removed))
+        if added:
+            query = insert(data = True)
+            if context:
+                query.into(context)
+            queries.append(query.template(*added))
+
+        return queries
+
+    def __prepare_selective_delete_query(self, pairs, context = None):
+        """ Delete all values of the `(subject, predicate)` `pairs`. """
+
         query = delete()
         if context:
             query.from_(context)
@@ -160,10 +277,9 @@ class WriterPlugin(RDFWriter):
         query.template(("?s", "?p", "?o"))
         
         clauses = []
-        for resource in resources:
-            for p in resource.rdf_direct:
-                filter = Filter("(?s = <%s> AND ?p = <%s>)" % (resource.subject, p))
-                clauses.append(Group([("?s", "?p", "?o"), filter]))
+        for s, p in pairs:
+            filter = Filter("(?s = <%s> AND ?p = <%s>)" % (s, p))
+            clauses.append(Group([("?s", "?p", "?o"), filter]))
                  
         query.union(*clauses)
         return query        
@@ -178,10 +294,7 @@ class WriterPlugin(RDFWriter):
         try:
             for query_str in translated:
                 self.log.debug(query_str)
-                
-                    
-                self.__sparql_wrapper.setQuery(query_str)
-                self.__sparql_wrapper.query()
+                self.__connection_pool.request(query_str, method = "POST")
 
             return True
 
@@ -206,8 +319,7 @@ class WriterPlugin(RDFWriter):
         try:
             query_str = unicode(query)
             self.log.debug(query_str)
-            self.__sparql_wrapper.setQuery(query_str)
-            self.__sparql_wrapper.query().convert()
+            self.__connection_pool.request(query_str, method = "POST")
             return True
 
         except EndPointNotFound, notfound:
@@ -247,8 +359,7 @@ class WriterPlugin(RDFWriter):
 
             query_str = unicode(query)
             self.log.debug(query_str)
-            self.__sparql_wrapper.setQuery(query_str)
-            self.__sparql_wrapper.query().convert()
+            self.__connection_pool.request(query_str, method = "POST")
             return True
         except EndPointNotFound, notfound:
             self.log.exception("SPARQL endpoint not found")
@@ -268,6 +379,9 @@ class WriterPlugin(RDFWriter):
 
         return " and ".join(parts)
 
+    def close(self):
+        self.__connection_pool.close()
+
     def index_triples(self, **kwargs):
         '''
         performs index of the triples if such functionality is present,
@@ -289,8 +403,7 @@ class WriterPlugin(RDFWriter):
 
             query_str = unicode(query)
             self.log.debug(query_str)
-            self.__sparql_wrapper.setQuery(query_str)
-            self.__sparql_wrapper.query().convert()
+            self.__connection_pool.request(query_str, method = "POST")
             return True
 
         return False
@@ -0,0 +1,172 @@
+# Copyright (c) 2009, Digital Enterprise Research Institute (DERI),
+# NUI Galway
+# All rights reserved.
+
+# author: Cosmin Basca
+# email: cosmin.basca@gmail.com
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer
+#      in the documentation and/or other materials provided with
+#      the distribution.
+#    * Neither the name of DERI nor the
+#      names of its contributors may be used to endorse or promote
+#      products derived from this software without specific prior
+#      written permission.
+
+# THIS SOFTWARE IS PROVIDED BY DERI ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DERI BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# -*- coding: utf-8 -*-
+""" Bounded, expiring caches used by the session. """
+
+from threading import RLock
+import time
+
+class LRUCache(object):
+    """ A mapping with least-recently-used eviction and optional expiry.
+
+    ``max_size`` is the maximum number of entries kept, when it is reached
+    the least recently used entry is evicted. `None` means unbounded.
+
+    ``expire`` is the time in seconds after which an entry is considered
+    stale and dropped on the next access. `None` means entries never
+    expire.
+
+    All operations are thread safe.
+
+    """
+
+    def __init__(self, max_size=None, expire=None):
+        self.__max_size = max_size
+        self.__expire = expire
+        self.__lock = RLock()
+        self.__clear()
+
+    max_size = property(fget=lambda self: self.__max_size)
+    """ Maximum number of cached entries. """
+
+    expire = property(fget=lambda self: self.__expire)
+    """ Time to live of cached entries, in seconds. """
+
+    def __clear(self):
+        # key -> [prev, next, key, value, timestamp]
+        self.__map = {}
+        # Circular doubly linked list, root.next is the most recently used.
+        self.__root = root = []
+        root[:] = [root, root, None, None, None]
+
+    def __unlink(self, link):
+        prev, next = link[0], link[1]
+        prev[1] = next
+        next[0] = prev
+
+    def __link_front(self, link):
+        root = self.__root
+        first = root[1]
+        link[0], link[1] = root, first
+        first[0] = link
+        root[1] = link
+
+    def __is_expired(self, link):
+        return (self.__expire is not None
+                and time.time() - link[4] > self.__expire)
+
+    def get(self, key, default=None):
+        """ Return the value cached for ``key`` or ``default``. """
+
+        self.__lock.acquire()
+        try:
+            link = self.__map.get(key)
+            if link is None:
+                return default
+
+            if self.__is_expired(link):
+                self.__unlink(link)
+                del self.__map[key]
+                return default
+
+            self.__unlink(link)
+            self.__link_front(link)
+            return link[3]
+        finally:
+            self.__lock.release()
+
+    def set(self, key, value):
+        """ Cache ``value`` under ``key``. """
+
+        self.__lock.acquire()
+        try:
+            link = self.__map.get(key)
+            if link is not None:
+                self.__unlink(link)
+                link[3], link[4] = value, time.time()
+            else:
+                link = [None, None, key, value, time.time()]
+                self.__map[key] = link
+            self.__link_front(link)
+
+            if self.__max_size is not None:
+                while len(self.__map) > self.__max_size:
+                    last = self.__root[0]
+                    self.__unlink(last)
+                    del self.__map[last[2]]
+        finally:
+            self.__lock.release()
+
+    def invalidate(self, key):
+        """ Drop the entry cached for ``key``, if any. """
+
+        self.__lock.acquire()
+        try:
+            link = self.__map.pop(key, None)
+            if link is not None:
+                self.__unlink(link)
+        finally:
+            self.__lock.release()
+
+    def popitem(self):
+        """ Drop the least recently used entry and return its `(key,
+        value)`, raise `KeyError` if the cache is empty. """
+
+        self.__lock.acquire()
+        try:
+            last = self.__root[0]
+            if last is self.__root:
+                raise KeyError("popitem(): cache is empty")
+
+            self.__unlink(last)
+            del self.__map[last[2]]
+            return last[2], last[3]
+        finally:
+            self.__lock.release()
+
+    def clear(self):
+        """ Drop all entries. """
+
+        self.__lock.acquire()
+        try:
+            self.__clear()
+        finally:
+            self.__lock.release()
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __len__(self):
+        return len(self.__map)
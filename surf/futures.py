@@ -0,0 +1,214 @@
+# Copyright (c) 2009, Digital Enterprise Research Institute (DERI),
+# NUI Galway
+# All rights reserved.
+
+# author: Cosmin Basca
+# email: cosmin.basca@gmail.com
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer
+#      in the documentation and/or other materials provided with
+#      the distribution.
+#    * Neither the name of DERI nor the
+#      names of its contributors may be used to endorse or promote
+#      products derived from this software without specific prior
+#      written permission.
+
+# THIS SOFTWARE IS PROVIDED BY DERI ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DERI BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# -*- coding: utf-8 -*-
+""" Minimal futures and a bounded thread pool for running store calls
+concurrently. """
+
+from Queue import Queue
+from threading import Condition, Lock, Thread
+from weakref import WeakValueDictionary
+import atexit
+import sys
+
+DEFAULT_MAX_WORKERS = 8
+
+# Live pools by id, weakref.WeakSet is not available before Python 2.7.
+_pools = WeakValueDictionary()
+
+def _shutdown_pools():
+    """ Stop the workers of all live pools before the interpreter exits. """
+
+    for pool in _pools.values():
+        pool.shutdown(wait = True)
+
+atexit.register(_shutdown_pools)
+
+class Future(object):
+    """ The pending result of a call submitted to a :class:`ThreadPool`. """
+
+    def __init__(self):
+        self.__condition = Condition()
+        self.__done = False
+        self.__result = None
+        self.__exc_info = None
+        self.__callbacks = []
+
+    def done(self):
+        """ True if the call has finished, successfully or not. """
+
+        return self.__done
+
+    def result(self, timeout = None):
+        """ Wait for the call to finish and return its result.
+
+        If the call raised an exception, the same exception is raised here.
+        `RuntimeError` is raised if `timeout` seconds pass first.
+
+        """
+
+        self.__wait(timeout)
+        if self.__exc_info:
+            raise self.__exc_info[0], self.__exc_info[1], self.__exc_info[2]
+        return self.__result
+
+    def exception(self, timeout = None):
+        """ Wait for the call to finish and return the exception it raised,
+        or None. """
+
+        self.__wait(timeout)
+        return self.__exc_info and self.__exc_info[1] or None
+
+    def add_done_callback(self, callback):
+        """ Call `callback(future)` once the call finishes. """
+
+        self.__condition.acquire()
+        try:
+            if not self.__done:
+                self.__callbacks.append(callback)
+                return
+        finally:
+            self.__condition.release()
+        callback(self)
+
+    def set_result(self, result):
+        self.__finish(result, None)
+
+    def set_exc_info(self, exc_info):
+        self.__finish(None, exc_info)
+
+    def __wait(self, timeout):
+        self.__condition.acquire()
+        try:
+            if not self.__done:
+                self.__condition.wait(timeout)
+            if not self.__done:
+                raise RuntimeError("Timed out waiting for result")
+        finally:
+            self.__condition.release()
+
+    def __finish(self, result, exc_info):
+        self.__condition.acquire()
+        try:
+            self.__result = result
+            self.__exc_info = exc_info
+            self.__done = True
+            callbacks, self.__callbacks = self.__callbacks, []
+            self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+
+        for callback in callbacks:
+            callback(self)
+
+class ThreadPool(object):
+    """ Run callables on at most `max_workers` daemon threads.
+
+    Worker threads are started lazily, as calls are submitted.
+
+    """
+
+    def __init__(self, max_workers = DEFAULT_MAX_WORKERS):
+        max_workers = int(max_workers)
+        if max_workers < 1:
+            raise ValueError("max_workers must be a positive integer")
+
+        self.__max_workers = max_workers
+        self.__queue = Queue()
+        self.__workers = []
+        self.__lock = Lock()
+        self.__shutdown = False
+        _pools[id(self)] = self
+
+    max_workers = property(lambda self: self.__max_workers)
+
+    def submit(self, function, *args, **kwargs):
+        """ Schedule `function(*args, **kwargs)` and return its
+        :class:`Future`. """
+
+        future = Future()
+        self.__lock.acquire()
+        try:
+            if self.__shutdown:
+                raise RuntimeError("Cannot submit calls after shutdown")
+            self.__queue.put((future, function, args, kwargs))
+            if len(self.__workers) < self.__max_workers:
+                worker = Thread(target = self.__work)
+                worker.setDaemon(True)
+                worker.start()
+                self.__workers.append(worker)
+        finally:
+            self.__lock.release()
+
+        return future
+
+    def map(self, function, *iterables):
+        """ Like the built-in `map`, but calls run concurrently.
+
+        Results are returned in the order of the arguments.
+
+        """
+
+        futures = [self.submit(function, *args) for args in zip(*iterables)]
+        return [future.result() for future in futures]
+
+    def shutdown(self, wait = True):
+        """ Stop the workers once the queued calls are done. """
+
+        self.__lock.acquire()
+        try:
+            self.__shutdown = True
+            workers = list(self.__workers)
+        finally:
+            self.__lock.release()
+
+        for _ in workers:
+            self.__queue.put(None)
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def __work(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+
+            future, function, args, kwargs = item
+            try:
+                result = function(*args, **kwargs)
+            except:
+                future.set_exc_info(sys.exc_info())
+            else:
+                future.set_result(result)
@@ -50,6 +50,7 @@ class Multisession(Session):
 
         self.default_query_contexts = default_query_contexts
         self.proxy_class = proxy_class
+        self.sessions = {}
 
         super(Multisession, self).__init__(default_store=default_store, mapping=mapping,
                  auto_persist=auto_persist, auto_load=auto_load, query_contexts=default_query_contexts)
@@ -72,9 +73,30 @@ class Multisession(Session):
                                                 mapping=self.mapping,
                                                 auto_persist=self._Session__auto_persist,
                                                 auto_load=self._Session__auto_load,
-                                                query_contexts=list(query_contexts))
+                                                query_contexts=list(query_contexts),
+                                                use_cached=self.use_cached,
+                                                cache_expire=self.cache_expire,
+                                                cache_size=self.cache_size,
+                                                concurrent_load=self.concurrent_load,
+                                                load_workers=self.load_workers)
         return self.sessions[query_contexts]
 
+    def get_dirty_resources(self):
+        """ Getter function for the `dirty_resources` property.
+
+        Do not use this, use the `dirty_resources` property instead.
+
+        """
+
+        resources = Session.get_dirty_resources(self)
+        for session in self.sessions.values():
+            resources.extend(session.dirty_resources)
+        return resources
+
+    dirty_resources = property(fget=get_dirty_resources)
+    """ The `dirty` resources of the current thread in all the sessions of
+    this `multisession`, the ones :meth:`commit` will update. """
+
     def map_type(self, uri, store=None, query_contexts=None, *classes):
         if query_contexts is None:
             query_contexts = self.default_query_contexts
@@ -37,11 +37,18 @@ __author__ = 'Cosmin Basca'
 
 
 import sys
+from threading import RLock
+from UserDict import DictMixin
 
+from surf.cache import LRUCache
 from surf.rdf import ClosedNamespace, Namespace, RDF, RDFS
 
 __anonymous = 'NS'
 __anonymous_count = 0
+# Changes on every register() call, see get_generation().
+__generation = 0
+# Called with the prefixes of evicted anonymous namespaces.
+__forget_listeners = []
 
 ANNOTATION = Namespace('http://www.w3.org/2000/10/annotation-ns#')
 ANNOTEA = Namespace('http://www.w3.org/2002/01/bookmark#')
@@ -102,35 +109,211 @@ YAGO = Namespace('http://dbpedia.org/class/yago/')
 __fallback_namespace = SURF
 
 # Fix for http://code.google.com/p/rdflib/issues/detail?id=154
-def __unicode(namespace):
+def _unicode(namespace):
     uri = unicode(namespace)
     if type(uri) not in (str, unicode) and hasattr(namespace, 'uri'):
         uri = unicode(namespace.uri)
     return uri
 
-# an internal inverted dict - for fast access
-__inverted_dict__ = {}
-for k, v in sys.modules[__name__].__dict__.items():
-    if isinstance(v, Namespace) or isinstance(v, ClosedNamespace):
-        __inverted_dict__[__unicode(v)] = k
-        
-__direct_dict__ = {}
+class NamespaceRegistry(object):
+    """ Thread-safe registry of `namespaces` by prefix and by URI.
+
+    Besides the exact URI to prefix map, the registry can find the longest
+    registered namespace that a URI starts with, see :meth:`longest_match`.
+
+    Namespaces registered with ``anonymous=True`` (the ones created by
+    :func:`get_namespace` for unknown URIs) are kept in least recently
+    used order. If ``max_anonymous`` is set, the least recently used ones
+    are dropped once there are more of them.
+
+    """
+
+    def __init__(self, max_anonymous=None):
+        self.__lock = RLock()
+        self.__by_prefix = {}
+        self.__by_uri = {}
+        # Anonymous prefixes in least recently used order.
+        self.__anonymous = LRUCache()
+        self.__max_anonymous = max_anonymous
+
+    lock = property(fget=lambda self: self.__lock)
+    """ Reentrant lock of the registry, hold it to make several calls
+    atomic. """
+
+    def set_max_anonymous(self, max_anonymous):
+        """ Setter function for the `max_anonymous` property.
+
+        Do not use this, use the `max_anonymous` property instead.
+
+        """
+
+        self.__lock.acquire()
+        try:
+            self.__max_anonymous = max_anonymous
+            self.__evict()
+        finally:
+            self.__lock.release()
+
+    max_anonymous = property(fget=lambda self: self.__max_anonymous,
+                             fset=set_max_anonymous)
+    """ Maximum number of anonymous namespaces kept, None for no limit. """
+
+    def register(self, prefix, namespace, anonymous=False):
+        """ Register `namespace` under `prefix`, return the prefixes of the
+        anonymous namespaces evicted to make room for it. """
+
+        uri = _unicode(namespace)
+        self.__lock.acquire()
+        try:
+            self.__anonymous.invalidate(prefix)
+            previous = self.__by_prefix.get(prefix)
+            if previous is not None and \
+                    self.__by_uri.get(_unicode(previous)) == prefix:
+                del self.__by_uri[_unicode(previous)]
+            self.__by_prefix[prefix] = namespace
+            self.__by_uri[uri] = prefix
+            if anonymous:
+                self.__anonymous.set(prefix, True)
+            return self.__evict()
+        finally:
+            self.__lock.release()
+
+    def __evict(self):
+        evicted = []
+        while self.__max_anonymous is not None and \
+                len(self.__anonymous) > self.__max_anonymous:
+            prefix, _ = self.__anonymous.popitem()
+            uri = _unicode(self.__by_prefix.pop(prefix))
+            if self.__by_uri.get(uri) == prefix:
+                del self.__by_uri[uri]
+            evicted.append(prefix)
+        return evicted
+
+    def namespace(self, prefix):
+        """ Return the `namespace` registered under `prefix`, or None. """
+
+        self.__lock.acquire()
+        try:
+            self.__anonymous.get(prefix)
+            return self.__by_prefix.get(prefix)
+        finally:
+            self.__lock.release()
+
+    def prefix(self, uri):
+        """ Return the prefix of the `namespace` with the URI `uri`, or
+        None. """
+
+        self.__lock.acquire()
+        try:
+            prefix = self.__by_uri.get(uri)
+            if prefix is not None:
+                self.__anonymous.get(prefix)
+            return prefix
+        finally:
+            self.__lock.release()
+
+    def longest_match(self, uri):
+        """ Return the `(prefix, namespace)` of the longest registered
+        `namespace` that `uri` starts with, or `(None, None)`.
+
+        Only namespaces ending at a ``#`` or ``/`` of `uri` are considered,
+        so this takes one lookup per such separator. Anonymous namespaces
+        are skipped, they are just the bases of URIs seen before, and
+        matching them would make the result depend on the order URIs are
+        seen in.
+
+        """
+
+        uri = unicode(uri)
+        end = len(uri)
+        self.__lock.acquire()
+        try:
+            while end > 0:
+                end = max(uri.rfind('#', 0, end), uri.rfind('/', 0, end))
+                if end < 0:
+                    break
+                prefix = self.__by_uri.get(uri[:end + 1])
+                if prefix is not None and prefix not in self.__anonymous:
+                    return prefix, self.__by_prefix[prefix]
+            return None, None
+        finally:
+            self.__lock.release()
+
+    def all(self):
+        """ Return a dict of all registered `namespaces` by prefix. """
+
+        self.__lock.acquire()
+        try:
+            return dict(self.__by_prefix)
+        finally:
+            self.__lock.release()
+
+    def __len__(self):
+        return len(self.__by_prefix)
+
+class NamespaceView(DictMixin):
+    """ Read-only, dict-like view of the `namespaces` in a
+    :class:`NamespaceRegistry` by prefix, without copying them.
+
+    The namespaces in `overlay`, a dict by prefix, take precedence over the
+    registered ones.
+
+    """
+
+    def __init__(self, registry, overlay=None):
+        self.__registry = registry
+        self.__overlay = overlay or {}
+
+    def __getitem__(self, prefix):
+        if prefix in self.__overlay:
+            return self.__overlay[prefix]
+
+        namespace = self.__registry.namespace(prefix)
+        if namespace is None:
+            raise KeyError(prefix)
+        return namespace
+
+    def keys(self):
+        return self.__merged().keys()
+
+    def iteritems(self):
+        # One snapshot, namespaces may be evicted while iterating.
+        return self.__merged().iteritems()
+
+    def __merged(self):
+        namespaces = self.__registry.all()
+        namespaces.update(self.__overlay)
+        return namespaces
+
+# The registry of all namespaces, the predefined ones are registered first.
+registry = NamespaceRegistry()
 for k, v in sys.modules[__name__].__dict__.items():
     if isinstance(v, Namespace) or isinstance(v, ClosedNamespace):
-        __direct_dict__[k] = v
-
-def __add_inverted(prefix):
-    ns_dict = sys.modules[__name__].__dict__
-    __inverted_dict__[__unicode(ns_dict[prefix])] = prefix
-    
-def __add_direct(prefix):
-    ns_dict = sys.modules[__name__].__dict__
-    __direct_dict__[prefix] = ns_dict[prefix]
+        registry.register(k, v)
 
 def all():
     """ Return all the namespaces registered as a dict.
     """
-    return __direct_dict__
+    return registry.all()
+
+def set_max_anonymous(max_anonymous):
+    """ Limit the number of namespaces registered automatically by
+    :func:`get_namespace` for unknown URIs, None means no limit.
+
+    When the limit is reached, the least recently used automatically
+    registered namespace is dropped. If its URI is seen again, it gets
+    a new prefix.
+
+    """
+
+    registry.lock.acquire()
+    try:
+        before = registry.all()
+        registry.max_anonymous = max_anonymous
+        after = registry.all()
+        __forget([prefix for prefix in before if prefix not in after])
+    finally:
+        registry.lock.release()
 
 def base(property):
     """ Return the base part of a URI, `property` is a string denoting a URI.
@@ -173,18 +356,57 @@ def register(**namespaces):
 
     """
 
+    global __generation
+
+    ns_dict = sys.modules[__name__].__dict__
+    registry.lock.acquire()
+    try:
+        __generation += 1
+        for key in namespaces:
+            uri = namespaces[key]
+            prefix = key.upper()
+            if not type(uri) in [Namespace, ClosedNamespace]:
+                uri = Namespace(uri)
+
+            ns_dict[prefix] = uri
+            __forget(registry.register(prefix, uri))
+    finally:
+        registry.lock.release()
+
+def __forget(evicted):
+    """ Remove the `evicted` anonymous prefixes from the module and tell
+    the listeners added with :func:`add_forget_listener`. """
+
+    if not evicted:
+        return
+
     ns_dict = sys.modules[__name__].__dict__
-    for key in namespaces:
-        uri = namespaces[key]
-        prefix = key.upper()
-        if not type(uri) in [Namespace, ClosedNamespace]:
-            uri = Namespace(uri)
+    for prefix in evicted:
+        ns_dict.pop(prefix, None)
+    for listener in __forget_listeners:
+        listener(evicted)
+
+def add_forget_listener(listener):
+    """ Call `listener` with the list of prefixes of the anonymous
+    namespaces evicted from the registry, see :func:`set_max_anonymous`.
+
+    Unlike registering a namespace, evicting one doesn't change
+    :func:`get_generation`, caches of values derived from the namespaces
+    use this to drop only the values of the evicted prefixes.
+
+    """
+
+    __forget_listeners.append(listener)
+
+def get_generation():
+    """ Return a number that changes every time a namespace is registered.
 
-        ns_dict[prefix] = uri
+    Caches of values derived from the registered namespaces (such as
+    :func:`surf.util.attr2rdf`) use it to find out when to reset.
 
-        # Also keep inverted dict up-to-date.
-        __add_inverted(prefix)
-        __add_direct(prefix)
+    """
+
+    return __generation
 
 def register_fallback(namespace):
     """ Register a fallback namespace to use when creating resource without
@@ -225,20 +447,29 @@ def get_namespace(base):
     """
 
     global __anonymous_count
-    ns_dict = sys.modules[__name__].__dict__
 
     if not type(base) in [str, unicode]:
         base = str(base)
 
+    prefix = registry.prefix(base)
+    if prefix is not None:
+        return prefix, registry.namespace(prefix)
+
+    registry.lock.acquire()
     try:
-        prefix = __inverted_dict__[base]
-        uri = ns_dict[prefix]
-    except KeyError:
-        prefix = '%s%d' % (__anonymous, __anonymous_count + 1)
+        # Another thread may have registered it meanwhile.
+        prefix = registry.prefix(base)
+        if prefix is not None:
+            return prefix, registry.namespace(prefix)
+
         __anonymous_count += 1
+        prefix = '%s%d' % (__anonymous, __anonymous_count)
         uri = Namespace(base)
-        register(**{prefix: uri})
-    return prefix, uri
+        sys.modules[__name__].__dict__[prefix] = uri
+        __forget(registry.register(prefix, uri, anonymous = True))
+        return prefix, uri
+    finally:
+        registry.lock.release()
 
 def get_namespace_url(prefix):
     """ Return the `namespace` URI registered under the specified `prefix`
@@ -251,9 +482,8 @@ def get_namespace_url(prefix):
 
     """
 
-    ns_dict = sys.modules[__name__].__dict__
     try:
-        return ns_dict[prefix.__str__().upper()]
+        return registry.namespace(prefix.__str__().upper())
     except:
         return None
 
@@ -272,10 +502,25 @@ def get_prefix(uri):
     """
 
     try:
-        return __inverted_dict__[uri.__str__()]
+        return registry.prefix(uri.__str__())
     except:
         return None
 
+def longest_prefix(uri):
+    """ Return the `prefix` and the `namespace` of the longest registered
+    namespace that `uri` starts with, or `(None, None)` if there is none.
+    Namespaces registered automatically by :func:`get_namespace` are not
+    considered.
+
+    .. code-block:: python
+
+        >>> print ns.longest_prefix('http://sometest.ns/ns#symbol')
+        ('TEST', Namespace('http://sometest.ns/ns#'))
+
+    """
+
+    return registry.longest_match(uri)
+
 
 
 
@@ -36,8 +36,9 @@
 __author__ = 'Cosmin Basca'
 
 from surf.plugin.reader import RDFReader
-from surf.query import Query, Union, Group
+from surf.query import Query, Union, Group, Filter
 from surf.query import a, ask, select, optional_group, named_group
+from surf.query.prepared import is_param, param, prepare
 from surf.resource.util import Q
 from surf.rdf import URIRef
 
@@ -73,6 +74,94 @@ def query_S(s, direct, contexts):
 
     return query
 
+def subjects_filter(variable, subjects):
+    """ Return :class:`surf.query.Filter` that restricts ``variable`` to one
+    of the ``subjects``. """
+
+    terms = ["%s = <%s>" % (variable, subject) for subject in subjects]
+    return Filter("(%s)" % " || ".join(terms))
+
+def values_filter(variable, values):
+    """ Return :class:`surf.query.Filter` that restricts ``variable`` to one
+    of the ``values``, which can be URIs or literals. """
+
+    terms = ["%s = %s" % (variable, value.n3()) for value in values]
+    return Filter("(%s)" % " || ".join(terms))
+
+def predicates_filter(variable, direct, only=None, defer=None):
+    """ Return :class:`surf.query.Filter` that restricts ``variable`` to the
+    predicates in ``only`` and excludes the ones in ``defer``, or `None` if
+    there is nothing to restrict.
+
+    ``only`` and ``defer`` are lists of `(predicate, direct)` tuples, only
+    the ones matching ``direct`` are used. `rdf:type` is always kept, it is
+    needed to instantiate resources.
+
+    """
+
+    terms = []
+    if only is not None:
+        predicates = [p for p, d in only if d == direct]
+        if direct:
+            predicates.append(a)
+        terms.append(" || ".join(["%s = <%s>" % (variable, p)
+                                  for p in predicates]))
+    if defer:
+        terms.extend(["%s != <%s>" % (variable, p) for p, d in defer
+                      if d == direct and p != a])
+
+    terms = [term for term in terms if term]
+    if not terms:
+        return None
+    return Filter("(%s)" % " && ".join(["(%s)" % term for term in terms]))
+
+def query_SP_many(subjects, p, direct, contexts):
+    """ Construct :class:`surf.query.Query` with `?s`, `?v` and `?g`, `?c`
+    as unknowns, `?s` is restricted to the given ``subjects``.
+
+    This is the batched counterpart of :func:`query_SP`.
+
+    """
+
+    s, v = direct and ('?s', '?v') or ('?v', '?s')
+    query = select('?s', '?v', '?c', '?g').distinct()
+    query.where((s, p, v)).optional_group(('?v', a, '?c'))\
+                          .optional_group(named_group('?g', ('?v', a, '?c')))
+    query.filter(subjects_filter('?s', subjects))
+    if contexts:
+        query.from_(*contexts)
+        query.from_named(*contexts)
+
+    return query
+
+def query_S_many(subjects, direct, contexts, only=None, defer=None):
+    """ Construct :class:`surf.query.Query` with `?s`, `?p`, `?v` and `?g`,
+    `?c` as unknowns, `?s` is restricted to the given ``subjects``.
+
+    This is the batched counterpart of :func:`query_S`, the restriction is
+    expressed as a SPARQL 1.0 compatible *FILTER* so that it works on
+    endpoints without support for *VALUES* or *IN*.
+
+    ``only`` and ``defer`` restrict the loaded predicates, see
+    :func:`predicates_filter`.
+
+    """
+
+    s, v = direct and ('?s', '?v') or ('?v', '?s')
+    query = select('?s', '?p', '?v', '?c', '?g').distinct()
+    query.where((s, '?p', v)).optional_group(('?v', a, '?c'))\
+                             .optional_group(named_group('?g', (s, a, v)))\
+                             .optional_group(named_group('?g', ('?v', a, '?c')))
+    query.filter(subjects_filter('?s', subjects))
+    restriction = predicates_filter('?p', direct, only, defer)
+    if restriction:
+        query.filter(restriction)
+    if contexts:
+        query.from_(*contexts)
+        query.from_named(*contexts)
+
+    return query
+
 def query_Ask(subject, contexts):
     """ Construct :class:`surf.query.Query` of type **ASK**. """
 
@@ -84,6 +173,34 @@ def query_Ask(subject, contexts):
 
     return query
 
+def query_Ask_SPV(s, p, v, direct, contexts):
+    """ Construct :class:`surf.query.Query` of type **ASK** for one value
+    ``v`` of the predicate ``p``, or for any value if ``v`` is `None`. """
+
+    if v is None:
+        v = '?v'
+    s, v = direct and (s, v) or (v, s)
+    query = ask().where((s, p, v))
+
+    if contexts:
+        query.from_(*contexts)
+        query.from_named(*contexts)
+
+    return query
+
+def query_Count_SP(s, p, direct, contexts):
+    """ Construct :class:`surf.query.Query` with the number of distinct
+    values of the predicate ``p`` as `?count`. """
+
+    s, v = direct and (s, '?v') or ('?v', s)
+    query = select("(count(distinct ?v) as ?count)").where((s, p, v))
+
+    if contexts:
+        query.from_(*contexts)
+        query.from_named(*contexts)
+
+    return query
+
 #Resource class level
 def query_P_S(c, p, direct, context):
     """ Construct :class:`surf.query.Query` with `?s` and `?g`, `?c` as
@@ -96,7 +213,7 @@ def query_P_S(c, p, direct, context):
 
     for i in range(len(p)):
         s, v = direct and  ('?s', '?v%d' % i) or ('?v%d' % i, '?s')
-        if type(p[i]) is URIRef:
+        if type(p[i]) is URIRef or is_param(p[i]):
             query.where((s, p[i], v))
 
     query.optional_group(('?s', a, '?c'))
@@ -104,11 +221,114 @@ def query_P_S(c, p, direct, context):
 
     return query
 
+def query_PV_S(c, p, values, direct, context):
+    """ Construct :class:`surf.query.Query` with `?v`, `?s` and `?g`, `?c`
+    as unknowns, `?s` being instances of ``c`` that have one of the
+    ``values`` as value `?v` of the predicate ``p``.
+
+    The values are restricted with a SPARQL 1.0 compatible *FILTER*, the
+    same way :func:`query_S_many` does it.
+
+    """
+
+    query = select('?v', '?s', '?c', '?g').distinct()
+    if context:
+        query.from_(context)
+        query.from_named(context)
+
+    s, v = direct and ('?s', '?v') or ('?v', '?s')
+    query.where((s, p, v))
+    if c:
+        query.where(('?s', a, c))
+    query.filter(values_filter('?v', values))
+
+    query.optional_group(('?s', a, '?c'))
+    query.optional_group(named_group('?g', ('?s', a, '?c')))
+
+    return query
+
 def query_Concept(subject):
     """ Construct :class:`surf.query.Query` with `?c` as the unknown. """
 
     return select('?c').distinct().where((subject, a, '?c'))
 
+def context_params(contexts):
+    """ Return :func:`surf.query.prepared.param` placeholders for
+    ``contexts`` and the values to bind them to. """
+
+    contexts = contexts or []
+    names = ["context%d" % i for i in range(len(contexts))]
+    return [param(name) for name in names], dict(zip(names, contexts))
+
+def prepared_SP(s, p, direct, contexts):
+    """ Prepared counterpart of :func:`query_SP`. """
+
+    context_shape, values = context_params(contexts)
+    template = prepare(("SP", direct, len(context_shape)),
+                       lambda: query_SP(param("s"), param("p"), direct, context_shape))
+    return template.bind(s=s, p=p, **values)
+
+def prepared_S(s, direct, contexts):
+    """ Prepared counterpart of :func:`query_S`. """
+
+    context_shape, values = context_params(contexts)
+    template = prepare(("S", direct, len(context_shape)),
+                       lambda: query_S(param("s"), direct, context_shape))
+    return template.bind(s=s, **values)
+
+def prepared_Ask(subject, contexts):
+    """ Prepared counterpart of :func:`query_Ask`. """
+
+    context_shape, values = context_params(contexts)
+    template = prepare(("Ask", len(context_shape)),
+                       lambda: query_Ask(param("s"), context_shape))
+    return template.bind(s=subject, **values)
+
+def prepared_Ask_SPV(s, p, v, direct, contexts):
+    """ Prepared counterpart of :func:`query_Ask_SPV`. """
+
+    context_shape, values = context_params(contexts)
+    if v is None:
+        template = prepare(("Ask_SP", direct, len(context_shape)),
+                           lambda: query_Ask_SPV(param("s"), param("p"), None,
+                                                 direct, context_shape))
+        return template.bind(s=s, p=p, **values)
+
+    template = prepare(("Ask_SPV", direct, len(context_shape)),
+                       lambda: query_Ask_SPV(param("s"), param("p"), param("v"),
+                                             direct, context_shape))
+    return template.bind(s=s, p=p, v=v, **values)
+
+def prepared_Count_SP(s, p, direct, contexts):
+    """ Prepared counterpart of :func:`query_Count_SP`. """
+
+    context_shape, values = context_params(contexts)
+    template = prepare(("Count_SP", direct, len(context_shape)),
+                       lambda: query_Count_SP(param("s"), param("p"), direct,
+                                              context_shape))
+    return template.bind(s=s, p=p, **values)
+
+def prepared_P_S(c, p, direct, context):
+    """ Prepared counterpart of :func:`query_P_S`. """
+
+    shape = tuple([type(attribute) is URIRef for attribute in p])
+    attribute_shape = [uri and param("p%d" % i) or None
+                       for i, uri in enumerate(shape)]
+    values = dict([("p%d" % i, attribute) for i, attribute in enumerate(p)
+                   if shape[i]])
+    context_shape = None
+    if context:
+        context_shape, values["context"] = param("context"), context
+    template = prepare(("P_S", shape, direct, bool(context)),
+                       lambda: query_P_S(None, attribute_shape, direct, context_shape))
+    return template.bind(**values)
+
+def prepared_Concept(subject):
+    """ Prepared counterpart of :func:`query_Concept`. """
+
+    template = prepare(("Concept",), lambda: query_Concept(param("s")))
+    return template.bind(s=subject)
+
 class RDFQueryReader(RDFReader):
     """ Super class for SuRF Reader plugins that wrap queryable `stores`. """
 
@@ -120,32 +340,76 @@ class RDFQueryReader(RDFReader):
         elif type(self.use_subqueries) is not bool:
             raise ValueError('The use_subqueries parameter must be a bool or a string set to "true" or "false"')
 
+        # How many subjects are loaded by one query in eager loading.
+        try:
+            self.batch_size = int(kwargs.get('batch_size', 100))
+        except (TypeError, ValueError):
+            raise ValueError('The batch_size parameter must be an integer')
+        if self.batch_size < 1:
+            raise ValueError('The batch_size parameter must be greater than 0')
+
     #protected interface
     def _get(self, subject, attribute, direct, query_contexts):
-        query = query_SP(subject, attribute, direct, query_contexts)
+        query = prepared_SP(subject, attribute, direct, query_contexts)
         result = self._execute(query)
         return self.convert(result, 'v', 'g', 'c')
 
+    def _get_many(self, subjects, attribute, direct, query_contexts):
+        # One query per batch_size subjects.
+        values = {}
+        for start in range(0, len(subjects), self.batch_size):
+            chunk = subjects[start:start + self.batch_size]
+            query = query_SP_many(chunk, attribute, direct, query_contexts)
+            result = self._execute(query)
+            values.update(self.convert(result, 's', 'v', 'g', 'c') or {})
+
+        return values
+
     def _load(self, subject, direct, query_contexts):
-        query = query_S(subject, direct, query_contexts)
+        query = prepared_S(subject, direct, query_contexts)
         result = self._execute(query)
         return self.convert(result, 'p', 'v', 'g', 'c')
 
     def _is_present(self, subject, query_contexts):
-        query = query_Ask(subject, query_contexts)
+        query = prepared_Ask(subject, query_contexts)
         result = self._execute(query)
         return self._ask(result)
 
+    def _has_value(self, subject, attribute, value, direct, query_contexts):
+        query = prepared_Ask_SPV(subject, attribute, value, direct,
+                                 query_contexts)
+        result = self._execute(query)
+        return self._ask(result)
+
+    def _count_values(self, subject, attribute, direct, query_contexts):
+        query = prepared_Count_SP(subject, attribute, direct, query_contexts)
+        table = list(self._to_table(self._execute(query)))
+        if not table or table[0].get("count") is None:
+            return 0
+
+        return int(table[0]["count"])
+
     def _concept(self, subject):
-        query = query_Concept(subject)
+        query = prepared_Concept(subject)
         result = self._execute(query)
         return self.convert(result, 'c')
 
     def _instances_by_attribute(self, concept, attributes, direct, context):
-        query = query_P_S(concept, attributes, direct, context)
+        query = prepared_P_S(concept, attributes, direct, context)
         result = self._execute(query)
         return self.convert(result, 's', 'g', 'c')
 
+    def _instances_by_values(self, concept, attribute, values, direct, context):
+        # One query per batch_size values.
+        instances = {}
+        for start in range(0, len(values), self.batch_size):
+            chunk = values[start:start + self.batch_size]
+            query = query_PV_S(concept, attribute, chunk, direct, context)
+            result = self._execute(query)
+            instances.update(self.convert(result, 'v', 's', 'g', 'c') or {})
+
+        return instances
+
     @classmethod
     def __edge_iterator(cls, edge='e'):
         edge_idx = 0
@@ -285,7 +549,7 @@ class RDFQueryReader(RDFReader):
             if self.use_subqueries:
                 return self.__get_by_subquery(params)
             else:
-                return self.__get_by_n_queries(params)
+                return self.__get_by_batch_queries(params)
 
         # No details, just subjects and classes
         query = select("?s", "?c", "?g")
@@ -323,7 +587,32 @@ class RDFQueryReader(RDFReader):
 
         return results
 
-    def __get_by_n_queries(self, params):
+    def _count_by(self, params):
+        # Limit and offset are applied to the total count afterwards, order
+        # doesn't matter for counting.
+        count_params = params.copy()
+        for key in ["limit", "offset", "order", "desc", "full"]:
+            count_params.pop(key, None)
+
+        query = select("(count(distinct ?s) as ?count)")
+        self.__apply_limit_offset_order_get_by_filter(count_params, query)
+
+        contexts = params.get("contexts", None)
+        if contexts:
+            query.from_(*contexts)
+            query.from_named(*contexts)
+
+        table = list(self._to_table(self._execute(query)))
+        if not table or table[0].get("count") is None:
+            return 0
+
+        count = int(table[0]["count"]) - params.get("offset", 0)
+        if params.get("limit") is not None:
+            count = min(count, params["limit"])
+
+        return max(count, 0)
+
+    def __get_by_batch_queries(self, params):
         contexts = params.get("contexts", None)
 
         query = select("?s")
@@ -333,21 +622,43 @@ class RDFQueryReader(RDFReader):
 
         self.__apply_limit_offset_order_get_by_filter(params, query)
 
-        # Load details, for now the simplest approach with N queries.
         # Use _to_table instead of convert to preserve order.
+        subjects = [match["s"] for match in self._to_table(self._execute(query))]
+
+        # Load details for chunks of batch_size subjects, one query per
+        # chunk and direction, then split results per subject.
+        seen, unique_subjects = set(), []
+        for subject in subjects:
+            if subject not in seen:
+                seen.add(subject)
+                unique_subjects.append(subject)
+
+        # only() without inverse attributes needs no inverse queries.
+        only, defer = params.get("only"), params.get("defer")
+        load_inverse = not params.get("only_direct") and \
+            (only is None or [p for p, direct in only if not direct])
+
+        direct_data, inverse_data = {}, {}
+        for start in range(0, len(unique_subjects), self.batch_size):
+            chunk = unique_subjects[start:start + self.batch_size]
+
+            result = self._execute(query_S_many(chunk, True, contexts,
+                                                only, defer))
+            direct_data.update(self.convert(result, 's', 'p', 'v', 'g', 'c')
+                               or {})
+
+            if load_inverse:
+                result = self._execute(query_S_many(chunk, False, contexts,
+                                                    only, defer))
+                inverse_data.update(self.convert(result, 's', 'p', 'v', 'g', 'c')
+                                    or {})
+
         results = []
-        for match in self._to_table(self._execute(query)):
-            subject = match["s"]
+        for subject in subjects:
             instance_data = {}
-
-            result = self._execute(query_S(subject, True, contexts))
-            result = self.convert(result, 'p', 'v', 'g', 'c')
-            instance_data["direct"] = result
-
+            instance_data["direct"] = direct_data.get(subject, {})
             if not params.get("only_direct"):
-                result = self._execute(query_S(subject, False, contexts))
-                result = self.convert(result, 'p', 'v', 'g', 'c')
-                instance_data["inverse"] = result
+                instance_data["inverse"] = inverse_data.get(subject, {})
 
             results.append((subject, instance_data))
 
@@ -372,6 +683,10 @@ class RDFQueryReader(RDFReader):
                     optional_group(('?v', a, '?c')),
                     optional_group(named_group("?g", ("?s", a, "?v"))))
                     #optional_group(named_group("?g", ("?v", a, "?c"))))
+        restriction = predicates_filter('?p', True, params.get("only"),
+                                        params.get("defer"))
+        if restriction:
+            query.filter(restriction)
         query.where(inner_query)
         if contexts:
             query.from_(*contexts)
@@ -441,6 +756,13 @@ class RDFQueryReader(RDFReader):
         return None
 
     def _to_table(self, result):
+        """ To be implemented by classes the inherit from `RDFQueryReader`.
+
+        Return the rows of ``result`` as dictionaries, any iterable of rows
+        will do, e.g. rows parsed while they are read from the endpoint.
+
+        """
+
         return []
 
     def __convert(self, query_result, *keys):
@@ -50,6 +50,17 @@ class RDFReader(Plugin):
 
         return None
 
+    def _get_many(self, subjects, attribute, direct, context):
+        """ To be implemented by classes that inherit `RDFReader`.
+
+        This method is called directly by :meth:`get_many`. By default,
+        :meth:`_get` is called for each subject.
+
+        """
+
+        return dict([(subject, self._get(subject, attribute, direct, context))
+                     for subject in subjects])
+
     def _load(self, subject, context):
         """ To be implemented by classes that inherit `RDFReader`.
 
@@ -68,6 +79,26 @@ class RDFReader(Plugin):
 
         return False
 
+    def _has_value(self, subject, attribute, value, direct, context):
+        """ To be implemented by classes that inherit `RDFReader`.
+
+        This method is called directly by :meth:`has_value`. Return `None`
+        if the reader cannot check a single value by itself.
+
+        """
+
+        return None
+
+    def _count_values(self, subject, attribute, direct, context):
+        """ To be implemented by classes that inherit `RDFReader`.
+
+        This method is called directly by :meth:`count_values`. Return
+        `None` if the reader cannot count values by itself.
+
+        """
+
+        return None
+
     def _concept(self, subject):
         """ To be implemented by classes that inherit `RDFReader`.
 
@@ -86,10 +117,40 @@ class RDFReader(Plugin):
 
         return []
 
+    def _instances_by_values(self, concept, attribute, values, direct, context):
+        """ To be implemented by classes that inherit `RDFReader`.
+
+        This method is called directly by :meth:`instances_by_values`. By
+        default, :meth:`_get` is called for each value and the subjects that
+        are not instances of ``concept`` are left out.
+
+        """
+
+        contexts = context and [context] or []
+        instances = {}
+        for value in values:
+            subjects = self._get(value, attribute, not direct, contexts) or {}
+            for subject, types in subjects.items():
+                if concept and not [t for t in types.values() if concept in t]:
+                    continue
+                instances.setdefault(value, {})[subject] = types
+
+        return instances
+
     def _get_by(self, params):
 
         return []
 
+    def _count_by(self, params):
+        """ To be implemented by classes that inherit `RDFReader`.
+
+        This method is called directly by :meth:`count_by`. Return `None`
+        if the reader cannot count resources by itself.
+
+        """
+
+        return None
+
     #public interface
     def get(self, resource, attribute, direct):
         """ Return the `value(s)` of the corresponding `attribute`.
@@ -102,6 +163,23 @@ class RDFReader(Plugin):
         subj = hasattr(resource, 'subject') and resource.subject or resource
         return self._get(subj, attribute, direct, resource.session.query_contexts)
 
+    def get_many(self, resources, attribute, direct):
+        """ Return the `value(s)` of the corresponding `attribute` for each
+        of the ``resources``, as a dict keyed by subject.
+
+        This is the batched counterpart of :meth:`get`. The query contexts of
+        the first resource's session are used.
+
+        """
+
+        if not resources:
+            return {}
+
+        subjects = [hasattr(resource, 'subject') and resource.subject or resource
+                    for resource in resources]
+        return self._get_many(subjects, attribute, direct,
+                              resources[0].session.query_contexts)
+
     def load(self, resource, direct):
         """ Fully load the ``resource`` from the `store`.
 
@@ -121,6 +199,35 @@ class RDFReader(Plugin):
         subj = hasattr(resource, 'subject') and resource.subject or resource
         return self._is_present(subj, resource.session.query_contexts)
 
+    def has_value(self, resource, attribute, value, direct):
+        """ Return `True` if ``value`` is one of the values of the
+        corresponding `attribute`, or `None` if the reader can't tell
+        without loading all of them with :meth:`get`. If ``value`` is
+        `None`, return `True` if the `attribute` has any value.
+
+        If ``direct`` is `False` then the subject of the ``resource`` is
+        considered the object of the query.
+
+        """
+
+        subj = hasattr(resource, 'subject') and resource.subject or resource
+        return self._has_value(subj, attribute, value, direct,
+                               resource.session.query_contexts)
+
+    def count_values(self, resource, attribute, direct):
+        """ Return the number of values of the corresponding `attribute`,
+        or `None` if the reader can't count them without loading them with
+        :meth:`get`.
+
+        If ``direct`` is `False` then the subject of the ``resource`` is
+        considered the object of the query.
+
+        """
+
+        subj = hasattr(resource, 'subject') and resource.subject or resource
+        return self._count_values(subj, attribute, direct,
+                                  resource.session.query_contexts)
+
     def concept(self, resource):
         """ Return the `concept` URI of the following `resource`.
 
@@ -145,5 +252,29 @@ class RDFReader(Plugin):
         return self._instances_by_attribute(concept, attributes, direct,
                                             context)
 
+    def instances_by_values(self, resource, attribute, values, direct, context):
+        """ Return the `URIs` of the instances of ``resource`` that have one
+        of the ``values`` as value of the ``attribute``, grouped by value.
+
+        This is the bulk counterpart of :meth:`instances_by_attribute`, the
+        result is a dict mapping each found value to a dict of subjects.
+
+        If ``direct`` is `False`, than the subject of the ``resource``
+        is considered the object of the query.
+
+        """
+
+        concept = hasattr(resource, 'uri') and  resource.uri or resource
+        return self._instances_by_values(concept, attribute, list(values),
+                                         direct, context)
+
     def get_by(self, params):
         return self._get_by(params)
+
+    def count_by(self, params):
+        """ Return the number of resources :meth:`get_by` would return for
+        the same ``params``, or `None` if counting is not supported.
+
+        """
+
+        return self._count_by(params)
@@ -101,15 +101,24 @@ class RDFWriter(Plugin):
                 raise InvalidResourceException("Arguments must be of type surf.resource.Resource")
 
         self._save(*resources)
+        for resource in resources:
+            resource._set_stored()
 
     def update(self, *resources):
-        """ Update the ``*resources`` to the `store` - persist. """
+        """ Update the ``*resources`` to the `store` - persist.
+
+        Only the changes since the ``*resources`` were loaded or saved are
+        written, see :attr:`surf.resource.Resource.rdf_changes`.
+
+        """
 
         for resource in resources:
             if not hasattr(resource, "subject"):
                 raise InvalidResourceException("Arguments must be of type surf.resource.Resource")
 
-        self._update(resource)
+        self._update(*resources)
+        for resource in resources:
+            resource._set_stored()
 
     def remove(self, *resources, **kwargs):
         """ Completely remove the ``*resources`` from the `store`. """
@@ -121,6 +130,8 @@ class RDFWriter(Plugin):
                 raise InvalidResourceException("Arguments must be of type surf.resource.Resource")
 
         self._remove(*resources, **kwargs)
+        for resource in resources:
+            resource._set_stored(False)
 
     def size(self):
         """ Return the number of `triples` in the current `store`. """
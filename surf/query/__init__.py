@@ -156,8 +156,9 @@ class Query(object):
     def _validate_variable(self, var):
         if type(var) in [str, unicode]:
             if not var.startswith('?'):
+                # Aggregates may be aliased: "(count(?s) as ?count)"
                 for aggregate in Query.AGGREGATE_FUCTIONS:
-                    if var.lower().startswith(aggregate):
+                    if var.lower().lstrip('(').startswith(aggregate):
                         return True
                 raise ValueError('''Not a variable : <%s>, check correct syntax ("?" or
                                  supported aggregate %s)''' % (var, str(Query.AGGREGATE_FUCTIONS)))
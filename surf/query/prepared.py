@@ -0,0 +1,137 @@
+# Copyright (c) 2009, Digital Enterprise Research Institute (DERI),
+# NUI Galway
+# All rights reserved.
+
+# author: Cosmin Basca
+# email: cosmin.basca@gmail.com
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer
+#      in the documentation and/or other materials provided with
+#      the distribution.
+#    * Neither the name of DERI nor the
+#      names of its contributors may be used to endorse or promote
+#      products derived from this software without specific prior
+#      written permission.
+
+# THIS SOFTWARE IS PROVIDED BY DERI ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DERI BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# -*- coding: utf-8 -*-
+""" Prepared queries, translated once and bound to values at call time.
+
+A query *shape* is built as a regular :class:`surf.query.Query` with
+:func:`param` placeholders in place of the varying terms:
+
+>>> from surf.query import select
+>>> from surf.query.prepared import param, prepare
+>>> template = prepare("by_subject",
+...                    lambda: select("?p", "?o").where((param("s"), "?p", "?o")))
+>>> print template.bind(s = URIRef("http://a"))
+SELECT  ?p ?o   WHERE {  <http://a> ?p ?o  }    
+
+"""
+
+import re
+
+from surf.cache import LRUCache
+from surf.query.translator.sparql import SparqlTranslator
+from surf.rdf import URIRef
+
+DEFAULT_TEMPLATE_CACHE_SIZE = 1000
+
+# Placeholders look like variables so that they pass statement validation.
+PARAMETER_PATTERN = re.compile(u"\\?\x00(\\w+)\x00")
+
+def param(name):
+    """ Return a placeholder for the parameter `name`.
+
+    It can be used wherever a term or a graph URI is expected.
+
+    """
+
+    return u"?\x00%s\x00" % name
+
+def is_param(term):
+    """ True if `term` is a :func:`param` placeholder. """
+
+    return type(term) is unicode and PARAMETER_PATTERN.match(term) is not None
+
+class BoundQuery(unicode):
+    """ The translated text of a :class:`PreparedQuery` bound to values.
+
+    Like :class:`surf.query.Query`, it has a `query_type` and converts to
+    the query string with `unicode()`.
+
+    """
+
+    def __new__(cls, text, query_type):
+        query = unicode.__new__(cls, text)
+        query.query_type = query_type
+        return query
+
+class PreparedQuery(object):
+    """ A :class:`surf.query.Query` translated once, with placeholders to be
+    replaced by :meth:`bind`. """
+
+    def __init__(self, query):
+        translator = SparqlTranslator(query)
+        self.__query_type = query.query_type
+        self.__term = translator._term
+        self.__parts = PARAMETER_PATTERN.split(translator.translate())
+        # Graph URIs are already enclosed in <> by the translator.
+        self.__raw = [self.__parts[i - 1].endswith("<")
+                      for i in range(1, len(self.__parts), 2)]
+
+    query_type = property(lambda self: self.__query_type)
+
+    def parameters(self):
+        """ Return the names of the parameters, in order of appearance. """
+
+        return self.__parts[1::2]
+
+    def bind(self, **values):
+        """ Return the :class:`BoundQuery` with placeholders replaced by
+        `values`. """
+
+        parts = list(self.__parts)
+        for index, raw in enumerate(self.__raw):
+            position = 2 * index + 1
+            try:
+                value = values[parts[position]]
+            except KeyError:
+                raise ValueError("Missing value for parameter %s" % parts[position])
+            parts[position] = raw and unicode(value) or self.__term(value)
+
+        return BoundQuery(u"".join(parts), self.__query_type)
+
+_templates = LRUCache(max_size = DEFAULT_TEMPLATE_CACHE_SIZE)
+
+def prepare(key, build):
+    """ Return the :class:`PreparedQuery` for the query shape `key`.
+
+    `build` is called without arguments to construct the shape the first
+    time `key` is seen, afterwards the cached template is returned.
+
+    """
+
+    template = _templates.get(key)
+    if template is None:
+        template = PreparedQuery(build())
+        _templates.set(key, template)
+    return template
@@ -38,7 +38,8 @@ __author__ = 'Cosmin Basca'
 import re
 import new
 
-from surf.namespace import get_namespace_url, get_prefix, OWL, all
+from surf.namespace import get_namespace_url, get_prefix, OWL, NamespaceView
+from surf.namespace import registry
 from surf.query import Query
 from surf.rdf import BNode, ClosedNamespace, ConjunctiveGraph, Graph, Literal
 from surf.rdf import Namespace, RDF, RDFS, URIRef
@@ -48,7 +49,7 @@ from surf.rest import Rest
 from surf.serializer import to_json
 from surf.store import NO_CONTEXT, Store
 from surf.util import attr2rdf, namespace_split, rdf2attr
-from surf.util import uri_to_class, uuid_subject, value_to_rdf
+from surf.util import uuid_subject, value_to_rdf
 
 a = RDF.type
 class ResourceMeta(type):
@@ -67,8 +68,9 @@ class ResourceMeta(type):
         the `instances` are selected from the values of the specified
         predicate (`attr_name`).
 
-        For now these are not persisted in the `Resource` class - next time
-        the method is called the instances are retrieved from the `store` again.
+        The class is seen as an instance of owl:Class, which the `session`
+        keeps between calls if `use_cached` is on, see
+        `Session.class_instance`.
 
         """
 
@@ -76,13 +78,11 @@ class ResourceMeta(type):
             return None
 
         # Don't want to reimplement Resource.__getattr__.
-        # Instantiate this class as instance of owl:Class and
-        # proxy to its __getattr__.
+        # Proxy to the __getattr__ of this class as instance of owl:Class.
+        if not self.session:
+            raise AttributeError(attr_name)
 
-        # If this method gets used often, we'll need to add caching
-        # for self_as_instance.
-
-        self_as_instance = self._instance(self.uri, [OWL.Class])
+        self_as_instance = self.session.class_instance(self)
         return getattr(self_as_instance, attr_name)
 
 
@@ -156,7 +156,6 @@ class Resource(object):
     """
 
     __metaclass__ = ResourceMeta
-    _dirty_instances = set()
 
     def __init__(self, subject=None, block_auto_load=False, context=None,
                  namespace=None):
@@ -179,6 +178,7 @@ class Resource(object):
             subject = URIRef(subject)
 
         self.__subject = subject
+        self.__dirty = False
 
         if context == NO_CONTEXT:
             self.__context = None
@@ -191,7 +191,12 @@ class Resource(object):
         self.__rdf_direct = {}
         self.__rdf_direct[a] = [self.uri]
         self.__rdf_inverse = {}
-        self.__namespaces = all()
+        # Direct values as last read from or written to the store, by
+        # predicate. Compared with __rdf_direct to find the changes.
+        self.__rdf_stored = {}
+        # Namespaces bound to this resource only, see bind_namespaces().
+        self.__namespaces = {}
+        self.__namespaces_view = NamespaceView(registry, self.__namespaces)
         # __full is set to true after doing full load. This is used by
         # __getattr__ to decide if it's worth to query triplestore.
         self.__full = False
@@ -206,25 +211,22 @@ class Resource(object):
     subject = property(lambda self: self.__subject)
     """ The subject of the resource. """
 
-    namespaces = property(fget=lambda self: self.__namespaces)
-    """ The namespaces. """
+    namespaces = property(fget=lambda self: self.__namespaces_view)
+    """ The namespaces, the registered ones and the ones bound to this
+    resource, as a read-only :class:`surf.namespace.NamespaceView`. """
 
     def set_dirty(self, dirty):
         if not isinstance(dirty, bool):
             raise ValueError('Value must be of type bool not <%s>' % type(dirty))
 
-        # Setting dirty to "True" means: 
-        # adding this instance to "dirty_instances" set
-        if dirty and not self in self._dirty_instances:
-            self._dirty_instances.add(self)
-
-        # Setting dirty to "False" means: 
-        # removing this instance from "dirty_instances" set
-        if not dirty and self in self._dirty_instances:
-            self._dirty_instances.remove(self)
+        # The session keeps track of its dirty resources, so that
+        # Session.commit can update them.
+        if dirty != self.__dirty and self.session:
+            self.session._track_dirty(self, dirty)
+        self.__dirty = dirty
 
     def get_dirty(self):
-        return self in self._dirty_instances
+        return self.__dirty
 
     dirty = property(fget=get_dirty, fset=set_dirty)
     """ Reflects the `dirty` state of the resource. """
@@ -235,6 +237,53 @@ class Resource(object):
     rdf_inverse = property(fget=lambda self: self.__rdf_inverse)
     """ Inverse predicates (`incoming` predicates). """
 
+    def get_rdf_changes(self):
+        """ Getter function for the `rdf_changes` property.
+
+        Do not use this, use the `rdf_changes` property instead.
+
+        """
+
+        changes = {}
+        for predicate, values in self.__rdf_direct.items():
+            stored = self.__rdf_stored.get(predicate)
+            if stored is None and self.__full:
+                # A full load saw every predicate the store has.
+                stored = []
+
+            if stored is None:
+                changes[predicate] = (list(values), None)
+                continue
+
+            stored_set, values_set = set(stored), set(values)
+            added = [value for value in values if value not in stored_set]
+            removed = [value for value in stored if value not in values_set]
+            if added or removed:
+                changes[predicate] = (added, removed)
+
+        return changes
+
+    rdf_changes = property(fget=get_rdf_changes)
+    """ Changes of the direct predicates since they were loaded or saved, as
+    a dict of `(added, removed)` value lists by predicate.
+
+    `removed` is None when the values in the store are not known, then all of
+    them have to be replaced by `added`. Unchanged predicates are left out.
+
+    """
+
+    def _set_stored(self, stored=True):
+        """ For **internal** use only, called by the `writer` once the
+        `resource` has been saved or updated (or removed if `stored` is
+        False). """
+
+        if stored:
+            self.__rdf_stored = dict([(predicate, list(values))
+                                      for predicate, values
+                                      in self.__rdf_direct.items()])
+        else:
+            self.__rdf_stored = {}
+
     def __set_context(self, value):
         if not isinstance(value, URIRef):
             value = URIRef(value)
@@ -293,8 +342,9 @@ class Resource(object):
         uri = vals[0]
         # vals might be an iterator, but we want each 
         # element from it as separate argument, so
-        # converting to list.
-        classes = map(uri_to_class, list(vals[1:]))
+        # converting to list. The other concepts are passed by URI, so
+        # map_type() reuses its classes for them.
+        classes = list(vals[1:])
 
         return cls.session.map_instance(uri, subject, classes=classes,
                                         block_auto_load=block_auto_load,
@@ -347,16 +397,19 @@ class Resource(object):
         """
 
         if graph is not None:
-            for prefix in self.namespaces:
-                graph.namespace_manager.bind(prefix, self.namespaces[prefix])
+            for prefix, namespace in self.namespaces.items():
+                graph.namespace_manager.bind(prefix, namespace)
 
     @classmethod
     def get_dirty_instances(cls):
         """
-        Return all the unsaved (dirty) `instances` of type `Resource`.
+        Return the unsaved (dirty) `instances` of the `session` of this
+        class, see :attr:`surf.session.Session.dirty_resources`.
         """
 
-        return cls._dirty_instances
+        if not cls.session:
+            return []
+        return cls.session.dirty_resources
 
     @classmethod
     def to_rdf(cls, value):
@@ -445,7 +498,6 @@ class Resource(object):
 
         return delattr(self, attr_name)
 
-    # TODO: reuse already existing instances - CACHED
     # TODO: shoud we raise an error when predicate not foud ? or just return 
     # an empty list ? hmmm --- error :]
     def __getattr__(self, attr_name):
@@ -494,6 +546,8 @@ class Resource(object):
 
                 # Initial synchronization
                 rdf_dict[predicate] = [resource.to_rdf(value) for value in surf_values]
+                if direct:
+                    resource.__rdf_stored[predicate] = list(rdf_dict[predicate])
 
                 return surf_values, rdf_dict[predicate]
 
@@ -505,7 +559,8 @@ class Resource(object):
         do_query = not self.__full
         values_source = make_values_source(self, predicate, direct, do_query)
 
-        attr_value = ResourceValue(values_source, self, attr_name)
+        attr_value = ResourceValue(values_source, self, attr_name,
+                                   from_store=do_query)
 
         # Not using self.__setattr__, that would trigger loading of attributes
         object.__setattr__(self, attr_name, attr_value)
@@ -527,17 +582,44 @@ class Resource(object):
             - direct attributes (where the subject is the subject of the resource)
             - indirect attributes (where the object is the subject of the resource)
 
+        If `concurrent_load` is on in the `session`, both are loaded at the
+        same time.
+
         .. note:: This method resets the *dirty* state of the object.
 
         """
 
-        results_d = self.session[self.store_key].load(self, True)
-        results_i = self.session[self.store_key].load(self, False)
+        store = self.session[self.store_key]
+        if self.session.concurrent_load:
+            inverse = self.session.load_pool.submit(store.load, self, False)
+            results_d = store.load(self, True)
+            results_i = inverse.result()
+        else:
+            results_d = store.load(self, True)
+            results_i = store.load(self, False)
+        self._set_loaded(results_d, results_i)
+
+    def _set_loaded(self, results_d, results_i):
+        """ For **internal** use only, set the `results` of loading direct
+        and inverse attributes, see :meth:`load`. """
+
         self.__set_predicate_values(results_d, True)
         self.__set_predicate_values(results_i, False)
         self.dirty = False
         self.__full = True
 
+    def _set_attribute_values(self, predicate, direct, values):
+        """ For **internal** use only, set the `values` of one attribute as
+        loaded from the store (in the form returned by `store.get`), return
+        the resulting instances. Used to prefetch attributes. """
+
+        value = self._lazy(values)
+        self.__setattr__(rdf2attr(predicate, direct), value)
+        if direct:
+            self.__rdf_stored[predicate] = list(self.__rdf_direct[predicate])
+        self.dirty = False
+        return value
+
     def __set_predicate_values(self, results, direct):
         """ set the prediate - value(s) to the resource using lazy loading,
         `results` is a dict under the form:
@@ -550,6 +632,8 @@ class Resource(object):
             value = self._lazy(v)
             if value:
                 self.__setattr__(attr, value)
+                if direct:
+                    self.__rdf_stored[p] = list(self.__rdf_direct[p])
 
 
     @classmethod
@@ -588,6 +672,60 @@ class Resource(object):
 
         return instances
 
+    @classmethod
+    def get_by_values(cls, attribute, values, context=None):
+        """
+        Retrieve the `instances` of the resource class that have one of the
+        `values` as value of the `attribute`, as a dict mapping each of the
+        `values` to the list of its `instances`.
+
+        Unlike :meth:`get_by` with a list of values, the lookup is done by
+        the `store` in chunks, one query for many values::
+
+            >>> Person = session.get_class(surf.ns.FOAF['Person'])
+            >>> people = Person.get_by_values("dc_identifier", ids)
+            >>> people[ids[0]]
+            [<surf.session.FoafPerson object at 0x...>]
+
+        Values without `instances` are mapped to an empty list.
+
+        """
+
+        attribute_uri, direct = attr2rdf(attribute)
+
+        keys = {}
+        instances = {}
+        for value in values:
+            if isinstance(value, Resource):
+                term = value.subject
+            else:
+                term = value_to_rdf(value)
+            # Literals given as lists or dicts can't be dict keys.
+            key = type(value) in [list, dict] and term or value
+            keys[term] = key
+            instances[key] = []
+
+        store = cls.session[cls.store_key]
+        found = store.instances_by_values(cls, attribute_uri, keys.keys(),
+                                          direct, context)
+
+        for term, subjects in found.items():
+            if term not in keys:
+                continue
+
+            for s, types in subjects.items():
+                if not isinstance(s, URIRef):
+                    continue
+
+                if cls.uri:
+                    concepts = [cls.uri]
+                else:
+                    concepts = [c for cs in types.values() for c in cs]
+
+                instances[keys[term]].append(cls._instance(s, concepts))
+
+        return instances
+
     @classmethod
     def __instancemaker(cls, params, instance_data):
         """ Construct resource from `instance_data`, return it. """
@@ -636,11 +774,22 @@ class Resource(object):
                                  store=cls.store_key,
                                  block_auto_load=False)
 
-        instance.__set_predicate_values(data.get("direct", {}), True)
-        instance.__set_predicate_values(data.get("inverse", {}), False)
-        instance.__full = bool(params.get("full"))
-        # __setattr__ marked it as dirty but it's freshly loaded!
-        instance.dirty = False
+        # Instance may come from session's identity map, don't overwrite
+        # unsaved modifications.
+        if not (cls.session.use_cached and instance.dirty):
+            instance.__set_predicate_values(data.get("direct", {}), True)
+            instance.__set_predicate_values(data.get("inverse", {}), False)
+            if params.get("only"):
+                # Partially loaded, but attributes asked for and not in
+                # results are known to be empty.
+                for predicate, direct in params["only"]:
+                    loaded = data.get(direct and "direct" or "inverse")
+                    if loaded is not None and predicate not in loaded:
+                        instance._set_attribute_values(predicate, direct, {})
+            elif params.get("full") and not params.get("defer"):
+                instance.__full = True
+            # __setattr__ marked it as dirty but it's freshly loaded!
+            instance.dirty = False
 
         return instance
 
@@ -756,11 +905,13 @@ class Resource(object):
         """ Save the `resource` to the data `store`. """
 
         self.session[self.store_key].save(self)
+        self.session.invalidate(self)
 
     def remove(self, inverse=False):
         """ Remove the `resource` from the data `store`. """
 
         self.session[self.store_key].remove(self, inverse=inverse)
+        self.session.invalidate(self)
 
     def update(self):
         """ Update the resource in the data `store`.
@@ -772,6 +923,7 @@ class Resource(object):
         """
 
         self.session[self.store_key].update(self)
+        self.session.invalidate(self)
 
     def is_present(self):
         """ Return True if the `resource` is present in data `store`.
@@ -37,6 +37,19 @@ from surf.util import attr2rdf, value_to_rdf
 from surf.resource.util import Q, split_attribute_edges
 from surf.store import NO_CONTEXT
 
+def _merge_instance_data(data, other):
+    """ Merge ``other`` into ``data``, the nested dicts and lists describing
+    one subject in :meth:`surf.store.Store.get_by` results. """
+
+    for key, value in other.items():
+        if key not in data:
+            data[key] = value
+        elif isinstance(value, dict):
+            _merge_instance_data(data[key], value)
+        elif isinstance(value, list):
+            data[key].extend([item for item in value
+                              if item not in data[key]])
+
 class ResultProxy(object):
     """ Interface to :meth:`surf.store.Store.get_by`.
 
@@ -123,6 +136,71 @@ class ResultProxy(object):
         params["only_direct"] = only_direct
         return ResultProxy(params)
 
+    def prefetch(self, *attributes):
+        """ Load the named attributes of all returned resources at once.
+
+        Without prefetching, reading an attribute of each returned resource
+        takes one query per resource. With it, each attribute is loaded for
+        all resources together, in one query per `batch_size` resources
+        (for readers that support it). Paths of attributes, as in
+        :meth:`get_by`, load attributes of related resources as well::
+
+            for actor in Actor.all().prefetch("surf_movies__surf_title"):
+                print [movie.surf_title.first for movie in actor.surf_movies]
+
+        Resources with unsaved changes are left as they are.
+
+        """
+
+        params = self.__params.copy()
+        params["prefetch"] = list(params.get("prefetch", []))
+        params["prefetch"].extend([split_attribute_edges(attribute)
+                                   for attribute in attributes])
+        return ResultProxy(params)
+
+    def only(self, *attributes):
+        """ Enable eager-loading of the named attributes only.
+
+        Like :meth:`full`, but other attributes are not loaded and are
+        lazy-loaded on access as usual. Useful to avoid transferring large
+        values that won't be read::
+
+            for person in Person.all().only("foaf_name", "foaf_mbox"):
+                print person.foaf_name.first
+
+        """
+
+        params = self.__params.copy()
+        params.setdefault("full", True)
+        params.setdefault("only_direct", False)
+        params["only"] = list(params.get("only", []))
+        params["only"].extend(self.__predicates(attributes))
+        return ResultProxy(params)
+
+    def defer(self, *attributes):
+        """ Enable eager-loading of all attributes except the named ones,
+        which are lazy-loaded on access. See also :meth:`only`. """
+
+        params = self.__params.copy()
+        params.setdefault("full", True)
+        params.setdefault("only_direct", False)
+        params["defer"] = list(params.get("defer", []))
+        params["defer"].extend(self.__predicates(attributes))
+        return ResultProxy(params)
+
+    @staticmethod
+    def __predicates(attributes):
+        """ Return `(predicate, direct)` tuples for attribute names. """
+
+        predicates = []
+        for attribute in attributes:
+            predicate, direct = attr2rdf(attribute)
+            if predicate is None:
+                raise ValueError("Not an attribute %r" % attribute)
+            predicates.append((predicate, direct))
+
+        return predicates
+
     def order(self, value=True):
         """ Request results to be ordered.
 
@@ -235,32 +313,164 @@ class ResultProxy(object):
 
         return ResultProxy(params)
 
-    def __execute_get_by(self):
-        if self.__get_by_response is None:
-            self.__get_by_args = {}
+    @staticmethod
+    def __prepare_get_by_args(params):
+        """ Translate collected parameters into :meth:`surf.store.Store.get_by`
+        arguments. """
+
+        get_by_args = {}
+
+        if "high" in params:
+            get_by_args["limit"] = params["high"] - params.get("low", 0)
+        if "low" in params:
+            get_by_args["offset"] = params["low"]
 
-            if "high" in self.__params:
-                self.__get_by_args["limit"] = (self.__params["high"]
-                                               - self.__params.get("low", 0))
-            if "low" in self.__params:
-                self.__get_by_args["offset"] = self.__params["low"]
+        for key in ["limit", "offset", "full", "order", "desc", "get_by",
+                    "only_direct", "contexts", "filter", "only", "defer"]:
+            if key in params:
+                get_by_args[key] = params[key]
 
-            for key in ["limit", "offset", "full", "order", "desc", "get_by",
-                        "only_direct", "contexts", "filter"]:
-                if key in self.__params:
-                    self.__get_by_args[key] = self.__params[key]
+        return get_by_args
+
+    def __execute_get_by(self):
+        if self.__get_by_response is None:
+            self.__get_by_args = self.__prepare_get_by_args(self.__params)
 
             store = self.__params["store"]
             self.__get_by_response = store.get_by(self.__get_by_args)
 
         return self.__get_by_args, self.__get_by_response
 
+    def stream(self, page_size=100):
+        """ Iterate over resources in this collection, loading them
+        ``page_size`` results at a time.
+
+        Unlike plain iteration, which loads the whole result set before
+        returning the first resource, this keeps at most one page in memory
+        and yields resources as soon as their page arrives::
+
+            for person in Person.all().full().stream(page_size=500):
+                print person.foaf_name.first
+
+        Pages are requested with limit and offset, so results must come in a
+        stable order. If no ordering was requested, resources are ordered
+        by subject.
+
+        """
+
+        if page_size < 1:
+            raise ValueError("page_size must be greater than 0")
+
+        get_by_args = self.__prepare_get_by_args(self.__params)
+        get_by_args.setdefault("order", True)
+
+        offset = get_by_args.get("offset", 0)
+        remaining = get_by_args.get("limit")
+        store = self.__params["store"]
+
+        # Limit and offset apply to rows of the results, so a page may
+        # hold fewer subjects than asked for, and the rows of one subject
+        # may be split between two pages. The last subject of a page is
+        # kept until the next page arrives, only an empty page ends the
+        # results.
+        pending = None
+        while remaining is None or remaining > 0:
+            size = page_size
+            if remaining is not None:
+                size = min(page_size, remaining)
+                remaining -= size
+
+            page_args = get_by_args.copy()
+            page_args["limit"] = size
+            page_args["offset"] = offset
+            offset += size
+
+            page = list(store.get_by(page_args))
+            if not page:
+                break
+
+            if pending is not None:
+                if page[0][0] == pending[0]:
+                    _merge_instance_data(pending[1], page[0][1])
+                    page[0] = pending
+                else:
+                    page.insert(0, pending)
+            pending = page.pop()
+
+            for instance in self.__make_instances(page_args, page):
+                yield instance
+
+        if pending is not None:
+            for instance in self.__make_instances(get_by_args, [pending]):
+                yield instance
+
+    def __make_instances(self, params, results):
+        """ Return the instances of the :meth:`get_by` ``results``. """
+
+        instancemaker = self.__params["instancemaker"]
+        instances = [instancemaker(params, instance_data)
+                     for instance_data in results]
+        if "prefetch" in self.__params:
+            self.__prefetch(instances)
+        return instances
+
+    def __prefetch(self, instances):
+        """ Load the attributes requested with :meth:`prefetch` for all
+        ``instances``, return ``instances``. """
+
+        store = self.__params["store"]
+        # Resources reached by each path of edges, so that paths sharing
+        # a beginning load it only once.
+        reached = {(): instances}
+        for edges in self.__params.get("prefetch", []):
+            for depth in range(1, len(edges) + 1):
+                path = tuple(edges[:depth])
+                if path in reached:
+                    continue
+
+                attribute, direct = path[-1]
+                reached[path] = self.__prefetch_attribute(store,
+                                                          reached[path[:-1]],
+                                                          attribute, direct)
+
+        return instances
+
+    @staticmethod
+    def __prefetch_attribute(store, instances, attribute, direct):
+        """ Load ``attribute`` of ``instances``, return the resources it
+        refers to. """
+
+        seen, resources = set(), []
+        for instance in instances:
+            if (hasattr(instance, "_set_attribute_values")
+                and not instance.dirty and id(instance) not in seen):
+                seen.add(id(instance))
+                resources.append(instance)
+
+        if not resources:
+            return []
+
+        values = store.get_many(resources, attribute, direct)
+        related = []
+        for resource in resources:
+            related.extend(resource._set_attribute_values(
+                                attribute, direct, values.get(resource.subject, {})))
+
+        return related
+
     def __iterator(self):
         get_by_args, get_by_response = self.__execute_get_by()
 
         instancemaker = self.__params["instancemaker"]
-        for instance_data in get_by_response:
-            yield instancemaker(get_by_args, instance_data)
+        if "prefetch" not in self.__params:
+            for instance_data in get_by_response:
+                yield instancemaker(get_by_args, instance_data)
+            return
+
+        instances = [instancemaker(get_by_args, instance_data)
+                     for instance_data in get_by_response]
+        for instance in self.__prefetch(instances):
+            yield instance
 
 
     def __iter__(self):
@@ -268,12 +478,31 @@ class ResultProxy(object):
 
         return self.__iterator()
 
-    def __len__(self):
-        """ Return count of resources in this collection. """
+    def count(self):
+        """ Return count of resources in this collection.
+
+        If the query hasn't been executed yet, the store is asked to count
+        matching resources (for example, with a SPARQL *COUNT* query) so
+        resources don't have to be transferred. Stores that cannot count
+        fall back to executing the query.
+
+        """
+
+        if self.__get_by_response is None:
+            store = self.__params["store"]
+            if hasattr(store, "count_by"):
+                count = store.count_by(self.__prepare_get_by_args(self.__params))
+                if count is not None:
+                    return count
 
         _, get_by_response = self.__execute_get_by()
         return len(get_by_response)
 
+    def __len__(self):
+        """ Return count of resources in this collection. """
+
+        return self.count()
+
     def __getitem__(self, item):
         """ Retrieves an item or slice from resources in this collection. """
         if not isinstance(item, (slice, int, long)):
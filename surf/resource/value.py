@@ -36,6 +36,7 @@
 __author__ = 'Cosmin Basca'
 
 from surf.exc import NoResultFound, MultipleResultsFound
+from surf.util import attr2rdf
 
 class ResourceValue(list):
     ''' the :class:`surf.resource.value.ResourceValue` class is used by the
@@ -50,7 +51,8 @@ class ResourceValue(list):
         automatically generated by `SuRF` as needed
         
     '''
-    def __init__(self, values_source, resource, attribute_name):
+    def __init__(self, values_source, resource, attribute_name,
+                 from_store=False):
         list.__init__(self)
 
         self.resource = resource
@@ -61,12 +63,39 @@ class ResourceValue(list):
         # For lazy loading list contents
         self.__values_source = values_source
         self.__data_loaded = False
+        # True if values_source queries the store, then membership and
+        # length can be asked from the store without loading the values.
+        self.__from_store = from_store
+        # Answers from the store by (method, args), used until the values
+        # are loaded, changes load them first.
+        self.__store_answers = {}
 
     def __prepare_values(self):
         if not self.__data_loaded:
             self[:], self.__rdf_values = self.__values_source()
             self.__data_loaded = True
 
+    def __ask_store(self, method, *args):
+        """ Call `method` of the resource's `store` for this attribute
+        instead of loading the values, return None if it can't be done. """
+
+        if self.__data_loaded or not self.__from_store:
+            return None
+
+        key = (method,) + args
+        if key in self.__store_answers:
+            return self.__store_answers[key]
+
+        predicate, direct = attr2rdf(self.__attribute_name)
+        store = self.resource.session[self.resource.store_key]
+        lookup = getattr(store, method, None)
+        if lookup is None:
+            return None
+
+        answer = lookup(self.resource, predicate, *(args + (direct,)))
+        self.__store_answers[key] = answer
+        return answer
+
     def get_one(self):
         ''' return only one `resource`. If there are more `resources` available
         the :class:`surf.exc.NoResultFound` exception is raised
@@ -108,12 +137,38 @@ class ResourceValue(list):
         raise Exception("to_rdf has no reference to resource")
 
     def __len__(self):
+        # Count in the store (for example, with a SPARQL COUNT query) if
+        # values aren't loaded yet. list(), tuple() and sorted() call
+        # __iter__ first, which loads the values, so their length hint
+        # doesn't need a query.
+        count = self.__ask_store("count_values")
+        if count is not None:
+            return count
+
         self.__prepare_values()
         return list.__len__(self)
 
+    def __nonzero__(self):
+        # Ask the store if there is any value (for example, with a SPARQL
+        # ASK query) instead of counting them if values aren't loaded yet.
+        count = self.__store_answers.get(("count_values",))
+        if count is not None and not self.__data_loaded:
+            return count > 0
+
+        found = self.__ask_store("has_value", None)
+        if found is not None:
+            return found
+
+        self.__prepare_values()
+        return list.__len__(self) > 0
+
     def __contains__(self, key):
-        # For now, load all values. In future, if the data is not yet loaded,
-        # we can optimize and do ASK query here. 
+        # Ask the store (for example, with a SPARQL ASK query) if values
+        # aren't loaded yet.
+        found = self.__ask_store("has_value", self.to_rdf(key))
+        if found is not None:
+            return found
+
         self.__prepare_values()
         return self.to_rdf(key) in self.__rdf_values
 
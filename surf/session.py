@@ -36,12 +36,17 @@
 __author__ = 'Cosmin Basca'
 
 import new
+from threading import Lock, local
 
+from surf.cache import LRUCache
+from surf.futures import ThreadPool, DEFAULT_MAX_WORKERS
+from surf.namespace import OWL
 from surf.rdf import BNode, URIRef
 from surf.resource import Resource
 from surf.store import Store, NO_CONTEXT
 from surf.util import DE_CAMEL_CASE_DEFAULT
-from surf.util import attr2rdf, de_camel_case, is_uri, uri_to_classname
+from surf.util import attr2rdf, de_camel_case, is_uri, uri_to_class
+from surf.util import uri_to_classname
 
 '''
 TODO:
@@ -59,6 +64,7 @@ TODO:
 __all__ = ['Session']
 
 DEFAULT_RESOURCE_EXPIRE_TIME = 60 * 60
+DEFAULT_CACHE_SIZE = 10000
 DEFAULT_STORE_KEY = 'default'
 
 class Session(object):
@@ -69,10 +75,11 @@ class Session(object):
 
     """
 
-    # TODO: add cache
-
     def __init__(self, default_store=None, mapping={},
-                 auto_persist=False, auto_load=False, query_contexts=None):
+                 auto_persist=False, auto_load=False, query_contexts=None,
+                 use_cached=False, cache_expire=DEFAULT_RESOURCE_EXPIRE_TIME,
+                 cache_size=DEFAULT_CACHE_SIZE, concurrent_load=False,
+                 load_workers=DEFAULT_MAX_WORKERS):
         """ Create a new `session` object that handles the creation of types
         and instances, also the session binds itself to the `Resource` objects
         to allow the Resources to access the data `store` and perform
@@ -81,6 +88,19 @@ class Session(object):
         .. note:: The `session` object *behaves* like a `dict` when it
                   comes to managing the registered `stores`.
 
+        If ``use_cached`` is `True`, the session keeps an identity map of
+        the `resources` it instantiated, keyed by store, context and
+        subject. At most ``cache_size`` resources are kept, each of them for
+        ``cache_expire`` seconds. The same applies to `classes` seen as
+        instances of owl:Class, see :meth:`class_instance`.
+
+        If ``concurrent_load`` is `True`, `Resource.load` fetches direct and
+        inverse attributes concurrently. Concurrent loads, including
+        `load_many`, run on at most ``load_workers`` threads.
+
+        Each thread has its own set of `dirty` resources, see
+        :attr:`dirty_resources`.
+
         """
 
         self.mapping = mapping
@@ -89,9 +109,28 @@ class Session(object):
 
         self.__auto_persist = auto_persist
         self.__auto_load = auto_load
-        #self.__use_cached = use_cached
-        #self.__cache_expire = cache_expire
+        self.__use_cached = False
+        self.__cache_expire = DEFAULT_RESOURCE_EXPIRE_TIME
+        self.__cache_size = DEFAULT_CACHE_SIZE
+        self.__cache = None
+        self.__class_instances = None
+        self.__concurrent_load = False
+        self.__load_workers = DEFAULT_MAX_WORKERS
+        self.__load_pool = None
+        self.__classes = {}
         self.__stores = {}
+        # Dirty resources of each thread, by id(), see _track_dirty().
+        self.__dirty = local()
+        # The dirty resources map of the thread that last changed each
+        # dirty resource, by id().
+        self.__dirty_owners = {}
+        self.__dirty_lock = Lock()
+
+        self.cache_expire = cache_expire
+        self.cache_size = cache_size
+        self.use_cached = use_cached
+        self.concurrent_load = concurrent_load
+        self.load_workers = load_workers
 
         if default_store:
             if type(default_store) is not Store:
@@ -199,19 +238,263 @@ class Session(object):
                               fset=set_enable_logging)
     """ Toggle `logging` on or off. Accepts boolean values. """
 
-    # TODO: add caching ... need strategies
-    '''def set_use_cached(self,val):
-        self.__use_cached = val if type(val) is bool else False
-    use_cached = property(fget = lambda self: self.__use_cached,
-                                 fset = set_use_cached)
-    def set_cache_expire(self,val):
+    def set_use_cached(self, val):
+        """ Setter function for the `use_cached` property.
+
+        Do not use this, use the `use_cached` property instead.
+
+        """
+
+        if not isinstance(val, bool):
+            val = False
+
+        self.__use_cached = val
+        self.__reset_cache()
+
+    use_cached = property(fget=lambda self: self.__use_cached,
+                          fset=set_use_cached)
+    """ Toggle the `resource` identity map on or off. When on, resources
+    instantiated by the session are reused instead of being created (and
+    loaded) again. Accepts boolean values. """
+
+    def set_cache_expire(self, val):
+        """ Setter function for the `cache_expire` property.
+
+        Do not use this, use the `cache_expire` property instead.
+
+        """
+
         try:
             self.__cache_expire = int(val)
-        except TypeError:
+        except (TypeError, ValueError):
             self.__cache_expire = DEFAULT_RESOURCE_EXPIRE_TIME
-    cache_expire = property(fget = lambda self: self.__cache_expire,
-                                 fset = set_cache_expire)
-    '''
+        self.__reset_cache()
+
+    cache_expire = property(fget=lambda self: self.__cache_expire,
+                            fset=set_cache_expire)
+    """ Number of seconds a `resource` is kept in the identity map. """
+
+    def set_cache_size(self, val):
+        """ Setter function for the `cache_size` property.
+
+        Do not use this, use the `cache_size` property instead.
+
+        """
+
+        try:
+            self.__cache_size = int(val)
+        except (TypeError, ValueError):
+            self.__cache_size = DEFAULT_CACHE_SIZE
+        self.__reset_cache()
+
+    cache_size = property(fget=lambda self: self.__cache_size,
+                          fset=set_cache_size)
+    """ Maximum number of `resources` kept in the identity map, the least
+    recently used ones are evicted first. """
+
+    def __reset_cache(self):
+        """ For **internal** use only, (re)create the identity map. """
+
+        if self.__use_cached:
+            self.__cache = LRUCache(max_size=self.__cache_size,
+                                    expire=self.__cache_expire)
+            self.__class_instances = LRUCache(max_size=self.__cache_size,
+                                              expire=self.__cache_expire)
+        else:
+            self.__cache = None
+            self.__class_instances = None
+
+    def __cache_key(self, store, subject, context):
+        """ For **internal** use only, return the identity map key. Context
+        is resolved the same way `Resource` does it. """
+
+        if context == NO_CONTEXT:
+            context = None
+        elif context:
+            context = URIRef(unicode(context))
+        elif store in self.__stores:
+            context = self.__stores[store].default_context
+
+        return (store, context, subject)
+
+    def invalidate(self, resource):
+        """ Remove the `resource` from the identity map.
+
+        This is done automatically when a resource is saved, updated or
+        removed. Any write can change what the `classes` seen as instances
+        of owl:Class hold, so these are all dropped too.
+
+        """
+
+        if self.__cache is not None:
+            key = self.__cache_key(resource.store_key, resource.subject,
+                                   resource.context or NO_CONTEXT)
+            self.__cache.invalidate(key)
+
+        if self.__class_instances is not None:
+            self.__class_instances.clear()
+
+    def clear_cache(self):
+        """ Remove all `resources` from the identity map. """
+
+        if self.__cache is not None:
+            self.__cache.clear()
+
+        if self.__class_instances is not None:
+            self.__class_instances.clear()
+
+    def class_instance(self, cls):
+        """ Return the `Resource` class `cls` as an instance of owl:Class.
+
+        Attribute access on the class itself is proxied to this instance, see
+        `ResourceMeta.__getattr__`. If `use_cached` is on, the instance and
+        the values it loaded are kept until a `resource` is written through
+        this session, otherwise a new instance is returned on each call.
+
+        """
+
+        store = cls.store_key or self.default_store_key
+        key = (store, cls.uri)
+        if self.__class_instances is not None:
+            instance = self.__class_instances.get(key)
+            if instance is not None:
+                return instance
+
+        instance = self.map_type(OWL.Class, store)(cls.uri,
+                                                   block_auto_load=True)
+
+        if self.__class_instances is not None:
+            self.__class_instances.set(key, instance)
+
+        return instance
+
+    def __dirty_map(self):
+        """ Return the dirty resources of the current thread. """
+
+        dirty = getattr(self.__dirty, "resources", None)
+        if dirty is None:
+            dirty = self.__dirty.resources = {}
+        return dirty
+
+    def _track_dirty(self, resource, dirty):
+        """ For **internal** use only, called when the `dirty` state of one
+        of the `resources` of this session changes. """
+
+        # A resource may be cleaned or saved in another thread than the
+        # one that changed it.
+        self.__dirty_lock.acquire()
+        try:
+            owner = self.__dirty_owners.pop(id(resource), None)
+            if owner is not None:
+                owner.pop(id(resource), None)
+            if dirty:
+                dirty_map = self.__dirty_map()
+                dirty_map[id(resource)] = resource
+                self.__dirty_owners[id(resource)] = dirty_map
+        finally:
+            self.__dirty_lock.release()
+
+    def get_dirty_resources(self):
+        """ Getter function for the `dirty_resources` property.
+
+        Do not use this, use the `dirty_resources` property instead.
+
+        """
+
+        return self.__dirty_map().values()
+
+    dirty_resources = property(fget=get_dirty_resources)
+    """ The `dirty` resources of the current thread, the ones
+    :meth:`commit` will update.
+
+    The session keeps them until they are committed, saved or cleaned with
+    :meth:`clear_dirty`, in any thread, even if they are no longer
+    referenced anywhere else.
+
+    """
+
+    def clear_dirty(self):
+        """ Forget the `dirty` resources of the current thread without
+        updating them, for example at the end of a request that failed. """
+
+        for resource in self.dirty_resources:
+            resource.dirty = False
+
+    def set_concurrent_load(self, val):
+        """ Setter function for the `concurrent_load` property.
+
+        Do not use this, use the `concurrent_load` property instead.
+
+        """
+
+        if not isinstance(val, bool):
+            val = False
+
+        self.__concurrent_load = val
+
+    concurrent_load = property(fget=lambda self: self.__concurrent_load,
+                               fset=set_concurrent_load)
+    """ Toggle concurrent loading of direct and inverse attributes in
+    `Resource.load` on or off. Accepts boolean values. """
+
+    def set_load_workers(self, val):
+        """ Setter function for the `load_workers` property.
+
+        Do not use this, use the `load_workers` property instead.
+
+        """
+
+        try:
+            val = int(val)
+        except (TypeError, ValueError):
+            val = DEFAULT_MAX_WORKERS
+        if val < 1:
+            val = DEFAULT_MAX_WORKERS
+
+        self.__load_workers = val
+        self.__shutdown_load_pool()
+
+    load_workers = property(fget=lambda self: self.__load_workers,
+                            fset=set_load_workers)
+    """ Maximum number of threads used for concurrent `resource` loading. """
+
+    def get_load_pool(self):
+        """ Getter function for the `load_pool` property.
+
+        Do not use this, use the `load_pool` property instead.
+
+        """
+
+        if self.__load_pool is None:
+            self.__load_pool = ThreadPool(self.__load_workers)
+        return self.__load_pool
+
+    load_pool = property(fget=get_load_pool)
+    """ The :class:`surf.futures.ThreadPool` that runs concurrent
+    `resource` loads, created on first use. """
+
+    def __shutdown_load_pool(self):
+        """ For **internal** use only, stop the load threads, if any. """
+
+        if self.__load_pool is not None:
+            self.__load_pool.shutdown(wait=False)
+            self.__load_pool = None
+
+    def load_many(self, resources):
+        """ Load all attributes of the `resources`, like calling
+        `Resource.load` on each of them, spreading the `store` round trips
+        over `load_workers` threads. """
+
+        pool = self.load_pool
+        pending = []
+        for resource in resources:
+            store = self[resource.store_key]
+            pending.append((resource,
+                            pool.submit(store.load, resource, True),
+                            pool.submit(store.load, resource, False)))
+
+        for resource, direct, inverse in pending:
+            resource._set_loaded(direct.result(), inverse.result())
 
     def get_default_store_key(self):
         """ Getter function for the `default_store_key` property.
@@ -290,12 +573,20 @@ class Session(object):
             self.__stores[store].close()
             del self.__stores[store]
 
+        self.clear_cache()
+        self.__shutdown_load_pool()
+        self.__classes.clear()
         self.mapping = None
 
     def map_type(self, uri, store=None, *classes):
         """ Create and return a `class` based on the `uri` given.
 
-        Also will add the `classes` to the inheritance list.
+        Also will add the `classes` to the inheritance list. A class can
+        also be given by its URI, it's converted with
+        :func:`surf.util.uri_to_class`.
+
+        Classes are created once for each combination of `uri`, `store`,
+        `classes` and `mapping` entry, later calls return the same class.
 
         """
 
@@ -305,20 +596,30 @@ class Session(object):
         uri = self.__uri(uri)
         if not uri:
             return None
-        name = uri_to_classname(uri)
-
-        base_classes = [Resource]
-        base_classes.extend(classes)
 
         # Also take classes from session.mapping
         session_classes = self.mapping.get(uri, [])
         if type(session_classes) not in [list, tuple, set]:
             session_classes = [session_classes]
-        base_classes.extend(session_classes)
-        return new.classobj(str(name), tuple(base_classes),
-                            {'uri' : uri,
-                             'store_key' : store,
-                             'session' : self})
+
+        key = (uri, store, tuple(classes), tuple(session_classes))
+        cls = self.__classes.get(key)
+        if cls is None:
+            base_classes = [Resource]
+            # Classes given by URI are part of the key by URI, the classes
+            # made by uri_to_class for them may not be the same each time.
+            for base in classes:
+                if isinstance(base, basestring):
+                    base = uri_to_class(base)
+                base_classes.append(base)
+            base_classes.extend(session_classes)
+            cls = new.classobj(str(uri_to_classname(uri)), tuple(base_classes),
+                               {'uri' : uri,
+                                'store_key' : store,
+                                'session' : self})
+            cls = self.__classes.setdefault(key, cls)
+
+        return cls
 
     def get_class(self, uri, store=None, *classes):
         """
@@ -339,7 +640,12 @@ class Session(object):
     def map_instance(self, concept, subject, store=None, classes=[],
                      block_auto_load=False, context=None):
         """Create a `instance` of the `class` specified by `uri` and `classes`
-        to be inherited, see `map_type` for more information. """
+        to be inherited, see `map_type` for more information.
+
+        If `use_cached` is on and an instance of the same `concept` is in the
+        identity map, it is returned instead.
+
+        """
 
         if not type(subject) in [URIRef, BNode]:
             subject = URIRef(unicode(subject))
@@ -350,8 +656,19 @@ class Session(object):
         if not (isinstance(concept, type) and issubclass(concept, Resource)):
             concept = self.map_type(concept, store, *classes)
 
-        return concept(subject, block_auto_load=block_auto_load,
-                       context=context)
+        if self.__cache is not None:
+            key = self.__cache_key(store, subject, context)
+            instance = self.__cache.get(key)
+            if instance is not None and instance.uri == concept.uri:
+                return instance
+
+        instance = concept(subject, block_auto_load=block_auto_load,
+                           context=context)
+
+        if self.__cache is not None:
+            self.__cache.set(key, instance)
+
+        return instance
 
     def get_resource(self, subject, uri=None, store=None, graph=None,
                      block_auto_load=False, context=None, *classes):
@@ -387,8 +704,25 @@ class Session(object):
         return resource
 
     def commit(self):
-        """ Commit all the changes, update all the `dirty` `resources`. """
+        """ Commit all the changes, update the `dirty` `resources` of the
+        current thread.
+
+        The `resources` are handed to each `store` in a single `update` call,
+        so that the writer can batch them.
+
+        """
 
-        # Copy set into list because it will shrink as we go through it
-        for resource in list(Resource.get_dirty_instances()):
-            resource.update()
+        # Group by store, keeping the order in which stores are first seen.
+        stores, groups = [], {}
+        for resource in self.dirty_resources:
+            store = resource.session[resource.store_key]
+            if id(store) not in groups:
+                stores.append(store)
+                groups[id(store)] = []
+            groups[id(store)].append(resource)
+
+        for store in stores:
+            resources = groups[id(store)]
+            store.update(*resources)
+            for resource in resources:
+                resource.session.invalidate(resource)
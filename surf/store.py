@@ -40,6 +40,7 @@ from plugin import manager
 from plugin.manager import load_plugins, PluginNotFoundException, add_plugin_path, registered_readers, registered_writers
 from plugin.reader import RDFReader
 from plugin.writer import RDFWriter
+from surf.futures import ThreadPool, DEFAULT_MAX_WORKERS
 from surf.query import Query
 from surf.rdf import URIRef
 from surf.query import Query
@@ -155,6 +156,11 @@ class Store(object):
 
         return self.reader.get(resource, attribute, direct)
 
+    def get_many(self, resources, attribute, direct):
+        """ :func:`surf.plugin.reader.RDFReader.get_many` method. """
+
+        return self.reader.get_many(resources, attribute, direct)
+
     # cRud
     def load(self, resource, direct):
         """ :func:`surf.plugin.reader.RDFReader.load` method. """
@@ -166,6 +172,16 @@ class Store(object):
 
         return self.reader.is_present(resource)
 
+    def has_value(self, resource, attribute, value, direct):
+        """ :func:`surf.plugin.reader.RDFReader.has_value` method. """
+
+        return self.reader.has_value(resource, attribute, value, direct)
+
+    def count_values(self, resource, attribute, direct):
+        """ :func:`surf.plugin.reader.RDFReader.count_values` method. """
+
+        return self.reader.count_values(resource, attribute, direct)
+
     def concept(self, resource):
         """ :func:`surf.plugin.reader.RDFReader.concept` method. """
 
@@ -178,16 +194,34 @@ class Store(object):
         return self.reader.instances_by_attribute(resource, attributes,
                                                   direct, context)
 
-    def get_by(self, params):
-        # Set default context
+    def instances_by_values(self, resource, attribute, values, direct, context):
+        """ :func:`surf.plugin.reader.RDFReader.instances_by_values` method. """
+
+        context = self.__add_default_context(context)
+        return self.reader.instances_by_values(resource, attribute, values,
+                                               direct, context)
+
+    def __add_default_contexts(self, params):
+        """ Set default context in `get_by` parameters. """
+
         contexts = params.get("contexts")
         if not contexts and self.__default_context:
             params["contexts"] = [self.__default_context]
         elif not contexts or contexts == (NO_CONTEXT,):
             params["contexts"] = []
 
+    def get_by(self, params):
+        """ :func:`surf.plugin.reader.RDFReader.get_by` method. """
+
+        self.__add_default_contexts(params)
         return self.reader.get_by(params)
 
+    def count_by(self, params):
+        """ :func:`surf.plugin.reader.RDFReader.count_by` method. """
+
+        self.__add_default_contexts(params)
+        return self.reader.count_by(params)
+
     #---------------------------------------------------------------------------
     # the query reader interface
     #---------------------------------------------------------------------------
@@ -279,3 +313,106 @@ class Store(object):
 
         context = self.__add_default_context(context)
         return self.writer.load_triples(context=context, **kwargs)
+
+class AsyncStore(object):
+    """ Non-blocking front end to a :class:`Store`.
+
+    Each method runs the :class:`Store` method of the same name on a
+    bounded pool of worker threads and immediately returns a
+    :class:`surf.futures.Future`. This lets one process keep many
+    endpoint round trips in flight::
+
+        async_store = AsyncStore(store, max_workers = 16)
+        futures = [async_store.load(resource, True) for resource in resources]
+        results = [future.result() for future in futures]
+
+    """
+
+    def __init__(self, store, max_workers = DEFAULT_MAX_WORKERS):
+        self.__store = store
+        self.__pool = ThreadPool(max_workers)
+
+    store = property(lambda self: self.__store)
+    max_workers = property(lambda self: self.__pool.max_workers)
+
+    def close(self):
+        """ Wait for pending calls to finish and stop the worker threads.
+
+        The wrapped `store` is left open.
+
+        """
+
+        self.__pool.shutdown(wait = True)
+
+    def __submit(self, method, *args, **kwargs):
+        return self.__pool.submit(getattr(self.__store, method), *args, **kwargs)
+
+    def get(self, resource, attribute, direct):
+        """ Asynchronous :meth:`Store.get`. """
+
+        return self.__submit("get", resource, attribute, direct)
+
+    def get_many(self, resources, attribute, direct):
+        """ Asynchronous :meth:`Store.get_many`. """
+
+        return self.__submit("get_many", resources, attribute, direct)
+
+    def load(self, resource, direct):
+        """ Asynchronous :meth:`Store.load`. """
+
+        return self.__submit("load", resource, direct)
+
+    def is_present(self, resource):
+        """ Asynchronous :meth:`Store.is_present`. """
+
+        return self.__submit("is_present", resource)
+
+    def has_value(self, resource, attribute, value, direct):
+        """ Asynchronous :meth:`Store.has_value`. """
+
+        return self.__submit("has_value", resource, attribute, value, direct)
+
+    def count_values(self, resource, attribute, direct):
+        """ Asynchronous :meth:`Store.count_values`. """
+
+        return self.__submit("count_values", resource, attribute, direct)
+
+    def concept(self, resource):
+        """ Asynchronous :meth:`Store.concept`. """
+
+        return self.__submit("concept", resource)
+
+    def get_by(self, params):
+        """ Asynchronous :meth:`Store.get_by`. """
+
+        return self.__submit("get_by", params)
+
+    def count_by(self, params):
+        """ Asynchronous :meth:`Store.count_by`. """
+
+        return self.__submit("count_by", params)
+
+    def execute(self, query):
+        """ Asynchronous :meth:`Store.execute`. """
+
+        return self.__submit("execute", query)
+
+    def execute_sparql(self, sparql_query, format = 'JSON'):
+        """ Asynchronous :meth:`Store.execute_sparql`. """
+
+        return self.__submit("execute_sparql", sparql_query, format = format)
+
+    def save(self, *resources):
+        """ Asynchronous :meth:`Store.save`. """
+
+        return self.__submit("save", *resources)
+
+    def update(self, *resources):
+        """ Asynchronous :meth:`Store.update`. """
+
+        return self.__submit("update", *resources)
+
+    def remove(self, *resources, **kwargs):
+        """ Asynchronous :meth:`Store.remove`. """
+
+        return self.__submit("remove", *resources, **kwargs)
@@ -5,6 +5,7 @@ from unittest import TestCase
 
 from surf import ns
 from surf.plugin.query_reader import RDFQueryReader
+from surf.rdf import Literal, URIRef
 
 class TestQueryReader(TestCase):
     """ Tests for query_reader module. """
@@ -21,3 +22,159 @@ class TestQueryReader(TestCase):
             
             
         MyQueryReader().convert(None)
+
+    def test_full_batch_queries(self):
+        """ Test that full() loads details in batches of subjects. """
+
+        subjects = [URIRef("http://s%d" % i) for i in range(5)]
+        p = ns.FOAF["name"]
+
+        class MyQueryReader(RDFQueryReader):
+            queries = []
+
+            def _execute(self, query):
+                self.queries.append(query)
+                if query.query_vars == ["?s"]:
+                    return [{"s" : subject} for subject in subjects]
+
+                return [{"s" : subject, "p" : p, "v" : Literal(subject)}
+                        for subject in subjects
+                        if unicode(subject) in unicode(query)]
+
+            def _to_table(self, result):
+                return result
+
+        reader = MyQueryReader(batch_size = 2)
+        results = reader.get_by({"full" : True, "only_direct" : True})
+
+        # One query for subjects, then one query per chunk of 2 subjects.
+        self.assertEquals(len(MyQueryReader.queries), 4)
+        self.assertEquals([subject for subject, _ in results], subjects)
+        for subject, instance_data in results:
+            self.assertEquals(instance_data["direct"],
+                              {p : {Literal(subject) : {None : []}}})
+            self.assertTrue("inverse" not in instance_data)
+
+    def test_count_by(self):
+        """ Test that count_by() issues COUNT query and applies limits. """
+
+        class MyQueryReader(RDFQueryReader):
+            queries = []
+
+            def _execute(self, query):
+                self.queries.append(query)
+                return [{"count" : Literal(10)}]
+
+            def _to_table(self, result):
+                return result
+
+        reader = MyQueryReader()
+        self.assertEquals(reader.count_by({}), 10)
+        self.assertEquals(reader.count_by({"offset" : 4, "limit" : 5}), 5)
+        self.assertEquals(reader.count_by({"offset" : 8, "limit" : 5}), 2)
+        self.assertEquals(reader.count_by({"offset" : 20}), 0)
+
+        query = MyQueryReader.queries[-1]
+        self.assertEquals(query.query_vars, ["(count(distinct ?s) as ?count)"])
+        self.assertEquals(query.query_limit, None)
+        self.assertEquals(query.query_offset, None)
+
+    def test_values_queries(self):
+        """ Test that has_value() and count_values() issue ASK and COUNT. """
+
+        class MySession(object):
+            query_contexts = None
+
+        class MyResource(object):
+            subject = URIRef("http://s")
+            session = MySession()
+
+        class MyQueryReader(RDFQueryReader):
+            queries = []
+
+            def _execute(self, query):
+                self.queries.append(unicode(query))
+                return [{"count" : Literal(3)}]
+
+            def _to_table(self, result):
+                return result
+
+            def _ask(self, result):
+                return True
+
+        reader = MyQueryReader()
+        p = ns.FOAF["name"]
+        self.assertTrue(reader.has_value(MyResource(), p, Literal("John"), True))
+        self.assertEquals(reader.count_values(MyResource(), p, False), 3)
+        self.assertTrue(reader.has_value(MyResource(), p, None, True))
+
+        ask_query, count_query, any_query = MyQueryReader.queries
+        self.assertTrue(ask_query.startswith("ASK"))
+        self.assertTrue('<http://s> <%s> "John"' % p in ask_query)
+        self.assertTrue(any_query.startswith("ASK"))
+        self.assertTrue('<http://s> <%s> ?v' % p in any_query)
+        self.assertTrue("count(distinct ?v)" in count_query)
+        self.assertTrue("?v <%s> <http://s>" % p in count_query)
+
+    def test_full_only_defer(self):
+        """ Test that only and defer restrict predicates of full loading. """
+
+        subjects = [URIRef("http://s0")]
+        name, nick = ns.FOAF["name"], ns.FOAF["nick"]
+
+        class MyQueryReader(RDFQueryReader):
+            queries = []
+
+            def _execute(self, query):
+                self.queries.append(query)
+                return [{"s" : subject} for subject in subjects]
+
+            def _to_table(self, result):
+                return result
+
+        reader = MyQueryReader()
+        reader.get_by({"full" : True, "only" : [(name, True)]})
+        # The subjects and direct attributes, no inverse attributes asked for.
+        self.assertEquals(len(MyQueryReader.queries), 2)
+        query = unicode(MyQueryReader.queries[1])
+        self.assertTrue("?p = <%s>" % name in query)
+        self.assertTrue("?p = <%s>" % ns.RDF["type"] in query)
+
+        del MyQueryReader.queries[:]
+        reader.get_by({"full" : True, "defer" : [(nick, True)]})
+        self.assertEquals(len(MyQueryReader.queries), 3)
+        self.assertTrue("?p != <%s>" % nick in unicode(MyQueryReader.queries[1]))
+        # nick is deferred as a direct attribute only.
+        self.assertFalse("!=" in unicode(MyQueryReader.queries[2]))
+
+    def test_instances_by_values(self):
+        """ Test that instances_by_values() queries values in chunks. """
+
+        concept, identifier = ns.FOAF["Person"], ns.DC["identifier"]
+
+        class MyQueryReader(RDFQueryReader):
+            queries = []
+
+            def _execute(self, query):
+                self.queries.append(unicode(query))
+                return [{"v" : Literal("id%d" % len(self.queries)),
+                         "s" : URIRef("http://s%d" % len(self.queries)),
+                         "c" : concept}]
+
+            def _to_table(self, result):
+                return result
+
+        reader = MyQueryReader(batch_size = 2)
+        values = [Literal("id1"), Literal("id2"), Literal("id3")]
+        instances = reader.instances_by_values(concept, identifier, values,
+                                               True, None)
+
+        self.assertEquals(len(MyQueryReader.queries), 2)
+        first, second = MyQueryReader.queries
+        self.assertTrue('?v = "id1" || ?v = "id2"' in first)
+        self.assertTrue('?v = "id3"' in second)
+        self.assertTrue("?s <%s> ?v" % identifier in first)
+        self.assertTrue("?s <%s> <%s>" % (ns.RDF["type"], concept) in first)
+        self.assertEquals(instances,
+                          {Literal("id1") : {URIRef("http://s1") : {None : [concept]}},
+                           Literal("id2") : {URIRef("http://s2") : {None : [concept]}}})
@@ -0,0 +1,67 @@
+""" Module for prepared query tests. """
+
+from unittest import TestCase
+
+from surf.plugin.query_reader import query_Ask, query_P_S, query_S, query_SP
+from surf.plugin.query_reader import prepared_Ask, prepared_P_S, prepared_S, prepared_SP
+from surf.query import ASK, select
+from surf.query.prepared import PreparedQuery, param, prepare
+from surf.rdf import BNode, Literal, URIRef
+
+class TestPrepared(TestCase):
+    """ Tests for surf.query.prepared module. """
+
+    def test_bind(self):
+        """ Test binding terms and graph URIs. """
+
+        query = select("?o").from_(param("c")).where((param("s"), param("p"), "?o"))
+        template = PreparedQuery(query)
+        self.assertEquals(template.parameters(), ["c", "s", "p"])
+
+        bound = template.bind(c = URIRef("http://c"), s = BNode("b"),
+                              p = URIRef("http://p"))
+        expected = select("?o").from_(URIRef("http://c"))\
+                               .where((BNode("b"), URIRef("http://p"), "?o"))
+        self.assertEquals(bound, unicode(expected))
+        self.assertEquals(bound.query_type, "select")
+
+        self.assertRaises(ValueError, template.bind, s = BNode("b"))
+
+    def test_literal(self):
+        """ Test that bound literals are not interpreted as parameters. """
+
+        template = PreparedQuery(select("?s").where(("?s", "?p", param("o"))))
+        bound = template.bind(o = Literal(u"?\x00s\x00"))
+        self.assertTrue(Literal(u"?\x00s\x00").n3() in bound)
+
+    def test_prepare_cache(self):
+        """ Test that a query shape is built only once. """
+
+        calls = []
+        def build():
+            calls.append(True)
+            return select("?o").where((param("s"), "?p", "?o"))
+
+        first = prepare(("test_prepare_cache",), build)
+        second = prepare(("test_prepare_cache",), build)
+        self.assertTrue(first is second)
+        self.assertEquals(len(calls), 1)
+
+    def test_reader_queries(self):
+        """ Test that prepared reader queries match the unprepared ones. """
+
+        s, p = URIRef("http://s"), URIRef("http://p")
+        for contexts in [None, [URIRef("http://c1"), URIRef("http://c2")]]:
+            for direct in [True, False]:
+                self.assertEquals(prepared_SP(s, p, direct, contexts),
+                                  unicode(query_SP(s, p, direct, contexts)))
+                self.assertEquals(prepared_S(s, direct, contexts),
+                                  unicode(query_S(s, direct, contexts)))
+                attributes = [p, "not_a_uri", URIRef("http://q")]
+                context = contexts and contexts[0]
+                self.assertEquals(prepared_P_S(None, attributes, direct, context),
+                                  unicode(query_P_S(None, attributes, direct, context)))
+
+            ask_query = prepared_Ask(s, contexts)
+            self.assertEquals(ask_query, unicode(query_Ask(s, contexts)))
+            self.assertEquals(ask_query.query_type, ASK)
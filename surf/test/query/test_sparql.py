@@ -143,6 +143,22 @@ class TestSparqlTranslator(TestCase):
         
         self.assertEqual(expected, result)
 
+    def test_aggregate_alias(self):
+        """ Try to produce query with aliased aggregate. """
+
+        expected = canonical(u"""
+            SELECT (COUNT(DISTINCT ?s) AS ?count)
+            WHERE {
+                ?s ?p ?o
+            }
+        """)
+
+        query = select("(COUNT(DISTINCT ?s) AS ?count)")
+        query.where(("?s", "?p", "?o"))
+        result = canonical(SparqlTranslator(query).translate())
+
+        self.assertEqual(expected, result)
+
     def test_str(self):
         """ Try str(query). """
         
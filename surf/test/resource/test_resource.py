@@ -1,10 +1,13 @@
 """ Module for sparql_protocol plugin tests. """
 
+from threading import Thread
 from unittest import TestCase
+import gc
 
 import surf
 from surf import Resource
-from surf.rdf import URIRef
+from surf.plugin.reader import RDFReader
+from surf.rdf import Literal, URIRef
 from surf.util import uri_split
 
 class TestResource(TestCase):
@@ -86,9 +89,68 @@ class TestResource(TestCase):
             # Make some changes to instance to trigger its "dirty" state.
             c.rdfs_comment = "Test Instance %d" % i
 
-        self.assertEquals(len(Resource._dirty_instances), 100)
+        gc.collect()
+        self.assertEquals(len(session.dirty_resources), 100)
+        instances = session.dirty_resources
         session.commit()
-        self.assertEquals(len(Resource._dirty_instances), 0)
+        self.assertEquals(len(session.dirty_resources), 0)
+        self.assertFalse([c for c in instances if c.dirty])
+
+    def test_dirty_resources(self):
+        """ Test that dirty resources are held until commit, per thread. """
+
+        _, session = self._get_store_session()
+        Person = session.get_class(surf.ns.FOAF.Person)
+        john = session.get_resource("http://John", Person)
+        john.foaf_name = "John"
+        abandoned = session.get_resource("http://Jane", Person)
+        abandoned.foaf_name = "Jane"
+        del abandoned
+        gc.collect()
+        self.assertEquals(sorted([r.subject for r in session.dirty_resources]),
+                          [URIRef("http://Jane"), URIRef("http://John")])
+        for resource in session.dirty_resources:
+            if resource is not john:
+                resource.dirty = False
+
+        # Other threads have their own dirty resources.
+        other = []
+        def worker():
+            jack = session.get_resource("http://Jack", Person)
+            jack.foaf_name = "Jack"
+            other.extend(session.dirty_resources)
+            session.clear_dirty()
+            other.append(jack.dirty)
+        thread = Thread(target = worker)
+        thread.start()
+        thread.join()
+        self.assertEquals([r.subject for r in other[:1]], [URIRef("http://Jack")])
+        self.assertEquals(other[1:], [False])
+        self.assertEquals(session.dirty_resources, [john])
+
+        # Saving in another thread forgets the resource in this one.
+        thread = Thread(target = lambda: setattr(john, "dirty", False))
+        thread.start()
+        thread.join()
+        self.assertEquals(session.dirty_resources, [])
+
+    def test_multisession_commit(self):
+        """ Test that a multisession commits the dirty resources of its
+        sessions. """
+
+        from surf.multisession import Multisession
+
+        store, _ = self._get_store_session()
+        session = Multisession(store, default_query_contexts = [None])
+        Person = session.get_class(surf.ns.FOAF.Person)
+        john = Person("http://John")
+        john.foaf_name = "John"
+        self.assertEquals(session.dirty_resources, [john])
+
+        session.commit()
+        self.assertFalse(john.dirty)
+        self.assertEquals(session.dirty_resources, [])
+        self.assertEquals(store.size(), 2)
 
     def test_init_namespace(self):
         """ Test resource initialization in specified namespace. """
@@ -235,4 +297,255 @@ class TestResource(TestCase):
             # affected.
             RP.get_by = original_get_by
             
-        
\ No newline at end of file
+        
+    def test_identity_map(self):
+        """ Test that session with use_cached reuses resource instances. """
+
+        store = surf.Store(reader = "rdflib", writer = "rdflib")
+        session = surf.Session(store, use_cached = True)
+        Person = session.get_class(surf.ns.FOAF.Person)
+
+        john = session.get_resource("http://John", Person)
+        self.assertTrue(session.get_resource("http://John", Person) is john)
+        self.assertTrue(Person._instance(john.subject, [Person.uri]) is john)
+
+        # Different concept gets its own instance.
+        thing = session.get_resource("http://John", surf.ns.OWL.Thing)
+        self.assertFalse(thing is john)
+
+        # Saving invalidates the cached instance.
+        john.foaf_name = "John"
+        john.save()
+        self.assertFalse(session.get_resource("http://John", Person) is john)
+
+        # Without use_cached, instances are not reused.
+        session.use_cached = False
+        self.assertFalse(session.get_resource("http://Jane", Person) is
+                         session.get_resource("http://Jane", Person))
+
+    def test_class_instance(self):
+        """ Test that class attribute access reuses the owl:Class instance. """
+
+        store = surf.Store(reader = "rdflib", writer = "rdflib")
+        session = surf.Session(store, use_cached = True)
+        Person = session.get_class(surf.ns.FOAF.Person)
+        person_class = session.get_resource(surf.ns.FOAF.Person,
+                                            surf.ns.OWL.Class)
+        person_class.rdfs_label = "Person"
+        person_class.save()
+
+        self.assertEquals(Person.rdfs_label.first, Literal(u"Person"))
+        instance = session.class_instance(Person)
+        self.assertTrue(session.class_instance(Person) is instance)
+        self.assertTrue(Person.rdfs_label is instance.rdfs_label)
+
+        # Writes drop the cached instance, new values are seen.
+        person_class.rdfs_label = "Human"
+        person_class.update()
+        self.assertFalse(session.class_instance(Person) is instance)
+        self.assertEquals(Person.rdfs_label.first, Literal(u"Human"))
+
+        # Without use_cached, instances are not reused.
+        session.use_cached = False
+        self.assertFalse(session.class_instance(Person) is
+                         session.class_instance(Person))
+
+    def test_get_by_values(self):
+        """ Test Resource.get_by_values() with several values. """
+
+        store = surf.Store(reader = "rdflib", writer = "rdflib", batch_size = 2)
+        session = surf.Session(store, mapping = {})
+        Person = session.get_class(surf.ns.FOAF.Person)
+        for i in range(4):
+            person = session.get_resource("http://p%d" % i, Person)
+            person.dc_identifier = u"id%d" % i
+            person.save()
+        # Not a foaf:Person.
+        document = session.get_resource("http://d1", surf.ns.FOAF.Document)
+        document.dc_identifier = u"id1"
+        document.save()
+
+        people = Person.get_by_values("dc_identifier",
+                                      [u"id1", u"id2", u"id3", u"unknown"])
+        self.assertEquals(sorted(people.keys()),
+                          [u"id1", u"id2", u"id3", u"unknown"])
+        self.assertEquals(people[u"id1"], [session.get_resource("http://p1", Person)])
+        self.assertEquals(people[u"id3"], [session.get_resource("http://p3", Person)])
+        self.assertEquals(people[u"unknown"], [])
+
+    def test_concurrent_load(self):
+        """ Test loading with concurrent_load and Session.load_many. """
+
+        store, session = self._get_store_session()
+        Person = session.get_class(surf.ns.FOAF.Person)
+        john = session.get_resource("http://John", Person)
+        jane = session.get_resource("http://Jane", Person)
+        john.foaf_name = "John"
+        jane.foaf_name = "Jane"
+        jane.foaf_knows = john
+        john.save()
+        jane.save()
+
+        session = surf.Session(store, concurrent_load = True, load_workers = 2)
+        Person = session.get_class(surf.ns.FOAF.Person)
+        john = session.get_resource("http://John", Person)
+        john.load()
+        self.assertEquals(john.foaf_name.first, "John")
+        self.assertEquals(john.is_foaf_knows_of.first.subject, jane.subject)
+
+        people = [session.get_resource("http://John", Person),
+                  session.get_resource("http://Jane", Person)]
+        session.load_many(people)
+        self.assertEquals([p.foaf_name.first for p in people], ["John", "Jane"])
+        self.assertEquals(people[1].foaf_knows.first.subject, john.subject)
+        self.assertFalse(people[0].dirty)
+
+    def test_class_registry(self):
+        """ Test that map_type creates each class once. """
+
+        store = surf.Store(reader = "rdflib", writer = "rdflib")
+        session = surf.Session(store, mapping = {})
+        Person = session.get_class(surf.ns.FOAF.Person)
+        self.assertTrue(session.get_class(surf.ns.FOAF.Person) is Person)
+        self.assertFalse(session.get_class(surf.ns.FOAF.Agent) is Person)
+
+        john = session.get_resource("http://John", Person)
+        jane = session.get_resource("http://Jane", surf.ns.FOAF.Person)
+        self.assertTrue(type(john) is type(jane))
+        self.assertTrue(isinstance(jane, Person))
+
+        # Mapping entries are part of the key.
+        class Mixin(object): pass
+        session.mapping[surf.ns.FOAF.Person] = Mixin
+        MappedPerson = session.get_class(surf.ns.FOAF.Person)
+        self.assertFalse(MappedPerson is Person)
+        self.assertTrue(issubclass(MappedPerson, Mixin))
+
+    def test_class_registry_concepts(self):
+        """ Test that instances with several concepts reuse one class,
+        even after uri_to_class forgot the classes of the concepts. """
+
+        store = surf.Store(reader = "rdflib", writer = "rdflib")
+        session = surf.Session(store, mapping = {})
+        Person = session.get_class(surf.ns.FOAF.Person)
+        concepts = [surf.ns.FOAF.Person, surf.ns.FOAF.Agent]
+
+        john = Person._instance(URIRef("http://John"), concepts)
+        self.assertTrue(john.__class__.__bases__[1].uri == surf.ns.FOAF.Agent)
+        surf.util._uri_classes.clear()
+        jane = Person._instance(URIRef("http://Jane"), concepts)
+        self.assertTrue(type(john) is type(jane))
+
+    def test_rdf_changes(self):
+        """ Test that rdf_changes tracks values changed since loading. """
+
+        store, session = self._get_store_session()
+        Person = session.get_class(surf.ns.FOAF.Person)
+        FOAF = surf.ns.FOAF
+        john = session.get_resource("http://John", Person)
+        john.foaf_name = "John"
+        john.foaf_nick = ["Johnny", "Jo"]
+        # Values in the store are not known yet, they are all replaced.
+        self.assertEquals(john.rdf_changes[FOAF.name], ([Literal("John")], None))
+        john.save()
+        self.assertEquals(john.rdf_changes, {})
+
+        john = session.get_resource("http://John", Person)
+        john.load()
+        john.foaf_nick.remove("Jo")
+        john.foaf_nick.append("J")
+        john.foaf_mbox = URIRef("mailto:john@example.com")
+        self.assertEquals(john.rdf_changes,
+                          {FOAF.nick : ([Literal("J")], [Literal("Jo")]),
+                           FOAF.mbox : ([URIRef("mailto:john@example.com")], [])})
+
+        john.update()
+        self.assertEquals(john.rdf_changes, {})
+        graph = store.reader.graph
+        self.assertEquals(set(graph.objects(john.subject, FOAF.nick)),
+                          set([Literal("Johnny"), Literal("J")]))
+        self.assertEquals(list(graph.objects(john.subject, FOAF.name)),
+                          [Literal("John")])
+
+        # Lazily loaded attributes are tracked as well.
+        john = session.get_resource("http://John", Person)
+        john.foaf_name = "Jon"
+        self.assertEquals(john.rdf_changes[FOAF.name], ([Literal("Jon")], None))
+        john = session.get_resource("http://John", Person)
+        john.foaf_name.append("Jon")
+        self.assertEquals(john.rdf_changes[FOAF.name], ([Literal("Jon")], []))
+
+    def test_prefetch(self):
+        """ Test that ResultProxy.prefetch loads attributes in batches. """
+
+        store, session = self._get_store_session()
+        Person = session.get_class(surf.ns.FOAF.Person)
+        Document = session.get_class(surf.ns.FOAF.Document)
+        for i in range(4):
+            person = session.get_resource("http://p%d" % i, Person)
+            document = session.get_resource("http://d%d" % i, Document)
+            document.dc_title = "Document %d" % i
+            person.foaf_made = document
+            document.save()
+            person.save()
+
+        calls = []
+        def counting(name):
+            method = getattr(store.reader, name)
+            def counting_method(*args):
+                calls.append(name)
+                return method(*args)
+            setattr(store.reader, name, counting_method)
+        for name in ["_execute", "get", "get_many"]:
+            counting(name)
+
+        people = list(Person.all().prefetch("foaf_made", "foaf_made__dc_title"))
+        # get_by, then one batch for each of the two attributes.
+        self.assertEquals(calls, ["_execute", "get_many", "get_many"])
+
+        titles = set()
+        for person in people:
+            titles.update([d.dc_title.first for d in person.foaf_made])
+            self.assertFalse(person.dirty)
+        self.assertEquals(titles, set(["Document %d" % i for i in range(4)]))
+        self.assertEquals(len(calls), 3)
+
+    def test_only_defer(self):
+        """ Test that only() and defer() leave other attributes lazy. """
+
+        FOAF = surf.ns.FOAF
+        john_uri = URIRef("http://John")
+
+        class MockReader(RDFReader):
+            get_by_calls, get_calls = [], []
+
+            def _get_by(self, params):
+                self.get_by_calls.append(params)
+                direct = {surf.ns.RDF.type : {FOAF.Person : {None : []}},
+                          FOAF.name : {Literal("John") : {None : []}}}
+                return [(john_uri, {"direct" : direct, "inverse" : {}})]
+
+            def _get(self, subject, attribute, direct, context):
+                self.get_calls.append(attribute)
+                return {Literal("Johnny") : {None : []}}
+
+        session = surf.Session(surf.Store(MockReader()))
+        Person = session.get_class(FOAF.Person)
+
+        john = Person.all().only("foaf_name", "foaf_mbox").one()
+        self.assertEquals(MockReader.get_by_calls[-1]["only"],
+                          [(FOAF.name, True), (FOAF.mbox, True)])
+        self.assertEquals(john.foaf_name.first, "John")
+        # Asked for, but not in results: known to be empty.
+        self.assertEquals(list(john.foaf_mbox), [])
+        self.assertEquals(MockReader.get_calls, [])
+        # Other attributes are lazy-loaded.
+        self.assertEquals(john.foaf_nick.first, "Johnny")
+        self.assertEquals(MockReader.get_calls, [FOAF.nick])
+
+        john = Person.all().defer("foaf_nick").one()
+        self.assertEquals(MockReader.get_by_calls[-1]["defer"],
+                          [(FOAF.nick, True)])
+        self.assertTrue(MockReader.get_by_calls[-1]["full"])
+        self.assertEquals(john.foaf_nick.first, "Johnny")
+        self.assertEquals(MockReader.get_calls, [FOAF.nick, FOAF.nick])
@@ -27,6 +27,79 @@ class TestResultValue(unittest.TestCase):
         # Test that "to_rdf" is tried.
         self.assertTrue("value_as_uriref" in instance)
 
+    def test_contains_len_from_store(self):
+        """ Test that membership and length are asked from the store. """
+
+        class MockStore(object):
+            calls = []
+
+            def has_value(self, resource, attribute, value, direct):
+                self.calls.append(("has_value", attribute, value, direct))
+                return True
+
+            def count_values(self, resource, attribute, direct):
+                self.calls.append(("count_values", attribute, direct))
+                return 2
+
+        class MockStoreResource(MockResource):
+            session = {"default" : MockStore()}
+            store_key = "default"
+
+        def values_source():
+            return ["value_as_surf_object"], ["value_as_uriref"]
+
+        instance = ResourceValue(values_source, MockStoreResource(),
+                                 "foaf_name", from_store=True)
+        self.assertTrue("value_as_surf_object" in instance)
+        self.assertTrue(instance)
+        self.assertEquals(len(instance), 2)
+        self.assertEquals(MockStore.calls,
+                          [("has_value", surf.ns.FOAF.name, "value_as_uriref", True),
+                           ("has_value", surf.ns.FOAF.name, None, True),
+                           ("count_values", surf.ns.FOAF.name, True)])
+
+        # Once values are loaded, they are used instead.
+        list(instance)
+        self.assertEquals(len(instance), 1)
+        self.assertTrue(instance)
+        self.assertEquals(len(MockStore.calls), 3)
+
+    def test_store_answers_cached(self):
+        """ Test that store answers are reused until values are loaded. """
+
+        class MockStore(object):
+            calls = []
+
+            def has_value(self, resource, attribute, value, direct):
+                self.calls.append("has_value")
+                return True
+
+            def count_values(self, resource, attribute, direct):
+                self.calls.append("count_values")
+                return 2
+
+        class MockStoreResource(MockResource):
+            session = {"default" : MockStore()}
+            store_key = "default"
+
+        def values_source():
+            return ["value_as_surf_object"], ["value_as_uriref"]
+
+        instance = ResourceValue(values_source, MockStoreResource(),
+                                 "foaf_name", from_store=True)
+        for _ in range(2):
+            self.assertEquals(len(instance), 2)
+            self.assertTrue(instance)
+            self.assertTrue("value_as_uriref" in instance)
+        self.assertEquals(MockStore.calls, ["count_values", "has_value"])
+
+        # Converting to a list loads values without counting them first.
+        instance = ResourceValue(values_source, MockStoreResource(),
+                                 "foaf_name", from_store=True)
+        self.assertEquals(list(instance), ["value_as_surf_object"])
+        self.assertEquals(tuple(instance), ("value_as_surf_object",))
+        self.assertEquals(MockStore.calls, ["count_values", "has_value"])
+
     def test_get_one_exceptions(self):
         """ Test RessourceValue.one. """
         
@@ -2,6 +2,7 @@
 
 import unittest
 import surf
+from surf.rdf import RDF
 from surf.resource.result_proxy import ResultProxy
 
 class MockStore(object):
@@ -22,6 +23,51 @@ class MockStore(object):
 
         return self.__data
 
+class PagingMockStore(object):
+    """ Store that serves get_by() results page by page. """
+
+    def __init__(self, subjects):
+        self.subjects = subjects
+        self.calls = []
+
+    def get_by(self, params):
+        self.calls.append(params)
+        offset = params.get("offset", 0)
+        limit = params.get("limit", len(self.subjects))
+        return [(subject, {}) for subject
+                in self.subjects[offset:offset + limit]]
+
+class RowPagingMockStore(object):
+    """ Store that applies limit and offset to (subject, type) rows, like
+    query readers do. """
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_by(self, params):
+        offset = params.get("offset", 0)
+        limit = params.get("limit", len(self.rows))
+        results, types = [], {}
+        for subject, concept in self.rows[offset:offset + limit]:
+            if subject not in types:
+                types[subject] = {}
+                data = {"direct" : {RDF.type : types[subject]}}
+                results.append((subject, data))
+            types[subject][concept] = {None : []}
+        return results
+
+class CountingMockStore(MockStore):
+    """ Store that can count results without loading them. """
+
+    def __init__(self, count):
+        MockStore.__init__(self)
+        self.count = count
+        self.count_calls = []
+
+    def count_by(self, params):
+        self.count_calls.append(params)
+        return self.count
+
 class MockResource(object):
     subject = "mock_subject"
 
@@ -103,6 +149,65 @@ class TestResultProxy(unittest.TestCase):
         q = q[2:6]
         list(q)
 
+    def test_stream(self):
+        """ Test that stream() fetches results page by page. """
+
+        store = PagingMockStore(range(10))
+        params = { "store" : store,
+                   "instancemaker" : lambda params, data: data[0]}
+        proxy = ResultProxy(params)
+
+        self.assertEquals(list(proxy.stream(page_size=4)), range(10))
+        # Two full pages, a short one and an empty one.
+        self.assertEquals([call["offset"] for call in store.calls],
+                          [0, 4, 8, 12])
+        # Results are ordered so that pages are stable.
+        self.assertTrue(all(call["order"] for call in store.calls))
+
+    def test_stream_multiple_types(self):
+        """ Test that stream() merges subjects split between pages and
+        doesn't stop at pages with fewer subjects than rows. """
+
+        rows = [("s0", "t1"), ("s0", "t2"), ("s1", "t1"), ("s1", "t2"),
+                ("s1", "t3"), ("s2", "t1"), ("s3", "t1")]
+        params = { "store" : RowPagingMockStore(rows),
+                   "instancemaker" : lambda params, data: \
+                       (data[0], sorted(data[1]["direct"][RDF.type]))}
+        proxy = ResultProxy(params)
+
+        self.assertEquals(list(proxy.stream(page_size=2)),
+                          [("s0", ["t1", "t2"]),
+                           ("s1", ["t1", "t2", "t3"]),
+                           ("s2", ["t1"]),
+                           ("s3", ["t1"])])
+
+    def test_stream_limit(self):
+        """ Test that stream() respects limit and offset. """
+
+        store = PagingMockStore(range(10))
+        params = { "store" : store,
+                   "instancemaker" : lambda params, data: data[0]}
+        proxy = ResultProxy(params)
+
+        self.assertEquals(list(proxy[3:8].stream(page_size=2)), range(3, 8))
+        self.assertEquals([call["limit"] for call in store.calls], [2, 2, 1])
+
+    def test_count(self):
+        """ Test that len() asks store to count results. """
+
+        store = CountingMockStore(7)
+        store.set_data([("s%d" % i, {}) for i in range(3)])
+        proxy = ResultProxy({ "store" : store,
+                              "instancemaker" : mock_instancemaker})
+
+        self.assertEquals(len(proxy.limit(10)), 7)
+        self.assertEquals(proxy.limit(10).count(), 7)
+        self.assertEquals(store.count_calls[0], {"limit" : 10})
+
+        # Store can't count, fall back to loading results.
+        store.count = None
+        self.assertEquals(len(proxy), 3)
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
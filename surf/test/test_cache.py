@@ -0,0 +1,68 @@
+""" Module for surf.cache tests. """
+
+import time
+from unittest import TestCase
+
+from surf.cache import LRUCache
+
+class TestLRUCache(TestCase):
+    """ Tests for LRUCache class. """
+
+    def test_get_set(self):
+        """ Test storing and retrieving values. """
+
+        cache = LRUCache()
+        cache.set("a", 1)
+        self.assertEquals(cache.get("a"), 1)
+        self.assertEquals(cache.get("b"), None)
+        self.assertTrue("a" in cache)
+        self.assertFalse("b" in cache)
+
+    def test_eviction(self):
+        """ Test that least recently used entries are evicted first. """
+
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        # Touch "a" so "b" becomes least recently used.
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEquals(len(cache), 2)
+        self.assertEquals(cache.get("a"), 1)
+        self.assertEquals(cache.get("b"), None)
+        self.assertEquals(cache.get("c"), 3)
+
+    def test_expire(self):
+        """ Test that stale entries are dropped. """
+
+        cache = LRUCache(expire=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        self.assertEquals(cache.get("a"), None)
+        self.assertEquals(len(cache), 0)
+
+    def test_invalidate(self):
+        """ Test invalidate() and clear(). """
+
+        cache = LRUCache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.invalidate("a")
+        cache.invalidate("missing")
+        self.assertEquals(cache.get("a"), None)
+        self.assertEquals(cache.get("b"), 2)
+
+        cache.clear()
+        self.assertEquals(len(cache), 0)
+
+    def test_popitem(self):
+        """ Test that popitem() drops the least recently used entry. """
+
+        cache = LRUCache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        self.assertEquals(cache.popitem(), ("b", 2))
+        self.assertEquals(cache.popitem(), ("a", 1))
+        self.assertRaises(KeyError, cache.popitem)
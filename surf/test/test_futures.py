@@ -0,0 +1,57 @@
+""" Module for surf.futures tests. """
+
+from threading import Event
+from unittest import TestCase
+
+from surf.futures import ThreadPool
+
+class TestThreadPool(TestCase):
+    """ Tests for ThreadPool class. """
+
+    def test_submit(self):
+        """ Test that submitted calls return their results. """
+
+        pool = ThreadPool(2)
+        future = pool.submit(lambda a, b = 0: a + b, 1, b = 2)
+        self.assertEquals(future.result(), 3)
+        self.assertTrue(future.done())
+        pool.shutdown()
+
+    def test_map(self):
+        """ Test that map keeps argument order. """
+
+        pool = ThreadPool(3)
+        self.assertEquals(pool.map(lambda x: x * x, range(10)),
+                          [x * x for x in range(10)])
+        pool.shutdown()
+
+    def test_bounded(self):
+        """ Test that no more than max_workers calls run at once. """
+
+        pool = ThreadPool(1)
+        event = Event()
+        first = pool.submit(event.wait, 5)
+        second = pool.submit(lambda: "second")
+        self.assertRaises(RuntimeError, second.result, 0.05)
+        event.set()
+        self.assertEquals(second.result(5), "second")
+        self.assertTrue(first.done())
+        pool.shutdown()
+
+    def test_done_callback(self):
+        """ Test that callbacks run when the call finishes. """
+
+        pool = ThreadPool(1)
+        future = pool.submit(lambda: 42)
+        future.result()
+        results = []
+        future.add_done_callback(lambda f: results.append(f.result()))
+        self.assertEquals(results, [42])
+        pool.shutdown()
+
+    def test_shutdown(self):
+        """ Test that submitting after shutdown fails. """
+
+        pool = ThreadPool(1)
+        pool.shutdown()
+        self.assertRaises(RuntimeError, pool.submit, lambda: None)
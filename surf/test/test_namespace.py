@@ -1,3 +1,4 @@
+from threading import Thread
 from unittest import TestCase
 
 from surf import ns
@@ -40,4 +41,99 @@ class TestNamespace(TestCase):
 
         prefix, _ = util_get_namespace(ns.GEO)
         self.assertEquals(prefix, "GEO")
-        
\ No newline at end of file
+        
+    def test_longest_prefix(self):
+        """ Test that longest_prefix finds the most specific namespace. """
+
+        ns.register(longest='http://longest.ns/a/')
+        ns.register(longest_b='http://longest.ns/a/b#')
+
+        prefix, namespace = ns.longest_prefix('http://longest.ns/a/b#c')
+        self.assertEquals(prefix, 'LONGEST_B')
+        self.assertEquals(namespace, Namespace('http://longest.ns/a/b#'))
+
+        prefix, _ = ns.longest_prefix('http://longest.ns/a/c/d')
+        self.assertEquals(prefix, 'LONGEST')
+
+        self.assertEquals(ns.longest_prefix('http://nowhere.ns/x'),
+                          (None, None))
+
+        # Anonymous namespaces are skipped.
+        ns.get_namespace('http://longest.ns/a/z/')
+        prefix, _ = ns.longest_prefix('http://longest.ns/a/z/q')
+        self.assertEquals(prefix, 'LONGEST')
+
+class TestNamespaceRegistry(TestCase):
+    """ Tests for :class:`surf.namespace.NamespaceRegistry`. """
+
+    def test_register(self):
+        """ Test lookups by prefix and by URI. """
+
+        registry = ns.NamespaceRegistry()
+        registry.register('A', Namespace('http://a.ns/'))
+        self.assertEquals(registry.namespace('A'), Namespace('http://a.ns/'))
+        self.assertEquals(registry.prefix('http://a.ns/'), 'A')
+
+        # Registering a new URI under a known prefix forgets the old URI.
+        registry.register('A', Namespace('http://b.ns/'))
+        self.assertEquals(registry.prefix('http://a.ns/'), None)
+        self.assertEquals(registry.prefix('http://b.ns/'), 'A')
+        self.assertEquals(len(registry), 1)
+
+    def test_anonymous_eviction(self):
+        """ Test that least recently used anonymous namespaces are evicted. """
+
+        registry = ns.NamespaceRegistry(max_anonymous=2)
+        registry.register('KEPT', Namespace('http://kept.ns/'))
+        self.assertEquals(registry.register('NS1', Namespace('http://1.ns/'),
+                                            anonymous=True), [])
+        registry.register('NS2', Namespace('http://2.ns/'), anonymous=True)
+        # Using NS1 makes NS2 the least recently used.
+        registry.prefix('http://1.ns/')
+
+        evicted = registry.register('NS3', Namespace('http://3.ns/'),
+                                    anonymous=True)
+        self.assertEquals(evicted, ['NS2'])
+        self.assertEquals(registry.prefix('http://2.ns/'), None)
+        self.assertEquals(sorted(registry.all()), ['KEPT', 'NS1', 'NS3'])
+
+        registry.max_anonymous = 0
+        self.assertEquals(registry.all().keys(), ['KEPT'])
+
+    def test_view(self):
+        """ Test that a NamespaceView follows the registry. """
+
+        registry = ns.NamespaceRegistry()
+        registry.register('A', Namespace('http://a.ns/'))
+        view = ns.NamespaceView(registry, {'B' : Namespace('http://b.ns/')})
+        self.assertEquals(view['A'], Namespace('http://a.ns/'))
+        self.assertEquals(view['B'], Namespace('http://b.ns/'))
+        self.assertRaises(KeyError, view.__getitem__, 'C')
+
+        registry.register('C', Namespace('http://c.ns/'))
+        self.assertEquals(sorted(view.items()),
+                          [('A', Namespace('http://a.ns/')),
+                           ('B', Namespace('http://b.ns/')),
+                           ('C', Namespace('http://c.ns/'))])
+        self.assertTrue('C' in view)
+
+    def test_get_namespace_threads(self):
+        """ Test that concurrent get_namespace() calls register one prefix
+        per URI. """
+
+        bases = ["http://threads.ns/%d#" % i for i in range(50)]
+        results = []
+
+        def get_namespaces():
+            results.append([ns.get_namespace(base)[0] for base in bases])
+
+        threads = [Thread(target=get_namespaces) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEquals(len(results), 4)
+        for prefixes in results:
+            self.assertEquals(prefixes, results[0])
+        self.assertEquals(len(set(results[0])), len(bases))
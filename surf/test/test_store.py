@@ -4,7 +4,7 @@
 from unittest import TestCase
 
 import surf
-from surf import Session, Store
+from surf import AsyncStore, Session, Store
 from surf.plugin.reader import RDFReader
 from surf.plugin.writer import RDFWriter
 
@@ -58,3 +58,57 @@ class TestStore(TestCase):
         reader = MockReader()
         store = Store(reader, MockWriter(reader))
         store.close()
+
+    def test_commit(self):
+        """ Test that session commit updates all dirty resources at once. """
+
+        class MockWriter(RDFWriter):
+            calls = []
+            def _update(self, *resources):
+                self.calls.append(resources)
+
+        reader = RDFReader()
+        store = Store(reader, MockWriter(reader))
+        session = Session(store)
+        Person = session.get_class(surf.ns.FOAF.Person)
+        people = [session.get_resource("http://p%d" % i, Person)
+                  for i in range(3)]
+        for person in people:
+            person.foaf_name = "Name"
+
+        session.commit()
+        self.assertEquals(len(MockWriter.calls), 1)
+        self.assertEquals(set(MockWriter.calls[0]), set(people))
+        self.assertFalse([person for person in people if person.dirty])
+
+class TestAsyncStore(TestCase):
+    """ Tests for AsyncStore class. """
+
+    def test_futures(self):
+        """ Test that AsyncStore returns results through futures. """
+
+        store = Store(reader = "rdflib", writer = "rdflib")
+        session = Session(store)
+        Person = session.get_class(surf.ns.FOAF.Person)
+        rob = session.get_resource("http://Robert", Person)
+        rob.foaf_name = "Robert"
+
+        async_store = AsyncStore(store, max_workers = 2)
+        async_store.save(rob).result()
+        futures = [async_store.is_present(rob) for _ in range(4)]
+        self.assertEquals([future.result() for future in futures], [True] * 4)
+        async_store.close()
+
+    def test_exception(self):
+        """ Test that exceptions are raised from Future.result(). """
+
+        class MockReader(RDFReader):
+            def is_present(self, resource):
+                raise ValueError("Failed")
+
+        reader = MockReader()
+        async_store = AsyncStore(Store(reader, RDFWriter(reader)))
+        future = async_store.is_present(None)
+        self.assertRaises(ValueError, future.result)
+        self.assertTrue(isinstance(future.exception(), ValueError))
+        async_store.close()
@@ -3,7 +3,8 @@
 from unittest import TestCase
 
 import surf
-from surf.util import attr2rdf, rdf2attr, single
+from surf.rdf import URIRef
+from surf.util import attr2rdf, rdf2attr, single, uri_split, uri_to_class
 
 class TestUtil(TestCase):
     """ Tests for surf.util module. """
@@ -12,6 +13,21 @@ class TestUtil(TestCase):
         uri = "http://www.w3.org/2000/01/rdf-schema#label"
         self.assertEqual(rdf2attr(uri, True), "rdfs_label")
 
+    def test_uri_split_longest_prefix(self):
+        """ Test that uri_split uses the longest registered namespace
+        instead of registering the base of the URI. """
+
+        uri = URIRef("http://longest.split.test/a/b/c")
+        surf.ns.register(longsplit = "http://longest.split.test/a/")
+        count = len(surf.ns.all())
+
+        self.assertEquals(uri_split(uri), ("LONGSPLIT", "b/c"))
+        self.assertEquals(attr2rdf(rdf2attr(uri, True)), (uri, True))
+        self.assertEquals(len(surf.ns.all()), count)
+
+        # A registered base is used as before.
+        self.assertEquals(uri_split(surf.ns.FOAF.name), ("FOAF", "name"))
+
     def test_attr2rdf_period(self):
         """ Check that attr2rdf handles minus symbol in predicate names. """
         
@@ -44,3 +60,56 @@ class TestUtil(TestCase):
             # Test deleting "name"
             del instance.name
             self.assertEquals(instance.foaf_name, [])
+
+    def test_uri_to_class(self):
+        """ Test that uri_to_class reuses classes. """
+
+        cls = uri_to_class(surf.ns.FOAF.Agent)
+        self.assertEquals(cls.uri, surf.ns.FOAF.Agent)
+        self.assertTrue(uri_to_class(surf.ns.FOAF.Agent) is cls)
+        self.assertFalse(uri_to_class(surf.ns.FOAF.Person) is cls)
+
+    def test_uri_to_class_bounded(self):
+        """ Test that uri_to_class keeps a bounded number of classes. """
+
+        for i in range(surf.util.URI_CLASSES_SIZE + 10):
+            uri_to_class(URIRef("http://uri.classes.test/ns#C%d" % i))
+        self.assertEquals(len(surf.util._uri_classes),
+                          surf.util.URI_CLASSES_SIZE)
+
+    def test_translation_cache(self):
+        """ Test that attribute translation follows namespace changes. """
+
+        uri = URIRef("http://translation.cache.test/ns#name")
+        self.assertEquals(attr2rdf("transcache_name"), (None, True))
+
+        surf.ns.register(transcache = "http://translation.cache.test/ns#")
+        self.assertEquals(attr2rdf("transcache_name"), (uri, True))
+        self.assertEquals(attr2rdf("is_transcache_name_of"), (uri, False))
+        self.assertEquals(rdf2attr(uri, True), "transcache_name")
+
+        # Registering another prefix for the same URI changes the attribute.
+        surf.ns.register(transcache2 = "http://translation.cache.test/ns#")
+        self.assertEquals(rdf2attr(uri, True), "transcache2_name")
+        self.assertEquals(rdf2attr(uri, False), "is_transcache2_name_of")
+
+    def test_translation_cache_eviction(self):
+        """ Test that evicting an anonymous namespace drops only the
+        translations that use it. """
+
+        kept = URIRef("http://translation.eviction.test/kept#name")
+        evicted = URIRef("http://translation.eviction.test/evicted#name")
+        try:
+            surf.ns.set_max_anonymous(1)
+            attribute = rdf2attr(evicted, True)
+            self.assertEquals(attr2rdf(attribute), (evicted, True))
+            generation = surf.ns.get_generation()
+
+            kept_attribute = rdf2attr(kept, True)
+            self.assertEquals(surf.ns.get_generation(), generation)
+            self.assertEquals(attr2rdf(kept_attribute), (kept, True))
+            # The evicted namespace gets a new prefix.
+            self.assertEquals(attr2rdf(attribute), (None, True))
+            self.assertNotEquals(rdf2attr(evicted, True), attribute)
+        finally:
+            surf.ns.set_max_anonymous(None)
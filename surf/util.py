@@ -41,12 +41,81 @@ import re
 from urlparse import urlparse
 from uuid import uuid4
 
-from surf.namespace import get_namespace, get_namespace_url
-from surf.namespace import get_fallback_namespace, SURF
+from surf.cache import LRUCache
+from surf.namespace import add_forget_listener, get_namespace
+from surf.namespace import get_namespace_url, get_prefix, longest_prefix
+from surf.namespace import get_fallback_namespace, get_generation, SURF
 from surf.rdf import BNode, Literal, Namespace, URIRef
 
-pattern_direct = re.compile('^[a-z0-9]{1,}_[a-zA-Z0-9_\-]{1,}$', re.DOTALL)
-pattern_inverse = re.compile('^is_[a-z0-9]{1,}_[a-zA-Z0-9_\-]{1,}_of$', re.DOTALL)
+# The rest of the URI may contain "/" and "#" when it is split at the longest
+# registered namespace, see uri_split().
+pattern_direct = re.compile('^[a-z0-9]{1,}_[a-zA-Z0-9_\-/#]{1,}$', re.DOTALL)
+pattern_inverse = re.compile('^is_[a-z0-9]{1,}_[a-zA-Z0-9_\-/#]{1,}_of$', re.DOTALL)
+
+# Classes created by uri_to_class, by uri, the least recently used are
+# dropped.
+URI_CLASSES_SIZE = 10000
+_uri_classes = LRUCache(max_size=URI_CLASSES_SIZE)
+
+# Memoized attr2rdf and rdf2attr results, emptied when namespaces change.
+TRANSLATION_CACHE_SIZE = 10000
+_attr2rdf_cache = {}
+_rdf2attr_cache = {}
+# (cache, key) of the cached results by the namespace prefix they use.
+_translation_keys = {}
+_translation_generation = None
+
+def _translation_cache(cache):
+    """ Return `cache` after emptying the translation caches if namespaces
+    were registered since they were filled, or if `cache` is full. """
+
+    global _translation_generation
+    generation = get_generation()
+    if generation != _translation_generation or \
+            len(cache) >= TRANSLATION_CACHE_SIZE:
+        _attr2rdf_cache.clear()
+        _rdf2attr_cache.clear()
+        _translation_keys.clear()
+        _translation_generation = generation
+    return cache
+
+def _cache_translation(cache, key, value, prefix):
+    """ Cache `value` under `key`, to be dropped if the namespace `prefix`
+    is evicted. """
+
+    _translation_cache(cache)[key] = value
+    if prefix:
+        _translation_keys.setdefault(prefix.upper(), []).append((cache, key))
+
+def _forget_translations(prefixes):
+    """ Drop the cached results that use the evicted `prefixes`. """
+
+    for prefix in prefixes:
+        for cache, key in _translation_keys.pop(prefix, []):
+            cache.pop(key, None)
+
+add_forget_listener(_forget_translations)
+
+def _split(uri):
+    """ Return the prefix and the `namespace` of `uri`, and the rest of it.
+
+    The base of `uri`, up to the last *#* or */*, is looked up first. If
+    it's not registered, the longest registered namespace that `uri` starts
+    with is used, and only when there is none the base is registered as an
+    anonymous namespace.
+
+    """
+
+    sp = uri.rfind('#') != -1 and '#' or '/'
+    base, predicate = uri.rsplit(sp, 1)
+    base = '%s%s' % (base, sp)
+    if get_prefix(base) is None:
+        prefix, namespace = longest_prefix(uri)
+        if prefix is not None:
+            return prefix, namespace, uri[len(unicode(namespace)):]
+
+    prefix, namespace = get_namespace(base)
+    return prefix, namespace, predicate
 
 def namespace_split(uri):
     """ Same as `uri_split`, but instead of the base of the uri, returns the
@@ -59,13 +128,14 @@ def namespace_split(uri):
 
     """
 
-    sp = uri.rfind('#') != -1 and '#' or '/'
-    base, predicate = uri.rsplit(sp, 1)
-    return get_namespace('%s%s' % (base, sp))[1], predicate
+    _, namespace, predicate = _split(uri)
+    return namespace, predicate
 
 def uri_split(uri):
     """ Split the `uri` into base path and remainder,
-    the base is everything that comes before the last *#*' or */* including it
+    the base is everything that comes before the last *#*' or */* including it,
+    or the longest registered namespace `uri` starts with if that base is
+    not registered (see :func:`surf.namespace.longest_prefix`)
 
     .. code-block:: python
 
@@ -74,9 +144,8 @@ def uri_split(uri):
 
     """
 
-    sp = uri.rfind('#') != -1 and '#' or '/'
-    base, predicate = uri.rsplit(sp, 1)
-    return get_namespace('%s%s' % (base, sp))[0], predicate
+    prefix, _, predicate = _split(uri)
+    return prefix, predicate
 
 def uri_to_classname(uri):
     '''handy function to convert a `uri` to a Python valid `class name`
@@ -113,22 +182,38 @@ def attr2rdf(attrname):
 
     The function returns two values, the `uri` representation and True if it's 
     a direct predicate or False if its an inverse predicate.
+
+    Results are cached until a namespace is registered.
     
     """
-    
+
+    cache = _translation_cache(_attr2rdf_cache)
+    try:
+        return cache[attrname]
+    except KeyError:
+        result, prefix = _attr2rdf(attrname)
+        _cache_translation(_attr2rdf_cache, attrname, result, prefix)
+        return result
+
+def _attr2rdf(attrname):
+    """ Uncached :func:`attr2rdf`, also return the namespace prefix of the
+    attribute. """
+
     def tordf(attrname):
         prefix, predicate = attrname.split('_', 1)
         ns = get_namespace_url(prefix)
         try:
-            return ns[predicate]
+            return ns[predicate], prefix
         except:
-            return None
+            return None, prefix
 
     if pattern_inverse.match(attrname):
-        return  tordf(attrname.replace('is_', '').replace('_of', '')), False
+        uri, prefix = tordf(attrname.replace('is_', '').replace('_of', ''))
+        return (uri, False), prefix
     elif pattern_direct.match(attrname):
-        return  tordf(attrname), True
-    return None, None
+        uri, prefix = tordf(attrname)
+        return (uri, True), prefix
+    return (None, None), None
 
 def rdf2attr(uri, direct):
     """ Inverse of `attr2rdf`, return the attribute name,
@@ -141,11 +226,21 @@ def rdf2attr(uri, direct):
         >>> print rdf2attr('http://xmlns.com/foaf/spec/#term_title',False)
         if_foaf_title_of
 
+    Results are cached until a namespace is registered.
+
     """
 
-    ns, predicate = uri_split(uri)
-    attribute = '%s_%s' % (ns.lower(), predicate)
-    return direct and attribute or 'is_%s_of' % attribute
+    key = (uri, direct)
+    cache = _translation_cache(_rdf2attr_cache)
+    try:
+        return cache[key]
+    except KeyError:
+        ns, predicate = uri_split(uri)
+        attribute = '%s_%s' % (ns.lower(), predicate)
+        attribute = direct and attribute or 'is_%s_of' % attribute
+        # uri_split may have registered a namespace, check again.
+        _cache_translation(_rdf2attr_cache, key, attribute, ns)
+        return attribute
 
 
 def is_attr_direct(attrname):
@@ -171,8 +266,16 @@ def uri_to_class(uri):
         >>> print util.uri_to_class('http://mynamespace/ns#some_class')
         surf.util.Ns1some_class
 
+    The same `class object` is returned for the same `uri`, as long as it
+    is one of the last `URI_CLASSES_SIZE` used.
+
     '''
-    return new.classobj(str(uri_to_classname(uri)), (), {'uri':uri})
+
+    cls = _uri_classes.get(uri)
+    if cls is None:
+        cls = new.classobj(str(uri_to_classname(uri)), (), {'uri':uri})
+        _uri_classes.set(uri, cls)
+    return cls
 
 def uuid_subject(namespace=None):
     '''the function generates a unique subject in the provided `namespace` based on
@@ -261,6 +364,9 @@ def json_to_rdflib(obj):
     elif type == 'literal':
         if "xml:lang" in obj:
             return Literal(obj["value"], lang=obj['xml:lang'])
+        elif "datatype" in obj:
+            # SPARQL 1.1 results don't use "typed-literal".
+            return Literal(obj["value"], datatype=URIRef(obj['datatype']))
         else:
             return Literal(obj["value"])
     elif type == 'typed-literal':